@@ -0,0 +1,4 @@
+"""
+Benchmarks for the input to gamepad pipeline
+Run with: python -m benchmarks.<name>
+"""
@@ -0,0 +1,276 @@
+"""
+End to end benchmark of the pipeline for both gamepad types
+
+Frames from an in memory source go through read_frames and the pipeline exactly as
+watch_device runs them, into a recording UInput for the virtual gamepad or
+a named pipe standing in for /dev/hidg0 for the gadget.
+Every event is a press with a zero press duration so each one causes a press
+and a release write.
+
+Reports events/s, p50/p99 latency from event timestamp to the sink write, and memory
+per event. Results can be saved as a JSON baseline and later runs checked against it
+on the same box. Baselines are kept out of git since they only hold for the machine
+they were saved on:
+
+    python -m benchmarks.end_to_end --save-baseline
+    python -m benchmarks.end_to_end --check-baseline
+
+A capture recorded with --capture can be used as the input instead, replayed as fast
+as possible with the mapping it was recorded with:
+
+    python -m benchmarks.end_to_end --replay remote.cap --mapping-file samsung.yaml
+
+--report-interval sends the gadget's reports from the report pump instead, which adds
+the pump's sent, suppressed and coalesced counts and the lateness of its ticks.
+Latency is then measured up to the tick that sent the report, from the oldest event
+the report includes.
+"""
+import gc
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tracemalloc
+from pathlib import Path
+
+import structlog
+
+from remote_to_controller.capture import EV_SYN, HEADER, RECORD, ReplayDevice
+from remote_to_controller.debounce import ButtonDebouncer
+from remote_to_controller.frames import FrameAssembler
+from remote_to_controller.gadget_writer import HIDGadgetWriter
+from remote_to_controller.hid_report import ReportBuffer, ReportEncoder
+from remote_to_controller.latency import LatencyTracker
+from remote_to_controller.main import process_device
+from remote_to_controller.mapping_cache import load_yaml_to_model
+from remote_to_controller.models import MappingDefinition
+from remote_to_controller.pipeline import Pipeline
+from remote_to_controller.translation import compile_mapping
+from remote_to_controller.sinks import GadgetSink, VirtualSink
+
+from benchmarks.fakes import FifoEndpoint, RecordingUInput
+from benchmarks.sources import SyntheticDevice, synthetic_mapping
+
+MODES = ("virtual", "gadget")
+NUM_VALUES = {"virtual": 64, "gadget": 24}
+BASELINE = Path(__file__).parent / "baselines" / "end_to_end.json"
+MEMORY_SAMPLES = 500
+
+
+async def measure_memory(
+    pipeline: Pipeline, device: SyntheticDevice | ReplayDevice
+) -> dict[str, float]:
+    """
+    Peak traced bytes while handling a frame and blocks left allocated per event
+    """
+    assembler = FrameAssembler()
+    frames = []
+    try:
+        while len(frames) < MEMORY_SAMPLES:
+            frames.extend(assembler.feed(await device.async_read()))
+    except EOFError:
+        pass
+    frames = frames[:MEMORY_SAMPLES]
+
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    peak_total = 0
+    for frame in frames:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        pipeline.handle_frame(frame)
+        peak_total += tracemalloc.get_traced_memory()[1] - current
+        # Let the scheduled release fire so the next frame is a press again
+        await asyncio.sleep(0)
+    tracemalloc.stop()
+    gc.collect()
+    retained = sys.getallocatedblocks() - blocks
+
+    samples = max(len(frames), 1)
+    return {
+        "alloc_bytes_per_event": round(peak_total / samples, 1),
+        "retained_blocks_per_event": round(retained / samples, 3),
+    }
+
+
+def count_events(capture: Path) -> int:
+    """
+    Input events in a capture, not counting the SYN events between frames
+    """
+    data = capture.read_bytes()[HEADER.size :]
+    data = data[: len(data) // RECORD.size * RECORD.size]
+    return sum(1 for record in RECORD.iter_unpack(data) if record[2] != EV_SYN)
+
+
+async def run_mode(
+    mode: str,
+    total: int,
+    rate: float | None,
+    replay: tuple[Path, MappingDefinition] | None = None,
+    report_interval: float = 0,
+) -> dict[str, float]:
+    """
+    Run total events through the pipeline for one gamepad type,
+    or every event of the capture when replaying one
+    """
+    if replay is None:
+        mapping = synthetic_mapping(NUM_VALUES[mode], press_duration=0)
+        device = SyntheticDevice(NUM_VALUES[mode], total, rate=rate)
+    else:
+        capture, mapping = replay
+        device = ReplayDevice(capture, speed=0)
+        device.open()
+        total = count_events(capture)
+    virtual_codes = compile_mapping(mapping).virtual_codes
+    latency = LatencyTracker()
+
+    async with FifoEndpoint() as endpoint:
+        if mode == "virtual":
+            sink = VirtualSink(RecordingUInput(), virtual_codes)
+        else:
+            writer = HIDGadgetWriter(str(endpoint.path))
+            writer.open()
+            sink = GadgetSink(
+                writer, ReportBuffer(ReportEncoder()), report_interval=report_interval
+            )
+        pipeline = Pipeline(mapping, sink, ButtonDebouncer(0), latency)
+
+        start = time.perf_counter()
+        try:
+            await process_device(device, pipeline)
+        except EOFError:
+            pass
+        elapsed = time.perf_counter() - start
+
+        written = latency.stages["written"]
+        result = {
+            "events": total,
+            "events_per_second": round(total / elapsed),
+        }
+        if written.count:
+            result["p50_ms"] = round(written.percentile(0.5) * 1000, 3)
+            result["p99_ms"] = round(written.percentile(0.99) * 1000, 3)
+        if replay is None:
+            result.update(
+                await measure_memory(
+                    pipeline, SyntheticDevice(NUM_VALUES[mode], MEMORY_SAMPLES)
+                )
+            )
+        else:
+            device.close()
+            with ReplayDevice(replay[0], speed=0) as samples:
+                result.update(await measure_memory(pipeline, samples))
+        pipeline.close()
+
+        if mode == "gadget":
+            # Give the pump and the pipe reader a chance to send the last reports
+            await asyncio.sleep(report_interval + 0.01)
+            result["reports"] = endpoint.reports
+            result["dropped_reports"] = writer.dropped
+            if sink.pump is not None:
+                result["pump"] = sink.pump.summary()
+            sink.close()
+
+    return result
+
+
+def check_baseline(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Regressions of results compared to the baseline beyond the tolerance
+    """
+    regressions = []
+    for mode, result in results.items():
+        expected = baseline.get(mode)
+        if expected is None:
+            continue
+        if result["events_per_second"] < expected["events_per_second"] * (
+            1 - tolerance
+        ):
+            regressions.append(
+                f"{mode}: {result['events_per_second']} events/s,"
+                f" baseline {expected['events_per_second']}"
+            )
+        if (
+            "p99_ms" in result
+            and result["p99_ms"] > expected["p99_ms"] * (1 + tolerance) + 0.1
+        ):
+            regressions.append(
+                f"{mode}: p99 {result['p99_ms']} ms, baseline {expected['p99_ms']} ms"
+            )
+    return regressions
+
+
+def parse_arguments():
+    """
+    Parse command-line arguments.
+    """
+    parser = argparse.ArgumentParser(description="End to end pipeline benchmark")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=None,
+        help="Events per second, as fast as possible when not set",
+    )
+    parser.add_argument("--mode", choices=MODES, action="append")
+    parser.add_argument(
+        "--report-interval",
+        type=float,
+        default=0,
+        help="Milliseconds between the gadget's reports, each change sent when 0",
+    )
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--replay", type=Path, help="Capture file to use as the input")
+    parser.add_argument(
+        "--mapping-file", type=Path, help="Mapping yaml the capture was recorded with"
+    )
+    return parser.parse_args()
+
+
+def main():
+    """
+    Run the benchmark for each mode and print the results as JSON
+    """
+    args = parse_arguments()
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING)
+    )
+
+    replay = None
+    if args.replay:
+        if not args.mapping_file:
+            sys.exit("--replay needs the --mapping-file the capture was recorded with")
+        replay = (args.replay, load_yaml_to_model(args.mapping_file))
+
+    results = {
+        mode: asyncio.run(
+            run_mode(mode, args.events, args.rate, replay, args.report_interval / 1000)
+        )
+        for mode in args.mode or MODES
+    }
+    print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        BASELINE.parent.mkdir(exist_ok=True)
+        BASELINE.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"Saved baseline to {BASELINE}")
+
+    if args.check_baseline:
+        if not BASELINE.exists():
+            sys.exit(f"No baseline at {BASELINE}, save one on this machine first")
+        baseline = json.loads(BASELINE.read_text(encoding="utf-8"))
+        regressions = check_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Stand ins for the gamepad outputs
+"""
+import os
+import fcntl
+import asyncio
+import tempfile
+import contextlib
+from pathlib import Path
+
+# Linux: include/uapi/linux/fcntl.h
+F_SETPIPE_SZ = 1031
+PIPE_PAGE = 4096
+
+
+class RecordingUInput:
+    """
+    Stand in for evdev.UInput which counts what is written to it
+    """
+
+    def __init__(self):
+        self.presses = 0
+        self.releases = 0
+        self.syns = 0
+
+    def write(self, _event_type: int, _code: int, value: int):
+        """
+        Count button presses and releases
+        """
+        if value:
+            self.presses += 1
+        else:
+            self.releases += 1
+
+    def syn(self):
+        """
+        Count SYN_REPORTs
+        """
+        self.syns += 1
+
+    def close(self):
+        """
+        Nothing to close
+        """
+
+
+class FifoEndpoint:
+    """
+    Named pipe standing in for /dev/hidg0
+
+    A reader on the loop drains the pipe like a host polling the endpoint
+    and counts the reports that arrive. Without drain nothing reads the pipe,
+    like a host that stopped polling, so writes fail once the pipe is full.
+    The pipe is then shrunk to a page so it fills after about a thousand reports
+    rather than the default 64 KiB.
+    """
+
+    def __init__(self, report_length: int = 4, drain: bool = True):
+        self.report_length = report_length
+        self.drain = drain
+        self.bytes_read = 0
+        self._directory = tempfile.TemporaryDirectory()
+        self.path = Path(self._directory.name) / "hidg0"
+        self._fd: int | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def reports(self) -> int:
+        """
+        Number of whole reports read from the pipe
+        """
+        return self.bytes_read // self.report_length
+
+    async def __aenter__(self) -> "FifoEndpoint":
+        os.mkfifo(self.path)
+        # Read-write so the pipe never reports EOF while no writer has it open
+        self._fd = os.open(self.path, os.O_RDWR | os.O_NONBLOCK)
+        self._loop = asyncio.get_running_loop()
+        if self.drain:
+            self._loop.add_reader(self._fd, self._drain)
+        else:
+            with contextlib.suppress(OSError):
+                fcntl.fcntl(self._fd, F_SETPIPE_SZ, PIPE_PAGE)
+        return self
+
+    async def __aexit__(self, *_exc_info):
+        if self.drain:
+            self._drain()
+        if self._loop is not None and self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            os.close(self._fd)
+        self._directory.cleanup()
+
+    def _drain(self):
+        while self._fd is not None:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                return
+            if not data:
+                return
+            self.bytes_read += len(data)
@@ -0,0 +1,226 @@
+"""
+Applying the gamepad gadget to a temporary directory standing in for configfs
+
+A StandInGadget keeps its tree under a temporary directory, with a plain directory
+as the UDC class listing. Unlike configfs the directories hold plain files and
+the default groups like functions and configs aren't removed with their parent,
+so teardown removes those before each directory.
+
+first: apply to an empty tree, which creates and writes everything.
+again: apply the same model again, which reads the tree and writes nothing.
+changed: apply with a different serial number, which unbinds, writes one attribute
+and binds again.
+descriptor_changed: apply a report_desc with more axes to the bound gadget, which
+also unlinks the function from the configuration while writing it, since the stand-in
+refuses function attribute writes with EBUSY while linked like f_hid does.
+fewer_functions: apply a model with one HID function less than the bound gadget has,
+which unlinks and removes the function left over, alternating with adding it back.
+write_all: writing every attribute the way USBGadget did before apply,
+for comparison with again.
+remove_and_apply: tear the gadget down in reverse order and apply it again.
+"""
+import time
+import errno
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+import structlog
+
+from usb_device import USBGadget, create_composite_descriptor, models
+from usb_device.usb_gadget import GadgetChanges
+
+ROUNDS = 200
+
+
+class StandInGadget(USBGadget):
+    """
+    A gadget in a temporary directory
+
+    Like f_hid, a function's attributes can't be written while a configuration
+    links it.
+    """
+
+    def _write_value(self, relative: Path, value: str | bytes):
+        if relative.parts[0] == "functions":
+            function_path = (self.path / Path(*relative.parts[:2])).resolve()
+            for config_path in self._config_paths():
+                for link in config_path.iterdir():
+                    if link.is_symlink() and link.resolve() == function_path:
+                        raise OSError(errno.EBUSY, "Function is linked", str(link))
+        super()._write_value(relative, value)
+
+    def _rmdir(self, path: Path):
+        for entry in path.iterdir():
+            if entry.is_symlink() or entry.is_file():
+                entry.unlink()
+            else:
+                self._rmdir(entry)
+        path.rmdir()
+
+
+def gadget_model(
+    serial: str, num_axes: int = 2, num_functions: int = 1
+) -> models.USBGadgetModel:
+    """
+    The model create_gadget.py applies, with a chosen serial number, axes
+    and number of players
+    """
+    descriptor = create_composite_descriptor(24, num_axes)
+    return models.USBGadgetModel(
+        spec=models.GadgetSpec(
+            idVendor="0x1d6b",
+            idProduct="0x0104",
+            bcdDevice="0x0100",
+            bcdUSB="0x0200",
+        ),
+        strings=[
+            models.GadgetLocale(
+                strings=models.GadgetLocaleValues(
+                    product="BananaPI Gamepad",
+                    manufacturer="HomeMade",
+                    serialnumber=serial,
+                )
+            )
+        ],
+        functions=[
+            models.HIDFunction(
+                name=f"usb{index}",
+                subclass=models.HIDSubclass.NONE,
+                protocol=models.HIDProtocol.NONE,
+                report_length="8",
+                report_desc=descriptor,
+            )
+            for index in range(num_functions)
+        ],
+    )
+
+
+def write_all(gadget: USBGadget) -> int:
+    """
+    Write every attribute of the tree whether it changed or not,
+    leaving out the functions the stand-in won't write while they are linked
+    """
+    written = 0
+    for relative, value in gadget.desired_tree().attributes.items():
+        if relative.parts[0] != "functions":
+            gadget._write_value(relative, value)  # pylint: disable=protected-access
+            written += 1
+    return written
+
+
+def timed_us(function, rounds: int) -> tuple[float, object]:
+    """
+    Microseconds per call of function and its last result
+    """
+    result = None
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = function()
+    return round((time.perf_counter() - start) / rounds * 1e6, 1), result
+
+
+def writes(changes: GadgetChanges) -> int:
+    """
+    Directories, attributes and links an apply wrote
+    """
+    return len(changes.directories) + len(changes.attributes) + len(changes.links)
+
+
+def main():
+    """
+    Print the time and number of writes of each kind of apply
+    """
+    parser = argparse.ArgumentParser(description="Gadget apply benchmark")
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    args = parser.parse_args()
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING)
+    )
+
+    with tempfile.TemporaryDirectory() as temp:
+        udc_path = Path(temp) / "udc"
+        (udc_path / "stand-in.udc").mkdir(parents=True)
+        StandInGadget.UDC_CLASS_PATH = udc_path
+        base_path = Path(temp) / "usb_gadget"
+        models_by_serial = [gadget_model("12345"), gadget_model("67890")]
+
+        def first():
+            gadget = StandInGadget("bench", models_by_serial[0], base_path)
+            changes = gadget.apply()
+            gadget.remove()
+            return changes
+
+        first_us, first_changes = timed_us(first, args.rounds)
+
+        gadget = StandInGadget("bench", models_by_serial[0], base_path)
+        gadget.apply()
+        again_us, again_changes = timed_us(gadget.apply, args.rounds)
+        write_all_us, write_all_writes = timed_us(
+            lambda: write_all(gadget), args.rounds
+        )
+
+        def changed():
+            gadget.model = models_by_serial.pop(0)
+            models_by_serial.append(gadget.model)
+            return gadget.apply()
+
+        models_by_serial.append(models_by_serial.pop(0))
+        changed_us, changed_changes = timed_us(changed, args.rounds)
+
+        descriptor_models = [gadget_model("12345", 4), gadget_model("12345")]
+
+        def descriptor_changed():
+            gadget.model = descriptor_models.pop(0)
+            descriptor_models.append(gadget.model)
+            return gadget.apply()
+
+        descriptor_us, descriptor_changes = timed_us(descriptor_changed, args.rounds)
+
+        function_models = [gadget_model("12345", 2, 2), gadget_model("12345")]
+        leftover = gadget.path / "functions" / "hid.usb1"
+
+        def fewer_functions():
+            gadget.model = function_models.pop(0)
+            function_models.append(gadget.model)
+            changes = gadget.apply()
+            if len(gadget.model.functions) == 1 and leftover.exists():
+                raise AssertionError(f"{leftover} was left after removing its player")
+            return changes
+
+        fewer_us, _ = timed_us(fewer_functions, args.rounds)
+        gadget.model = gadget_model("12345", 2, 2)
+        gadget.apply()
+        gadget.model = gadget_model("12345")
+        fewer_changes = gadget.apply()
+
+        def remove():
+            gadget.remove()
+            gadget.apply()
+
+        remove_us, _ = timed_us(remove, args.rounds)
+
+        results = {
+            "first_us": first_us,
+            "first_writes": writes(first_changes),
+            "again_us": again_us,
+            "again_writes": writes(again_changes),
+            "changed_us": changed_us,
+            "changed_writes": writes(changed_changes),
+            "descriptor_changed_us": descriptor_us,
+            "descriptor_changed_writes": writes(descriptor_changes),
+            "fewer_functions_us": fewer_us,
+            "fewer_functions_removed": len(fewer_changes.stale_functions),
+            "write_all_us": write_all_us,
+            "write_all_writes": write_all_writes,
+            "remove_and_apply_us": remove_us,
+            "bound_after": gadget.bound_udc(),
+        }
+        gadget.remove()
+    for key, value in results.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
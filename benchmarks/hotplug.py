@@ -0,0 +1,172 @@
+"""
+Waiting for a remote to come back, against a temporary directory standing in for /dev/input
+
+wait_for_device is started on the stand-in directory, then event nodes are created
+in it the way udev creates them after a reconnect. Opening a node returns a fake
+device with the identity registered for it, so no input devices are needed.
+
+reconnect: an unrelated node appears first, then the remote on a new node,
+which has to be the one returned. The time from creating the node to it being
+returned is reported.
+in_use: two identical remotes without a uniq, the node another player has open
+appears first and has to be skipped without being opened.
+"""
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+import structlog
+from evdev import ecodes
+
+from remote_to_controller.hotplug import DeviceIdentity, wait_for_device
+
+ROUNDS = 50
+REMOTE = ("Smart Control 2016", {ecodes.EV_REL: [ecodes.REL_MISC]})
+OTHER = ("Other Keyboard", {ecodes.EV_KEY: [ecodes.KEY_A]})
+
+
+class FakeDevice:
+    """
+    Stand in for evdev.InputDevice with just what the identity reads
+    """
+
+    def __init__(self, path: str, name: str, capabilities: dict[int, list[int]]):
+        self.path = path
+        self.name = name
+        self.uniq = ""
+        self.phys = ""
+        self._capabilities = capabilities
+
+    def capabilities(self, absinfo: bool = True) -> dict[int, list[int]]:
+        """
+        The event types and codes the device sends
+        """
+        del absinfo
+        return self._capabilities
+
+    def close(self):
+        """
+        Nothing to close
+        """
+
+
+class StandInInput:
+    """
+    A temporary event directory and the devices behind its nodes
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.devices: dict[str, tuple[str, dict[int, list[int]]]] = {}
+        self.opened: list[str] = []
+
+    def add(self, name: str, device: tuple[str, dict[int, list[int]]]) -> str:
+        """
+        Create the node name for the device, returns its path
+        """
+        path = str(self.directory / name)
+        self.devices[path] = device
+        Path(path).touch()
+        return path
+
+    def open_device(self, path: str) -> FakeDevice:
+        """
+        Open a node like InputDevice, failing for nodes without a device
+        """
+        if path not in self.devices:
+            raise FileNotFoundError(path)
+        self.opened.append(path)
+        return FakeDevice(path, *self.devices[path])
+
+
+async def reconnect(directory: Path) -> float:
+    """
+    Seconds from the remote's node appearing to wait_for_device returning it
+    """
+    stand_in = StandInInput(directory)
+    identity = DeviceIdentity.from_device(FakeDevice("", *REMOTE))
+    waiting = asyncio.create_task(
+        wait_for_device(
+            identity, directory, open_device=stand_in.open_device, index=None
+        )
+    )
+    await asyncio.sleep(0.001)
+    stand_in.add("event7", OTHER)
+    await asyncio.sleep(0.001)
+    created = time.perf_counter()
+    path = stand_in.add("event9", REMOTE)
+    device = await waiting
+    elapsed = time.perf_counter() - created
+    if device.path != path:
+        raise AssertionError(f"Returned {device.path} rather than {path}")
+    return elapsed
+
+
+async def skip_in_use(directory: Path):
+    """
+    The node another player has open is skipped for the next identical one
+    """
+    stand_in = StandInInput(directory)
+    identity = DeviceIdentity.from_device(FakeDevice("", *REMOTE))
+    in_use = {str(directory / "event3")}
+    waiting = asyncio.create_task(
+        wait_for_device(
+            identity,
+            directory,
+            open_device=stand_in.open_device,
+            index=None,
+            in_use=lambda: in_use,
+        )
+    )
+    await asyncio.sleep(0.001)
+    stand_in.add("event3", REMOTE)
+    await asyncio.sleep(0.001)
+    path = stand_in.add("event4", REMOTE)
+    device = await waiting
+    if device.path != path:
+        raise AssertionError(f"Returned {device.path} rather than {path}")
+    if in_use & set(stand_in.opened):
+        raise AssertionError(f"Opened {in_use} although another player has it")
+
+
+async def run(rounds: int) -> list[float]:
+    """
+    Run both cases rounds times, each in a fresh directory
+    """
+    times = []
+    for _ in range(rounds):
+        with tempfile.TemporaryDirectory() as temp:
+            times.append(await reconnect(Path(temp)))
+        with tempfile.TemporaryDirectory() as temp:
+            await skip_in_use(Path(temp))
+    return times
+
+
+def main():
+    """
+    Print the reconnect time and fail if a wrong device was returned
+    """
+    parser = argparse.ArgumentParser(description="Hotplug benchmark")
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    args = parser.parse_args()
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING)
+    )
+    try:
+        times = sorted(asyncio.run(run(args.rounds)))
+    except AssertionError as error:
+        print(f"FAILED: {error}")
+        sys.exit(1)
+    print(
+        f"reconnect: p50 {times[len(times) // 2] * 1000:.3f} ms,"
+        f" max {times[-1] * 1000:.3f} ms over {len(times)} rounds"
+    )
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
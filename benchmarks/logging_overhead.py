@@ -0,0 +1,79 @@
+"""
+Cost of logging on the event path
+
+Runs the end to end benchmark under each logging setup with the output going to
+/dev/null, so only the cost of producing the lines is measured:
+
+before: structlog's default configuration, rendering every line in the caller
+sync: configure_logging at info, still rendering in the caller
+background: configure_logging at info, rendering on the writer thread
+warning: configure_logging at warning, hot path lines are skipped before being built
+"""
+import os
+import json
+import asyncio
+import argparse
+import contextlib
+
+import structlog
+
+from remote_to_controller.log_config import configure_logging
+
+from benchmarks.end_to_end import MODES, run_mode
+
+SETUPS = ("before", "sync", "background", "warning")
+
+
+def run_setup(setup: str, mode: str, total: int) -> dict[str, float]:
+    """
+    Run the benchmark for one gamepad type with the logging setup
+    """
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(
+        devnull
+    ):
+        writer = None
+        if setup == "before":
+            # Open every level gate, then put structlog's own defaults back
+            configure_logging("debug", stream=devnull)
+            structlog.reset_defaults()
+        else:
+            writer = configure_logging(
+                "warning" if setup == "warning" else "info",
+                background=setup == "background",
+                stream=devnull,
+            )
+        result = asyncio.run(run_mode(mode, total, None))
+        if writer is not None:
+            writer.stop(timeout=10)
+            result["dropped_lines"] = writer.dropped
+    structlog.reset_defaults()
+    return result
+
+
+def main():
+    """
+    Print events/s for every logging setup and gamepad type
+    """
+    parser = argparse.ArgumentParser(description="Logging overhead benchmark")
+    parser.add_argument("--events", type=int, default=10000)
+    args = parser.parse_args()
+
+    results = {}
+    for mode in MODES:
+        results[mode] = {}
+        for setup in SETUPS:
+            result = run_setup(setup, mode, args.events)
+            results[mode][setup] = {
+                "events_per_second": result["events_per_second"],
+                "p99_ms": result["p99_ms"],
+                **(
+                    {"dropped_lines": result["dropped_lines"]}
+                    if "dropped_lines" in result
+                    else {}
+                ),
+            }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
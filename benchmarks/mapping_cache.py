@@ -0,0 +1,83 @@
+"""
+Listing and loading a library of mappings with and without the mapping cache
+
+Copies of the bundled mapping fill a temporary directory, which is listed the way
+the selection table used to (parse and validate every file), then through the cache
+when it is cold, warm, and warm with one file changed.
+"""
+import time
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+import structlog
+
+from remote_to_controller.mapping import MAPPINGS_DIR
+from remote_to_controller.mapping_cache import MappingCache, load_yaml_to_model
+
+
+def make_library(directory: Path, count: int) -> list[Path]:
+    """
+    Write count renamed copies of the bundled mapping
+    """
+    template = next(MAPPINGS_DIR.glob("*.yaml")).read_text(encoding="utf-8")
+    name = template.split("\n", 1)[0]
+    paths = []
+    for number in range(count):
+        path = directory / f"remote_{number:04}.yaml"
+        path.write_text(template.replace(name, f"{name} {number}", 1), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def timed(function) -> float:
+    """
+    Milliseconds function takes
+    """
+    start = time.perf_counter()
+    function()
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def main():
+    """
+    Print how long listing the library takes each way
+    """
+    parser = argparse.ArgumentParser(description="Mapping cache benchmark")
+    parser.add_argument("--files", type=int, default=200)
+    args = parser.parse_args()
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING)
+    )
+
+    with tempfile.TemporaryDirectory() as temporary:
+        library = Path(temporary) / "mappings"
+        library.mkdir()
+        paths = make_library(library, args.files)
+        cache_dir = Path(temporary) / "cache"
+
+        results = {
+            "uncached_ms": timed(lambda: [load_yaml_to_model(path) for path in paths]),
+            "cold_ms": timed(lambda: MappingCache(cache_dir).index(library)),
+            # A new instance reads the index from disk like a fresh start does
+            "warm_ms": timed(lambda: MappingCache(cache_dir).index(library)),
+        }
+        paths[0].write_text(
+            paths[0].read_text(encoding="utf-8") + "\n", encoding="utf-8"
+        )
+        results["one_changed_ms"] = timed(
+            lambda: MappingCache(cache_dir).index(library)
+        )
+        results["load_uncached_ms"] = timed(lambda: load_yaml_to_model(paths[1]))
+        results["load_cached_ms"] = timed(
+            lambda: MappingCache(cache_dir).load(paths[1])
+        )
+
+    print(f"{args.files} mapping files")
+    for key, value in results.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Several players on one gadget, each with its own hidg endpoint
+
+Every player gets a paced synthetic remote, a pipeline and a GadgetSink writing to
+its own named pipe standing in for /dev/hidgN, run as one task per player like
+remote_to_controller does. With --stall the first player's pipe is never read,
+like a host that stopped polling that endpoint, and the other players
+should see the same latency and receive every report as when nothing stalls.
+
+    python -m benchmarks.players --players 4 --stall
+"""
+import json
+import time
+import asyncio
+import logging
+import argparse
+
+import structlog
+
+from remote_to_controller.debounce import ButtonDebouncer
+from remote_to_controller.gadget_writer import HIDGadgetWriter
+from remote_to_controller.hid_report import ReportBuffer, ReportEncoder
+from remote_to_controller.latency import LatencyTracker
+from remote_to_controller.main import process_device
+from remote_to_controller.pipeline import Pipeline
+from remote_to_controller.sinks import GadgetSink
+
+from benchmarks.fakes import FifoEndpoint
+from benchmarks.sources import SyntheticDevice, synthetic_mapping
+
+NUM_VALUES = 24
+
+
+async def run_player(
+    endpoint: FifoEndpoint, total: int, rate: float
+) -> tuple[LatencyTracker, HIDGadgetWriter, SyntheticDevice]:
+    """
+    Run total paced events through one player's pipeline into its endpoint
+    """
+    mapping = synthetic_mapping(NUM_VALUES, press_duration=0)
+    latency = LatencyTracker()
+    writer = HIDGadgetWriter(str(endpoint.path))
+    writer.open()
+    sink = GadgetSink(writer, ReportBuffer(ReportEncoder()))
+    pipeline = Pipeline(mapping, sink, ButtonDebouncer(0), latency)
+    device = SyntheticDevice(NUM_VALUES, total, rate=rate)
+    try:
+        await process_device(device, pipeline)
+    except EOFError:
+        pass
+    pipeline.close()
+    return latency, writer, device
+
+
+async def run(players: int, total: int, rate: float, stall: bool) -> dict:
+    """
+    Run every player at once and collect each one's results
+    """
+    endpoints = [
+        FifoEndpoint(ReportEncoder().report_length, drain=not (stall and slot == 0))
+        for slot in range(players)
+    ]
+    for endpoint in endpoints:
+        await endpoint.__aenter__()  # pylint: disable=unnecessary-dunder-call
+    try:
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(
+            *(run_player(endpoint, total, rate) for endpoint in endpoints)
+        )
+        elapsed = time.perf_counter() - start
+        # Let the pipe readers catch up with the last reports
+        await asyncio.sleep(0.01)
+
+        results = {"seconds": round(elapsed, 3)}
+        for slot, (latency, writer, device) in enumerate(outcomes):
+            written = latency.stages["written"]
+            results[f"player_{slot + 1}"] = {
+                "stalled": not endpoints[slot].drain,
+                "reports": endpoints[slot].reports,
+                "dropped_reports": writer.dropped,
+                "pending_reports": writer.pending,
+                "p50_ms": round(written.percentile(0.5) * 1000, 3),
+                "p99_ms": round(written.percentile(0.99) * 1000, 3),
+                "max_lag_ms": round(device.max_lag * 1000, 3),
+            }
+            writer.close()
+    finally:
+        for endpoint in endpoints:
+            await endpoint.__aexit__(None, None, None)
+    return results
+
+
+def main():
+    """
+    Print each player's results as JSON
+    """
+    parser = argparse.ArgumentParser(description="Players benchmark")
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=1000, help="Events per second")
+    parser.add_argument(
+        "--stall", action="store_true", help="Never read the first player's endpoint"
+    )
+    args = parser.parse_args()
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(logging.ERROR)
+    )
+    results = asyncio.run(run(args.players, args.events, args.rate, args.stall))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
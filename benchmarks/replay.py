@@ -0,0 +1,121 @@
+"""
+Replaying a capture at different speeds, against a capture written to a temporary file
+
+The capture holds presses of a few buttons, each followed by the repeat the remote
+sends for a single press a few milliseconds later. Replayed at speed 1 and as fast
+as possible, the debouncer has to drop exactly the repeats and accept the same
+presses in the same order, since it works from the captured timestamps.
+The time each replay took is reported.
+"""
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+import structlog
+from evdev import InputEvent, ecodes
+
+from remote_to_controller.capture import CaptureWriter, ReplayDevice
+from remote_to_controller.debounce import ButtonDebouncer
+from remote_to_controller.main import process_device
+from remote_to_controller.pipeline import Pipeline
+from remote_to_controller.sinks import VirtualSink
+from remote_to_controller.translation import compile_mapping
+
+from benchmarks.fakes import RecordingUInput
+from benchmarks.sources import synthetic_mapping
+
+NUM_VALUES = 3
+PRESSES = 30
+# Seconds between presses and from a press to its repeat
+PRESS_GAP = 0.04
+REPEAT_GAP = 0.005
+DEBOUNCE_TIME = 0.02
+SPEEDS = (1.0, 0.0)
+
+
+class RecordingDebouncer(ButtonDebouncer):
+    """
+    Keeps the buttons of the presses it accepts in order
+    """
+
+    def __init__(self, interval: float):
+        super().__init__(interval)
+        self.accepted: list[int] = []
+
+    def accept(self, button: int, timestamp: float) -> bool:
+        accepted = super().accept(button, timestamp)
+        if accepted:
+            self.accepted.append(button)
+        return accepted
+
+
+def write_capture(path: Path, start: float) -> list[int]:
+    """
+    Capture every press and its repeat, returns the values pressed
+    """
+    pressed = []
+    events = []
+    for press in range(PRESSES):
+        value = press % NUM_VALUES
+        pressed.append(value)
+        for stamp in (
+            start + press * PRESS_GAP,
+            start + press * PRESS_GAP + REPEAT_GAP,
+        ):
+            sec = int(stamp)
+            usec = int((stamp - sec) * 1_000_000)
+            events.append(InputEvent(sec, usec, ecodes.EV_REL, ecodes.REL_MISC, value))
+            events.append(InputEvent(sec, usec, ecodes.EV_SYN, ecodes.SYN_REPORT, 0))
+    with CaptureWriter(path) as writer:
+        writer.write(events)
+    return pressed
+
+
+async def replay(path: Path, speed: float) -> tuple[list[int], float]:
+    """
+    The buttons the debouncer accepted replaying at speed and the seconds it took
+    """
+    mapping = synthetic_mapping(NUM_VALUES, press_duration=0)
+    debouncer = RecordingDebouncer(DEBOUNCE_TIME)
+    sink = VirtualSink(RecordingUInput(), compile_mapping(mapping).virtual_codes)
+    device = ReplayDevice(path, speed)
+    pipeline = Pipeline(mapping, sink, debouncer, time_scale=device.time_scale)
+    start = time.perf_counter()
+    try:
+        with device:
+            await process_device(device, pipeline)
+    except EOFError:
+        pass
+    pipeline.close()
+    return debouncer.accepted, time.perf_counter() - start
+
+
+def main():
+    """
+    Print how long each replay took and fail if their presses differ
+    """
+    parser = argparse.ArgumentParser(description="Replay benchmark")
+    parser.parse_args()
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING)
+    )
+    with tempfile.TemporaryDirectory() as temp:
+        path = Path(temp) / "remote.cap"
+        pressed = write_capture(path, time.time() - 3600)
+        for speed in SPEEDS:
+            accepted, elapsed = asyncio.run(replay(path, speed))
+            print(f"speed {speed:g}: {len(accepted)} presses in {elapsed:.3f} s")
+            if accepted != pressed:
+                print(
+                    f"FAILED: speed {speed:g} accepted {accepted} rather than {pressed}"
+                )
+                sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
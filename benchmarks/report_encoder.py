@@ -0,0 +1,63 @@
+"""
+Compare the precompiled report table against the original bit-packing loop
+"""
+import timeit
+
+from remote_to_controller.hid_report import ReportEncoder, ReportBuffer
+
+NUMBER = 200_000
+
+
+def bit_packed_report(translated_event: int) -> bytearray:
+    """
+    The report building the gadget path used before the precompiled table
+    """
+    buttons_state = [False] * 24
+    buttons_state[translated_event] = True
+
+    report_bytes = bytearray([0x01])
+    current_byte = 0x00
+    for i, button in enumerate(buttons_state):
+        if button:
+            current_byte |= 1 << (i % 8)
+        if (i + 1) % 8 == 0:
+            report_bytes.append(current_byte)
+            current_byte = 0x00
+    while len(report_bytes) < 4:
+        report_bytes.append(0x00)
+    return report_bytes
+
+
+def main():
+    """
+    Run the benchmark and print the time per report
+    """
+    encoder = ReportEncoder()
+    buffer = ReportBuffer(encoder)
+
+    for index in range(24):
+        assert bit_packed_report(index) == encoder.press_report(index)
+
+    def table_report():
+        return encoder.press_reports[13]
+
+    def buffer_report():
+        buffer.set(13)
+        buffer.clear(13)
+        return buffer.buffer
+
+    results = {
+        "bit packing loop": timeit.timeit(lambda: bit_packed_report(13), number=NUMBER),
+        "precompiled table": timeit.timeit(table_report, number=NUMBER),
+        "report buffer set/clear": timeit.timeit(buffer_report, number=NUMBER),
+    }
+    baseline = results["bit packing loop"]
+    for name, seconds in results.items():
+        print(
+            f"{name:<24} {seconds / NUMBER * 1e9:10.1f} ns/report"
+            f" {baseline / seconds:8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Parsing the gamepad descriptor and packing reports from its layout
+
+parse: parse_report_descriptor against the byte counting calculate_report_length
+create_gadget.py used before, which only worked for one byte items.
+pack: the ReportPacker struct against writing the mask bytes into the buffer by slice,
+which is what ReportBuffer did before it packed from the layout.
+"""
+import timeit
+import logging
+import argparse
+
+import structlog
+
+from remote_to_controller.hid_report import ReportBuffer, ReportEncoder
+from usb_device import create_gamepad_descriptor, parse_report_descriptor, models
+
+NUMBER = 100_000
+
+
+def byte_counting_length(descriptor: bytes) -> int:
+    """
+    The report length calculation create_gadget.py used before the parser
+    """
+    total_bits = 0
+    report_size = 0
+    i = 0
+    while i < len(descriptor):
+        if descriptor[i] == models.HIDFieldType.REPORT_SIZE.value:
+            i += 1
+            report_size = descriptor[i]
+        elif descriptor[i] == models.HIDFieldType.REPORT_COUNT.value:
+            i += 1
+            total_bits += report_size * descriptor[i]
+        i += 1
+    return total_bits // 8
+
+
+def per_call_ns(function, number: int) -> float:
+    """
+    Nanoseconds per call of function
+    """
+    return round(timeit.timeit(function, number=number) / number * 1e9, 1)
+
+
+def main():
+    """
+    Print the time per parse and per packed report
+    """
+    parser = argparse.ArgumentParser(description="Report layout benchmark")
+    parser.add_argument("--number", type=int, default=NUMBER)
+    parser.add_argument("--axes", type=int, default=2)
+    args = parser.parse_args()
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING)
+    )
+
+    descriptor = create_gamepad_descriptor(24, args.axes)
+    encoder = ReportEncoder(num_axes=args.axes)
+    buffer = ReportBuffer(encoder)
+    axis_offset = 1 + (encoder.num_buttons + 7) // 8
+    slice_buffer = bytearray(encoder.release_report)
+
+    def slice_pack():
+        slice_buffer[1:axis_offset] = (0x2001).to_bytes(axis_offset - 1, "little")
+
+    results = {
+        "descriptor_bytes": len(descriptor),
+        "report_length": parse_report_descriptor(descriptor).input_length,
+        "byte_counting_length": byte_counting_length(descriptor),
+        "parse_ns": per_call_ns(
+            lambda: parse_report_descriptor(descriptor), args.number // 10
+        ),
+        "byte_counting_ns": per_call_ns(
+            lambda: byte_counting_length(descriptor), args.number // 10
+        ),
+        "slice_pack_ns": per_call_ns(slice_pack, args.number),
+        "buffer_set_mask_ns": per_call_ns(lambda: buffer.set_mask(0x2001), args.number),
+        "packer_pack_ns": per_call_ns(
+            lambda: encoder.packer.pack(0x2001, buffer.axes), args.number
+        ),
+    }
+    for key, value in results.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
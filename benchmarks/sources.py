@@ -0,0 +1,102 @@
+"""
+In memory input for driving the pipeline without a remote
+"""
+import time
+import asyncio
+
+from evdev import InputEvent, ecodes
+
+from remote_to_controller.models import Event, Mapping, MappingDefinition
+
+
+def synthetic_mapping(
+    num_values: int, press_duration: float = 0.2
+) -> MappingDefinition:
+    """
+    A mapping with a distinct key for each remote value from 0 to num_values - 1
+    """
+    names = []
+    for code in sorted(ecodes.KEY)[1 : num_values + 1]:
+        name = ecodes.KEY[code]
+        names.append(name[0] if isinstance(name, (list, tuple)) else name)
+
+    return MappingDefinition(
+        name="Synthetic",
+        description="Benchmark mapping",
+        event=Event(type="EV_REL", code="REL_MISC"),
+        press_duration=press_duration,
+        mappings=[
+            Mapping(event_code=name, remote_value=value, description=name)
+            for value, name in enumerate(names)
+        ],
+    )
+
+
+class SyntheticDevice:
+    """
+    Stand in for evdev.InputDevice that produces remote button frames
+
+    Each frame is a REL_MISC event followed by SYN_REPORT like the remote sends.
+    Values cycle through range(num_values). With a rate the frames are paced
+    in real time and stamped with their due time, without one they are produced
+    as fast as they are read and stamped when read.
+    EOFError is raised once total frames have been read.
+    """
+
+    path = "synthetic"
+
+    def __init__(
+        self,
+        num_values: int,
+        total: int,
+        rate: float | None = None,
+        batch_size: int = 1,
+    ):
+        self.num_values = num_values
+        self.total = total
+        self.rate = rate
+        self.batch_size = batch_size
+        self.sent = 0
+        self.max_lag = 0.0
+        self._start: float | None = None
+
+    async def async_read(self) -> list[InputEvent]:
+        """
+        The next batch of events, matching InputDevice.async_read
+        """
+        if self.sent >= self.total:
+            raise EOFError("Synthetic source exhausted")
+
+        loop = asyncio.get_running_loop()
+        if self._start is None:
+            self._start = loop.time()
+
+        due = time.time()
+        if self.rate:
+            deadline = self._start + self.sent / self.rate
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lag = loop.time() - deadline
+            self.max_lag = max(self.max_lag, lag)
+            due = time.time() - max(lag, 0)
+        else:
+            # Let timers such as scheduled releases run between batches
+            await asyncio.sleep(0)
+
+        sec = int(due)
+        usec = int((due - sec) * 1_000_000)
+        events = []
+        for _ in range(min(self.batch_size, self.total - self.sent)):
+            events.append(
+                InputEvent(
+                    sec,
+                    usec,
+                    ecodes.EV_REL,
+                    ecodes.REL_MISC,
+                    self.sent % self.num_values,
+                )
+            )
+            events.append(InputEvent(sec, usec, ecodes.EV_SYN, ecodes.SYN_REPORT, 0))
+            self.sent += 1
+        return events
@@ -0,0 +1,139 @@
+"""
+Cold start budget of the remote_to_controller entry point
+
+Starts the entry point in a fresh interpreter on the non-interactive path,
+--mapping-file with a capture standing in for --device and a file standing in for
+the hidg endpoint, and measures:
+
+import_ms: importing remote_to_controller.main
+armed_ms: from starting the interpreter until the first read of the input is awaited
+
+Each is the median of several runs after a warm up run that fills the mapping cache.
+Exits with an error if either is over its budget.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+BUDGET_IMPORT_MS = 500
+BUDGET_ARMED_MS = 1000
+MAPPING_FILE = next(
+    (Path(__file__).parent.parent / "remote_to_controller" / "mappings").glob("*.yaml")
+)
+
+
+def child(capture: str, endpoint: str):
+    """
+    Run the entry point, reporting the import time and exiting once the reader is armed
+    """
+    start = time.perf_counter()
+    # pylint: disable=import-outside-toplevel
+    from remote_to_controller import main as entry_point
+    from remote_to_controller.capture import ReplayDevice
+
+    print(f"import {(time.perf_counter() - start) * 1000}", flush=True)
+
+    async def armed(_device):
+        print("armed", flush=True)
+        raise EOFError
+
+    ReplayDevice.async_read = armed
+    sys.argv = [
+        "remote_to_controller",
+        "--mapping-file",
+        str(MAPPING_FILE),
+        "--replay",
+        capture,
+        "--gamepad-type",
+        "gadget",
+        "--hid-endpoint",
+        endpoint,
+        "--log-level",
+        "warning",
+    ]
+    entry_point.main()
+
+
+def measure(capture: Path, endpoint: Path, cache_dir: Path) -> tuple[float, float]:
+    """
+    Start a child and return its import and armed times in milliseconds
+    """
+    environment = dict(os.environ, XDG_CACHE_HOME=str(cache_dir))
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.startup",
+            "--child",
+            str(capture),
+            str(endpoint),
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        env=environment,
+        cwd=Path(__file__).parent.parent,
+    )
+    import_ms = armed_ms = None
+    for line in process.stdout:
+        if line.startswith("import "):
+            import_ms = float(line.split()[1])
+        elif line.startswith("armed"):
+            armed_ms = (time.perf_counter() - start) * 1000
+    process.wait()
+    if import_ms is None or armed_ms is None:
+        raise RuntimeError(
+            f"Entry point exited with {process.returncode} before arming"
+        )
+    return import_ms, armed_ms
+
+
+def main():
+    """
+    Measure the start up and check it against the budget
+    """
+    parser = argparse.ArgumentParser(description="Start up benchmark")
+    parser.add_argument("--child", nargs=2, metavar=("CAPTURE", "ENDPOINT"))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-import-ms", type=float, default=BUDGET_IMPORT_MS)
+    parser.add_argument("--budget-armed-ms", type=float, default=BUDGET_ARMED_MS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    # Imported here so the child's import time covers the whole package
+    # pylint: disable-next=import-outside-toplevel
+    from remote_to_controller.capture import HEADER, MAGIC, RECORD, VERSION
+
+    with tempfile.TemporaryDirectory() as temporary:
+        capture = Path(temporary) / "empty.cap"
+        capture.write_bytes(HEADER.pack(MAGIC, VERSION, RECORD.size))
+        endpoint = Path(temporary) / "hidg"
+        endpoint.touch()
+        cache_dir = Path(temporary) / "cache"
+
+        cold_import_ms, cold_armed_ms = measure(capture, endpoint, cache_dir)
+        runs = [measure(capture, endpoint, cache_dir) for _ in range(args.runs)]
+
+    import_ms = statistics.median(run[0] for run in runs)
+    armed_ms = statistics.median(run[1] for run in runs)
+    print(f"cold cache: import {cold_import_ms:.1f} ms, armed {cold_armed_ms:.1f} ms")
+    print(f"import {import_ms:.1f} ms (budget {args.budget_import_ms:.0f} ms)")
+    print(f"armed {armed_ms:.1f} ms (budget {args.budget_armed_ms:.0f} ms)")
+
+    if import_ms > args.budget_import_ms or armed_ms > args.budget_armed_ms:
+        print("FAILED: over the start up budget")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Throughput target for the event path
+
+Feeds a paced 1 kHz stream of remote event frames through the pipeline and the
+virtual sink and checks that every press makes it to the gamepad.
+Each remote value comes round again only after the debounce interval so any
+missing press is a real drop rather than a debounced repeat.
+"""
+import sys
+import time
+import asyncio
+import logging
+
+import structlog
+
+from remote_to_controller.debounce import ButtonDebouncer
+from remote_to_controller.main import process_device
+from remote_to_controller.pipeline import Pipeline
+from remote_to_controller.translation import compile_mapping
+from remote_to_controller.sinks import VirtualSink
+
+from benchmarks.fakes import RecordingUInput
+from benchmarks.sources import SyntheticDevice, synthetic_mapping
+
+TARGET_RATE = 1000
+DURATION = 2.0
+DEBOUNCE_TIME = 0.2
+PRESS_DURATION = 0.05
+NUM_VALUES = 250
+
+
+async def run(rate: float | None) -> dict[str, float]:
+    """
+    Send events at rate per second, or as fast as possible when rate is None
+    """
+    mapping = synthetic_mapping(NUM_VALUES, press_duration=PRESS_DURATION)
+    virtual_codes = compile_mapping(mapping).virtual_codes
+    virtual_gp = RecordingUInput()
+    pipeline = Pipeline(
+        mapping, VirtualSink(virtual_gp, virtual_codes), ButtonDebouncer(DEBOUNCE_TIME)
+    )
+    total = int(TARGET_RATE * DURATION)
+    device = SyntheticDevice(NUM_VALUES, total, rate=rate)
+
+    start = time.perf_counter()
+    try:
+        await process_device(device, pipeline)
+    except EOFError:
+        pass
+    elapsed = time.perf_counter() - start
+    pipeline.close()
+
+    return {
+        "events": total,
+        "presses": virtual_gp.presses,
+        "drops": total - virtual_gp.presses,
+        "events_per_second": total / elapsed,
+        "max_lag_ms": device.max_lag * 1000,
+    }
+
+
+def main():
+    """
+    Run the paced and unpaced benchmark and check the target
+    """
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING)
+    )
+    paced = asyncio.run(run(TARGET_RATE))
+    unpaced = asyncio.run(run(None))
+
+    print(
+        f"paced {TARGET_RATE} Hz: {paced['presses']}/{paced['events']} presses,"
+        f" {paced['drops']} drops, max lag {paced['max_lag_ms']:.2f} ms"
+    )
+    print(f"unpaced: {unpaced['events_per_second']:.0f} events/s")
+
+    if paced["drops"] or unpaced["events_per_second"] < TARGET_RATE:
+        print(f"FAILED: target is {TARGET_RATE} events/s with no drops")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
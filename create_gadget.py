@@ -4,44 +4,41 @@ Create a USB Gamepad Device
 from structlog import get_logger
 
 
-from usb_device import USBGadget, models, create_gamepad_descriptor
+from usb_device import (
+    USBGadget,
+    models,
+    create_composite_descriptor,
+    parse_report_descriptor,
+)
 
 log = get_logger()
 
+NUM_BUTTONS = 24
+# Run remote_to_controller with --gadget-axes set to the same number
+NUM_AXES = 0
+# Add a keyboard and a consumer control to the same endpoint,
+# run remote_to_controller with --gadget-keyboard and --gadget-consumer to match
+KEYBOARD = False
+CONSUMER = False
+# A HID function per player, /dev/hidg0 to /dev/hidgN,
+# run remote_to_controller with a --device and --hid-endpoint for each
+NUM_PLAYERS = 1
+
 
 def calculate_report_length(descriptor: bytes) -> int:
     """
     We need to define the length of the reports that get sent with the button press data
-    """
-    total_bits = 0
-    descriptor_length = len(descriptor)
-    i = 0
-
-    report_size = 0
-    while i < descriptor_length:
-        # Check if current byte matches REPORT_SIZE
-        if descriptor[i] == models.HIDFieldType.REPORT_SIZE.value:
-            # Move to next byte to get the size value
-            i += 1
-            report_size = descriptor[i]  # This gives the size in bits
-        elif descriptor[i] == models.HIDFieldType.REPORT_COUNT.value:
-            # Move to next byte to get the count value
-            i += 1
-            report_count = descriptor[i]
 
-            # Accumulate total bits
-            total_bits += report_size * report_count
-        i += 1
-
-    # Convert total bits to bytes
-    total_bytes = total_bits // 8
-    return total_bytes
+    This is the longest input report the descriptor defines, Report ID included
+    """
+    return parse_report_descriptor(descriptor).input_length
 
 
-def setup_gamepad_gadget(descriptor):
+def setup_gamepad_gadget(descriptor, num_players: int = 1):
     """
     Create a gamepad gadet to be used in USB host mode
-    This will setup /dev/hidg0 as device to send data to
+    This will setup /dev/hidg0 as device to send data to,
+    and a /dev/hidgN for each further player
 
     """
     report_length = calculate_report_length(descriptor)
@@ -67,20 +64,25 @@ def setup_gamepad_gadget(descriptor):
         ],
         functions=[
             models.HIDFunction(
+                name=f"usb{player}",
                 subclass=models.HIDSubclass.NONE,
                 protocol=models.HIDProtocol.NONE,
                 report_length=str(report_length),
                 report_desc=descriptor,
             )
+            for player in range(num_players)
         ],
     )
     # Create a new USBGadget instance
     joystick_gadget = USBGadget(gadget_name="my_gamepad", model=joystick_model)
 
-    # Create the gadget directory in sysfs
-    joystick_gadget.activate()
+    # Create or update the gadget in configfs and bind it to the UDC,
+    # running this again only writes what changed
+    joystick_gadget.apply()
 
 
-descriptors = create_gamepad_descriptor(24)
+DESCRIPTORS = create_composite_descriptor(
+    NUM_BUTTONS, NUM_AXES, keyboard=KEYBOARD, consumer=CONSUMER
+)
 # Run the function to set up the gadget
-setup_gamepad_gadget(descriptors)
+setup_gamepad_gadget(DESCRIPTORS, NUM_PLAYERS)
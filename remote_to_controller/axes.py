@@ -0,0 +1,99 @@
+"""
+Driving gamepad axes from relative motion
+
+A remote's pointer reports motion far more often than a host polls a gamepad,
+so the motion is summed over an interval and written as the axis deflection
+at most rate times a second. The stick returns to the centre once motion stops.
+"""
+import asyncio
+from typing import Callable, Sequence
+
+from structlog import get_logger
+
+log = get_logger()
+
+# Range of a signed 8 bit axis, shared by uinput and the gadget report
+AXIS_MIN = -127
+AXIS_MAX = 127
+
+
+def clamp_axis(value: float) -> int:
+    """
+    Round a deflection into the axis range
+    """
+    return max(AXIS_MIN, min(AXIS_MAX, round(value)))
+
+
+class AxisAccumulator:
+    """
+    Sums motion per axis and emits the deflections on a bounded rate
+
+    The first motion after the axes went idle is emitted as soon as its frame ends,
+    after that emissions are at least an interval apart and carry the motion summed
+    since the previous one. on_emit is only called when a deflection changed.
+    """
+
+    def __init__(
+        self,
+        num_axes: int,
+        rate: float,
+        on_emit: Callable[[Sequence[int]], None],
+        loop: asyncio.AbstractEventLoop | None = None,
+    ):
+        if rate <= 0:
+            raise ValueError("Axis rate should be above 0.")
+        self.interval = 1 / rate
+        self.on_emit = on_emit
+        self._loop = loop
+        self._sums = [0.0] * num_axes
+        self._emitted = (0,) * num_axes
+        self._last_emit = float("-inf")
+        self._timer: asyncio.TimerHandle | None = None
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        return self._loop
+
+    def add(self, axis: int, delta: float):
+        """
+        Accumulate motion on the axis until the next emission
+        """
+        self._sums[axis] += delta
+
+    def frame_done(self):
+        """
+        Emit now if the axes were idle long enough, otherwise make sure a tick is due
+        """
+        if self._timer is not None:
+            return
+        loop = self._get_loop()
+        delay = self._last_emit + self.interval - loop.time()
+        if delay <= 0:
+            self._tick()
+        else:
+            self._timer = loop.call_later(delay, self._tick)
+
+    def _tick(self):
+        self._timer = None
+        values = tuple(clamp_axis(total) for total in self._sums)
+        self._sums = [0.0] * len(self._sums)
+        if values != self._emitted:
+            self._emitted = values
+            self._last_emit = self._get_loop().time()
+            self.on_emit(values)
+        if any(values):
+            # Keep ticking while deflected so the stick centres when motion stops
+            self._timer = self._get_loop().call_later(self.interval, self._tick)
+
+    def reset(self):
+        """
+        Drop pending motion and centre the axes
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._sums = [0.0] * len(self._sums)
+        if any(self._emitted):
+            self._emitted = (0,) * len(self._emitted)
+            self.on_emit(self._emitted)
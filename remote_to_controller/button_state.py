@@ -0,0 +1,54 @@
+"""
+Shared state of the gamepad buttons
+"""
+from typing import Callable
+
+from structlog import get_logger
+
+log = get_logger()
+
+
+class ButtonState:
+    """
+    Register of which buttons are held, stored as an integer bitmask
+
+    Bit n is the button at index n of the mapping, the same index the gadget report uses.
+    Presses and releases update the mask and only an actual change is passed
+    on to the sink as the previous and current mask, so holding one button
+    while pressing another keeps both held.
+    """
+
+    def __init__(self, num_buttons: int, on_change: Callable[[int, int], None]):
+        self.num_buttons = num_buttons
+        self.on_change = on_change
+        self.mask = 0
+
+    def _bit(self, index: int) -> int:
+        if not 0 <= index < self.num_buttons:
+            raise ValueError(
+                f"Position must be between 0 and {self.num_buttons - 1} inclusive."
+            )
+        return 1 << index
+
+    def press(self, index: int) -> bool:
+        """
+        Hold the button at index, returns whether the state changed
+        """
+        return self.set_mask(self.mask | self._bit(index))
+
+    def release(self, index: int) -> bool:
+        """
+        Release the button at index, returns whether the state changed
+        """
+        return self.set_mask(self.mask & ~self._bit(index))
+
+    def set_mask(self, mask: int) -> bool:
+        """
+        Replace the whole state, returns whether it changed
+        """
+        previous = self.mask
+        if mask == previous:
+            return False
+        self.mask = mask
+        self.on_change(previous, mask)
+        return True
@@ -0,0 +1,234 @@
+"""
+Capturing the raw events of a device and replaying them
+
+A capture is a short header followed by one fixed size record per input event,
+the fields of struct input_event in little endian so captures move between machines.
+Replays map the file rather than reading it so hours of events cost no memory.
+"""
+import os
+import mmap
+import time
+import struct
+import asyncio
+from pathlib import Path
+from typing import Iterable
+
+from evdev import InputDevice, InputEvent, ecodes
+from structlog import get_logger
+
+log = get_logger()
+
+EV_SYN = ecodes.ecodes["EV_SYN"]
+SYN_REPORT = ecodes.ecodes["SYN_REPORT"]
+
+MAGIC = b"RTCEVT"
+VERSION = 1
+# magic, format version, record size
+HEADER = struct.Struct("<6sHH")
+# struct input_event { struct timeval time; __u16 type; __u16 code; __s32 value; }
+RECORD = struct.Struct("<qqHHi")
+
+# Most records returned by one read when replaying as fast as possible
+MAX_BATCH = 64
+
+
+def _header() -> bytes:
+    return HEADER.pack(MAGIC, VERSION, RECORD.size)
+
+
+class CaptureWriter:
+    """
+    Appends events to a capture file, creating it with a header when new
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.events = 0
+        self._file = None
+
+    def open(self):
+        """
+        Open the file for appending, checking an existing file is a capture
+        """
+        file = open(self.path, "ab")
+        if file.tell() == 0:
+            file.write(_header())
+        else:
+            with open(self.path, "rb") as existing:
+                if existing.read(HEADER.size) != _header():
+                    file.close()
+                    raise ValueError(f"{self.path} is not a compatible capture file")
+        self._file = file
+        log.info("Capturing events", path=str(self.path))
+
+    def close(self):
+        """
+        Flush and close the file
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            log.info("Capture closed", path=str(self.path), events=self.events)
+
+    def __enter__(self) -> "CaptureWriter":
+        self.open()
+        return self
+
+    def __exit__(self, *_exc_info):
+        self.close()
+
+    def write(self, events: Iterable[InputEvent]):
+        """
+        Append the events, flushed so a crash doesn't lose the events leading up to it
+        """
+        data = b"".join(
+            RECORD.pack(event.sec, event.usec, event.type, event.code, event.value)
+            for event in events
+        )
+        self._file.write(data)
+        self._file.flush()
+        self.events += len(data) // RECORD.size
+
+
+class CapturingDevice:
+    """
+    Wraps a device so every batch read from it is also written to a capture
+    """
+
+    def __init__(self, device: InputDevice, writer: CaptureWriter):
+        self.device = device
+        self.writer = writer
+
+    @property
+    def path(self) -> str:
+        """
+        Path of the wrapped device
+        """
+        return self.device.path
+
+    async def async_read(self) -> list[InputEvent]:
+        """
+        Read a batch from the device and capture it
+        """
+        events = list(await self.device.async_read())
+        self.writer.write(events)
+        return events
+
+
+class ReplayDevice:
+    """
+    Stand in for evdev.InputDevice that reads the events of a capture
+
+    With a speed the events are delivered at their captured spacing divided by speed,
+    a speed of 0 replays as fast as the pipeline reads. Events keep their captured
+    timestamps so debouncing sees the gaps the remote sent them with at any speed,
+    latency is measured from when the frames are read instead.
+    EOFError is raised at the end of the capture.
+    """
+
+    def __init__(self, path: Path, speed: float = 1.0):
+        self.path = str(path)
+        self.speed = speed
+        self.offset = HEADER.size
+        self._map: mmap.mmap | None = None
+        self._end = 0
+        self._first: float | None = None
+        self._start = 0.0
+
+    def open(self):
+        """
+        Map the capture file
+        """
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            size = os.fstat(fd).st_size
+            if size < HEADER.size:
+                raise ValueError(f"{self.path} is not a capture file")
+            self._map = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+
+        if self._map[: HEADER.size] != _header():
+            self.close()
+            raise ValueError(f"{self.path} is not a compatible capture file")
+        self._map.madvise(mmap.MADV_SEQUENTIAL)
+        # A capture cut off mid write ends with part of a record
+        self._end = HEADER.size + (size - HEADER.size) // RECORD.size * RECORD.size
+        log.info(
+            "Replaying capture",
+            path=self.path,
+            events=(self._end - HEADER.size) // RECORD.size,
+            speed=self.speed,
+        )
+
+    def close(self):
+        """
+        Unmap the capture file
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def __enter__(self) -> "ReplayDevice":
+        self.open()
+        return self
+
+    def __exit__(self, *_exc_info):
+        self.close()
+
+    @property
+    def time_scale(self) -> float:
+        """
+        How much the replay shortens the captured gaps, press durations are scaled
+        by it to match. As fast as possible keeps them, presses closer than
+        the press duration then extend a single hold.
+        """
+        return 1 / self.speed if self.speed else 1.0
+
+    def _captured_time(self, offset: int) -> float:
+        sec, usec, *_ = RECORD.unpack_from(self._map, offset)
+        return sec + usec / 1_000_000
+
+    def _due(self, captured: float) -> float:
+        return self._start + (captured - self._first) / self.speed
+
+    async def async_read(self) -> list[InputEvent]:
+        """
+        The events due by now, matching InputDevice.async_read
+        """
+        if self._map is None:
+            raise RuntimeError("Replay is not open")
+        if self.offset >= self._end:
+            raise EOFError("End of capture")
+
+        if not self.speed:
+            await asyncio.sleep(0)
+            return self._read(MAX_BATCH)
+
+        if self._first is None:
+            self._first = self._captured_time(self.offset)
+            self._start = time.time()
+        delay = self._due(self._captured_time(self.offset)) - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self._read(None, until=time.time())
+
+    def _read(self, limit: int | None, until: float | None = None):
+        events = []
+        while self.offset < self._end:
+            sec, usec, event_type, code, value = RECORD.unpack_from(
+                self._map, self.offset
+            )
+            if (
+                until is not None
+                and events
+                and self._due(sec + usec / 1_000_000) > until
+            ):
+                break
+            self.offset += RECORD.size
+            events.append(InputEvent(sec, usec, event_type, code, value))
+            # Stop at a frame boundary once the batch is full
+            if limit is not None and len(events) >= limit:
+                if event_type == EV_SYN and code == SYN_REPORT:
+                    break
+        return events
@@ -14,8 +14,9 @@ def load_modules_list() -> str:
     try:
         with open("/proc/modules", "r", encoding="utf-8") as proc_modules:
             return proc_modules.read()
-    except (FileNotFoundError, IOError, PermissionError):
-        log.error("Unable to read /proc/modules", exc_info=True)
+    except (FileNotFoundError, IOError, PermissionError) as error:
+        # A traceback adds nothing here and rendering one is slow on small boards
+        log.error("Unable to read /proc/modules", error=str(error))
         raise
 
 
@@ -24,7 +25,10 @@ def check_kernel_modules() -> bool:
     Check if the required kernel modules for USB devices are loaded
     """
     modules_to_check = ["g_hid", "configfs", "libcomposite"]
-    modules_list = load_modules_list()
+    try:
+        modules_list = load_modules_list()
+    except OSError:
+        return False
 
     not_loaded_modules = []
     for module in modules_to_check:
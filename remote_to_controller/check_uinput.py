@@ -13,7 +13,10 @@ def can_write_to_uinput() -> bool:
     """
     uid = os.getuid()
     gids = os.getgroups()
-    uinput_stat = os.stat("/dev/uinput")
+    try:
+        uinput_stat = os.stat("/dev/uinput")
+    except FileNotFoundError:
+        return False
 
     mode = uinput_stat.st_mode
 
@@ -1,18 +1,22 @@
 """
 Config Parsing
 """
+import sys
 import argparse
+from pathlib import Path
 
 from pydantic import BaseModel, Field
 from structlog import get_logger
 from evdev import InputDevice
 
-from remote_to_controller.device import get_device
+from remote_to_controller.device import get_devices
 from remote_to_controller.check_uinput import can_write_to_uinput
 from remote_to_controller.check_gadget import check_kernel_modules
 from remote_to_controller.mapping import get_mapping
 from remote_to_controller.models import MappingDefinition, GadgetConfig
 from remote_to_controller.input_capabilities import get_gadget_config
+from remote_to_controller.capture import ReplayDevice
+from remote_to_controller.log_config import LEVELS, configure_logging
 
 log = get_logger()
 
@@ -22,11 +26,34 @@ class Config(BaseModel, arbitrary_types_allowed=True):
     Config Vars
     """
 
-    device: InputDevice
+    devices: list[InputDevice | ReplayDevice] = Field(
+        description="Remote of each player, in slot order"
+    )
     mapping: MappingDefinition
+    mapping_file: Path = Field(description="File the mapping was loaded from")
+    reload_mapping: bool = Field(
+        default=True, description="Reload the mapping when its file changes"
+    )
     button_hold_time: float = Field(
         description="Seconds wait between checking if button is still pressed"
     )
+    debounce_time: float = Field(
+        description="Seconds in which repeated presses of the same button are ignored"
+    )
+    grab: bool = Field(
+        default=False, description="Take exclusive access to the input device"
+    )
+    latency_interval: float = Field(
+        default=0,
+        description="Seconds between latency log lines, 0 disables latency tracking",
+    )
+    log_level: str = Field(default="info", description="Lowest level logged")
+    background_logging: bool = Field(
+        default=False, description="Render and write log lines on a background thread"
+    )
+    capture: Path | None = Field(
+        default=None, description="File the raw device events are appended to"
+    )
     gamepad: GadgetConfig
 
 
@@ -38,13 +65,21 @@ def parse_arguments():
     parser.add_argument(
         "--device",
         required=False,
-        help="Path to the input device, e.g., /dev/input/eventX",
+        action="append",
+        help="Path to the input device, e.g., /dev/input/eventX."
+        " Repeat for more players, each takes the next player slot",
     )
     parser.add_argument(
         "--mapping-file",
         required=False,
         help="Filename of the Mapping yaml in the mappings directory",
     )
+    parser.add_argument(
+        "--no-reload",
+        required=False,
+        action="store_true",
+        help="Don't reload the mapping when its file changes or on SIGHUP",
+    )
     parser.add_argument(
         "--button-hold-time",
         required=False,
@@ -52,6 +87,60 @@ def parse_arguments():
         type=float,
         help="How long between checking if the button is still being held in",
     )
+    parser.add_argument(
+        "--debounce-time",
+        required=False,
+        default=0.2,
+        type=float,
+        help="Ignore repeats of the same button within this many seconds",
+    )
+    parser.add_argument(
+        "--grab",
+        required=False,
+        action="store_true",
+        help="Grab the input device so other programs don't also receive the remote",
+    )
+    parser.add_argument(
+        "--latency-interval",
+        required=False,
+        default=0,
+        type=float,
+        help="Track input latency, logging a summary every this many seconds"
+        " and printing it on exit. 0 disables tracking",
+    )
+    parser.add_argument(
+        "--log-level",
+        required=False,
+        default="info",
+        choices=LEVELS,
+        help="Lowest level logged, warning keeps per button logging off the hot path",
+    )
+    parser.add_argument(
+        "--background-logging",
+        required=False,
+        action="store_true",
+        help="Render and write log lines on a background thread",
+    )
+    parser.add_argument(
+        "--capture",
+        required=False,
+        type=Path,
+        help="Append the raw events read from the device to this capture file,"
+        " the device's events aren't filtered by the kernel while capturing",
+    )
+    parser.add_argument(
+        "--replay",
+        required=False,
+        type=Path,
+        help="Replay a capture file through the mapping instead of reading a device",
+    )
+    parser.add_argument(
+        "--replay-speed",
+        required=False,
+        default=1.0,
+        type=float,
+        help="Replay speed relative to the capture, 0 replays as fast as possible",
+    )
     parser.add_argument(
         "--gamepad-type",
         required=False,
@@ -62,30 +151,92 @@ def parse_arguments():
     parser.add_argument(
         "--hid-endpoint",
         required=False,
-        default="/dev/hidg0",
+        action="append",
         type=str,
-        help="The hid gadget endpoint",
+        help="The hid gadget endpoint, /dev/hidg0 by default."
+        " Repeat for a gadget with more HID functions, one per player slot",
+    )
+    parser.add_argument(
+        "--gadget-axes",
+        required=False,
+        default=0,
+        type=int,
+        help="Axes in the gadget's HID report after the buttons, ABS_X first",
+    )
+    parser.add_argument(
+        "--gadget-keyboard",
+        action="store_true",
+        help="The gadget was created with a keyboard report, KEY_ codes are sent with it",
+    )
+    parser.add_argument(
+        "--gadget-consumer",
+        action="store_true",
+        help="The gadget was created with a consumer control report,"
+        " media keys such as KEY_VOLUMEUP are sent with it",
+    )
+    parser.add_argument(
+        "--report-interval",
+        required=False,
+        default=0,
+        type=float,
+        help="Send gadget reports every this many milliseconds, matching the"
+        " endpoint's bInterval, rather than on every change",
     )
     parsed_args = parser.parse_args()
 
     return parsed_args
 
 
+def check_player_slots(
+    devices: list[InputDevice | ReplayDevice],
+    gamepad: GadgetConfig,
+    capture: Path | None,
+):
+    """
+    Every player needs a gadget endpoint, and a capture can only hold one remote
+    """
+    if gamepad.gamepad_type == "gadget" and len(devices) > len(gamepad.hid_endpoints):
+        log.critical(
+            "More remotes than gadget endpoints, give a --hid-endpoint per player",
+            remotes=len(devices),
+            endpoints=gamepad.hid_endpoints,
+        )
+        sys.exit()
+    if capture and len(devices) > 1:
+        log.critical("Only one remote can be captured at a time", remotes=len(devices))
+        sys.exit()
+
+
 def set_config() -> Config:
     """
     Get and Set the config
     """
     parsed_args = parse_arguments()
-    if check_kernel_modules():
-        log.info("USB Mode Available")
-    if can_write_to_uinput():
+    configure_logging(parsed_args.log_level, parsed_args.background_logging)
+    # Only check what the chosen gamepad type needs
+    if parsed_args.gamepad_type == "gadget":
+        if check_kernel_modules():
+            log.info("USB Mode Available")
+    elif can_write_to_uinput():
         log.info("Can write to /dev/uinput")
-    mapping = get_mapping(parsed_args)
-    device = get_device(parsed_args, mapping)
+    mapping_file, mapping = get_mapping(parsed_args)
+    if parsed_args.replay:
+        devices = [ReplayDevice(parsed_args.replay, parsed_args.replay_speed)]
+    else:
+        devices = get_devices(parsed_args, mapping)
     gamepad = get_gadget_config(parsed_args)
+    check_player_slots(devices, gamepad, parsed_args.capture)
     return Config(
-        device=device,
+        devices=devices,
         mapping=mapping,
+        mapping_file=mapping_file,
+        reload_mapping=not parsed_args.no_reload,
         button_hold_time=parsed_args.button_hold_time,
+        debounce_time=parsed_args.debounce_time,
+        grab=parsed_args.grab,
+        latency_interval=parsed_args.latency_interval,
+        log_level=parsed_args.log_level,
+        background_logging=parsed_args.background_logging,
+        capture=parsed_args.capture,
         gamepad=gamepad,
     )
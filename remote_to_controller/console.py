@@ -1,10 +1,31 @@
 """
 Output to the text console
+
+rich is only imported when a table is shown so starting with --device and
+--mapping-file doesn't pay for it.
 """
 import sys
 
-from rich.table import Table
-from rich.console import Console
+
+def print_table(items: list[dict[str, str]], title: str | None = None):
+    """
+    Display a table using dictionary keys as headers.
+    """
+    if not items:
+        return
+
+    # pylint: disable=import-outside-toplevel
+    from rich.table import Table
+    from rich.console import Console
+
+    table = Table(title=title, show_header=True, header_style="bold magenta")
+    for header in items[0]:
+        table.add_column(header, style="magenta")
+
+    for item in items:
+        table.add_row(*[str(value) for value in item.values()])
+
+    Console().print(table)
 
 
 def get_user_selection(items: list[dict[str, str]]) -> dict[str, str]:
@@ -14,6 +35,10 @@ def get_user_selection(items: list[dict[str, str]]) -> dict[str, str]:
     if not items:
         raise ValueError("The items list is empty.")
 
+    # pylint: disable=import-outside-toplevel
+    from rich.table import Table
+    from rich.console import Console
+
     # Get column headers from the keys of the first dictionary
     headers = list(items[0].keys())
 
@@ -0,0 +1,34 @@
+"""
+Per button debouncing using the kernel event timestamps
+"""
+
+
+class ButtonDebouncer:
+    """
+    Drops repeats of the same button within the debounce interval
+
+    The remote sends the same value more than once for a single press,
+    but two different buttons close together are real inputs so each button
+    keeps its own last press time. Times are the kernel's event timestamps
+    so they aren't affected by how late the event was read.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._last_press: dict[int, float] = {}
+
+    def accept(self, button: int, timestamp: float) -> bool:
+        """
+        Record a press and return whether it is outside the debounce interval
+        """
+        last_press = self._last_press.get(button)
+        if last_press is not None and 0 <= timestamp - last_press < self.interval:
+            return False
+        self._last_press[button] = timestamp
+        return True
+
+    def reset(self):
+        """
+        Forget all presses, e.g. after the device reconnects
+        """
+        self._last_press.clear()
@@ -5,69 +5,120 @@ import sys
 import argparse
 
 from structlog import get_logger
-from evdev import list_devices, InputDevice
+from evdev import InputDevice
 from remote_to_controller.console import get_user_selection
 from remote_to_controller.models import Event, MappingDefinition
 from remote_to_controller.input_capabilities import event_code_from_string
+from remote_to_controller.device_index import DEVICE_INDEX
 
 log = get_logger()
 
 
-def select_device(event_mapping: Event) -> str:
+def mapped_events(mapping: MappingDefinition) -> list[Event]:
     """
-    Device Selection for Input based on specified event type and event code
+    Every event type and code the mapping matches on, axes included
     """
-    devices = list_devices()
+    events = {}
+    for map_data in mapping.mappings:
+        event = map_data.event or mapping.event
+        events[(event.type, event.code)] = event
+    for axis in mapping.axes:
+        events[(axis.event.type, axis.event.code)] = axis.event
+    return list(events.values())
+
+
+def missing_events(device: InputDevice, events: list[Event]) -> list[Event]:
+    """
+    The events the device never sends
+    """
+    capabilities = device.capabilities(absinfo=False)
+    return [
+        event
+        for event in events
+        if event_code_from_string(event.code)
+        not in capabilities.get(event_code_from_string(event.type), ())
+    ]
+
+
+def warn_missing_events(device: InputDevice, mapping: MappingDefinition):
+    """
+    Warn about mapped events the device doesn't send
+
+    Each player reads a single node of the remote, so entries matching
+    the events of another node, such as its Keyboard or Mouse node, never fire.
+    """
+    missing = missing_events(device, mapped_events(mapping))
+    if missing:
+        log.warning(
+            "Mapping matches events the device doesn't send, those entries never fire",
+            path=device.path,
+            name=device.name,
+            events=[f"{event.type} {event.code}" for event in missing],
+        )
+
+
+def select_device(events: list[Event]) -> str:
+    """
+    Device Selection for Input based on the event types and codes mapped
+    """
+    devices = DEVICE_INDEX.scan()
 
     if not devices:
         log.critical("No input devices found.")
         sys.exit()
 
     # Convert the event type and code strings to their corresponding integer values
-    desired_event_type_code = event_code_from_string(event_mapping.type)
-    desired_event_code_code = event_code_from_string(event_mapping.code)
+    desired_events = [
+        (event_code_from_string(event.type), event_code_from_string(event.code))
+        for event in events
+    ]
 
-    # Filter devices by the desired event type and event code
+    # Filter devices by whether they send any of the desired events
     devices = [
-        dev_path
-        for dev_path in devices
-        if desired_event_type_code in InputDevice(dev_path).capabilities()
-        and desired_event_code_code
-        in InputDevice(dev_path).capabilities().get(desired_event_type_code, [])  # type: ignore
+        device
+        for device in devices
+        if any(
+            device.supports(event_type, event_code)
+            for event_type, event_code in desired_events
+        )
     ]
 
     if not devices:
         log.critical(
             "No devices supporting events found.",
-            event=event_mapping,
+            events=events,
         )
         sys.exit()
 
+    # The index is already sorted by event number
     device_list = [
-        {"Device Path": dev_path, "Device Name": InputDevice(dev_path).name}
-        for dev_path in devices
+        {"Device Path": device.path, "Device Name": device.name} for device in devices
     ]
 
-    device_list.sort(key=lambda x: int(x["Device Path"].split("event")[-1]))
-
     selected_device = get_user_selection(device_list)
 
     return selected_device["Device Path"]
 
 
-def get_device(
-    parsed_args: argparse.Namespace, mapping: MappingDefinition
-) -> InputDevice:
+def open_device(device_path: str) -> InputDevice:
     """
-    Get Mappings from arg or let user select
+    Open the device or exit if it isn't there
     """
-    if parsed_args.device:
-        device_path = parsed_args.device
-    else:
-        device_path = select_device(mapping.event)
-
     try:
         return InputDevice(device_path)
     except FileNotFoundError:
         log.critical("Could not find device", path=device_path)
         sys.exit()
+
+
+def get_devices(
+    parsed_args: argparse.Namespace, mapping: MappingDefinition
+) -> list[InputDevice]:
+    """
+    Get the device of each player from the args or let user select one
+    """
+    device_paths = parsed_args.device or [select_device(mapped_events(mapping))]
+    devices = [open_device(device_path) for device_path in device_paths]
+    for device in devices:
+        warn_missing_events(device, mapping)
+    return devices
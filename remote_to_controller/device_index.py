@@ -0,0 +1,182 @@
+"""
+Index of the input devices and their capabilities
+
+Capabilities are read from /sys/class/input so the device nodes never have to be opened,
+and the results are cached by node identity and mtime so repeat lookups are free.
+"""
+import os
+import struct
+from pathlib import Path
+from typing import NamedTuple
+
+from evdev import InputDevice, ecodes
+from structlog import get_logger
+
+log = get_logger()
+
+INPUT_DIR = Path("/dev/input")
+SYS_CLASS_INPUT = Path("/sys/class/input")
+
+# Hex digits in each word of a sysfs capability bitmap, the kernel prints unsigned longs
+WORD_DIGITS = struct.calcsize("L") * 2
+
+CAPABILITY_FILES = {
+    ecodes.EV_KEY: "key",
+    ecodes.EV_REL: "rel",
+    ecodes.EV_ABS: "abs",
+    ecodes.EV_MSC: "msc",
+    ecodes.EV_SW: "sw",
+    ecodes.EV_LED: "led",
+    ecodes.EV_SND: "snd",
+    ecodes.EV_FF: "ff",
+}
+
+
+class DeviceInfo(NamedTuple):
+    """
+    What an input device node is and which events it supports
+    """
+
+    path: str
+    name: str
+    phys: str
+    uniq: str
+    capabilities: dict[int, frozenset[int]]
+
+    def supports(self, event_type: int, event_code: int) -> bool:
+        """
+        Whether the device can send the event type and code
+        """
+        return event_code in self.capabilities.get(event_type, ())
+
+
+def parse_bitmap(text: str) -> frozenset[int]:
+    """
+    Parse a sysfs bitmap such as "120013 0", the most significant word comes first
+    """
+    words = text.split()
+    value = int("".join(word.zfill(WORD_DIGITS) for word in words) or "0", 16)
+    bits = []
+    while value:
+        lowest = value & -value
+        bits.append(lowest.bit_length() - 1)
+        value ^= lowest
+    return frozenset(bits)
+
+
+def event_number(path: Path) -> int:
+    """
+    The N of an eventN node, for sorting nodes numerically
+    """
+    number = path.name[len("event") :]
+    return int(number) if number.isdigit() else -1
+
+
+def _read_attribute(path: Path) -> str:
+    try:
+        return path.read_text(encoding="utf-8").strip()
+    except OSError:
+        return ""
+
+
+class DeviceIndex:
+    """
+    Cached scan of the event nodes in the input directory
+    """
+
+    def __init__(
+        self,
+        input_dir: Path = INPUT_DIR,
+        sysfs_dir: Path = SYS_CLASS_INPUT,
+        max_workers: int = 4,
+    ):
+        self.input_dir = input_dir
+        self.sysfs_dir = sysfs_dir
+        self.max_workers = max_workers
+        self._cache: dict[str, tuple[tuple[int, int, int], DeviceInfo]] = {}
+
+    @staticmethod
+    def _cache_key(stat_result: os.stat_result) -> tuple[int, int, int]:
+        return (stat_result.st_rdev, stat_result.st_ino, stat_result.st_mtime_ns)
+
+    def _read_sysfs(self, path: Path) -> DeviceInfo | None:
+        device_dir = self.sysfs_dir / path.name / "device"
+        capabilities_dir = device_dir / "capabilities"
+        if not capabilities_dir.is_dir():
+            return None
+
+        types = parse_bitmap(_read_attribute(capabilities_dir / "ev"))
+        capabilities = {
+            event_type: parse_bitmap(
+                _read_attribute(capabilities_dir / CAPABILITY_FILES[event_type])
+            )
+            for event_type in types
+            if event_type in CAPABILITY_FILES
+        }
+        return DeviceInfo(
+            path=str(path),
+            name=_read_attribute(device_dir / "name"),
+            phys=_read_attribute(device_dir / "phys"),
+            uniq=_read_attribute(device_dir / "uniq"),
+            capabilities=capabilities,
+        )
+
+    @staticmethod
+    def _read_device(path: Path) -> DeviceInfo:
+        """
+        Fallback when sysfs isn't available, opens the node once and closes it again
+        """
+        device = InputDevice(str(path))
+        try:
+            return DeviceInfo(
+                path=str(path),
+                name=device.name,
+                phys=device.phys or "",
+                uniq=device.uniq or "",
+                capabilities={
+                    event_type: frozenset(codes)
+                    for event_type, codes in device.capabilities(absinfo=False).items()
+                    if event_type in CAPABILITY_FILES
+                },
+            )
+        finally:
+            device.close()
+
+    def lookup(self, path: Path | str) -> DeviceInfo | None:
+        """
+        Info for one node, None if it can't be read
+        """
+        path = Path(path)
+        try:
+            key = self._cache_key(path.stat())
+        except OSError:
+            self._cache.pop(str(path), None)
+            return None
+
+        cached = self._cache.get(str(path))
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        try:
+            info = self._read_sysfs(path) or self._read_device(path)
+        except OSError:
+            log.debug("Unable to read input device", path=str(path), exc_info=True)
+            return None
+        self._cache[str(path)] = (key, info)
+        return info
+
+    def scan(self) -> list[DeviceInfo]:
+        """
+        Info for every event node, sorted by event number
+        """
+        # Only scanned when selecting a device interactively
+        # pylint: disable-next=import-outside-toplevel
+        from concurrent.futures import ThreadPoolExecutor
+
+        paths = sorted(self.input_dir.glob("event*"), key=event_number)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            infos = list(executor.map(self.lookup, paths))
+        return [info for info in infos if info is not None]
+
+
+DEVICE_INDEX = DeviceIndex()
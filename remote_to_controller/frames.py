@@ -0,0 +1,94 @@
+"""
+Reading input events grouped into SYN_REPORT frames
+"""
+import time
+from typing import AsyncIterator, Iterable, NamedTuple
+
+from evdev import InputDevice, InputEvent, ecodes
+from structlog import get_logger
+
+from remote_to_controller.capture import ReplayDevice
+
+log = get_logger()
+
+EV_SYN = ecodes.ecodes["EV_SYN"]
+SYN_REPORT = ecodes.ecodes["SYN_REPORT"]
+SYN_DROPPED = ecodes.ecodes["SYN_DROPPED"]
+
+
+class Frame(NamedTuple):
+    """
+    The events of one input frame, everything up to and including a SYN_REPORT
+
+    dropped is set for the frame that ends a SYN_DROPPED gap, its events are
+    incomplete so the state needs to be resynchronised rather than updated from them.
+    received is the wall clock time the frame was read, 0 when not known.
+    replayed is set for frames of a capture, whose events keep the captured timestamps.
+    """
+
+    events: list[InputEvent]
+    dropped: bool = False
+    received: float = 0.0
+    replayed: bool = False
+
+
+class FrameAssembler:
+    """
+    Groups a stream of events into frames
+
+    After a SYN_DROPPED the kernel buffer overflowed, so every event up to the next
+    SYN_REPORT is discarded as the kernel documentation describes.
+    """
+
+    def __init__(self):
+        self._events: list[InputEvent] = []
+        self._dropping = False
+
+    def feed(
+        self,
+        events: Iterable[InputEvent],
+        received: float = 0.0,
+        replayed: bool = False,
+    ) -> list[Frame]:
+        """
+        Add events and return the frames they complete
+        """
+        frames = []
+        for event in events:
+            if event.type == EV_SYN:
+                if event.code == SYN_DROPPED:
+                    self._dropping = True
+                    self._events = []
+                    continue
+                if event.code == SYN_REPORT:
+                    if self._dropping:
+                        frames.append(Frame([], True, received, replayed))
+                        self._dropping = False
+                    else:
+                        frames.append(Frame(self._events, False, received, replayed))
+                    self._events = []
+                continue
+            if not self._dropping:
+                self._events.append(event)
+        return frames
+
+
+async def read_frames(
+    device: InputDevice | ReplayDevice,
+) -> AsyncIterator[list[Frame]]:
+    """
+    Yield the frames completed by each wakeup
+
+    Every wakeup reads all events the kernel has buffered in one go
+    rather than one event per coroutine step.
+    """
+    assembler = FrameAssembler()
+    replayed = isinstance(device, ReplayDevice)
+    while True:
+        try:
+            events = list(await device.async_read())
+        except BlockingIOError:
+            continue
+        frames = assembler.feed(events, time.time(), replayed)
+        if frames:
+            yield frames
@@ -0,0 +1,188 @@
+"""
+Non-blocking writer for the HID gadget endpoint
+"""
+import os
+import errno
+import asyncio
+from collections import deque
+
+from structlog import get_logger
+
+log = get_logger()
+
+# Errors meaning the endpoint has gone away, e.g. the gadget was unbound
+REOPEN_ERRNOS = frozenset(
+    {
+        errno.ENOENT,
+        errno.ENODEV,
+        errno.ENXIO,
+        errno.EBADF,
+        errno.EPIPE,
+        errno.ESHUTDOWN,
+    }
+)
+
+
+class HIDGadgetWriter:
+    """
+    Long lived writer for a hidg endpoint such as /dev/hidg0
+
+    The endpoint is opened once with O_NONBLOCK so a host that is suspended or slow
+    to poll the interrupt endpoint never blocks the event loop.
+    Reports that can't be written straight away wait in a small bounded queue
+    and are flushed once the loop reports the endpoint as writable.
+    When the queue is full the oldest report is dropped,
+    and a report identical to the last queued one is coalesced into it.
+    """
+
+    def __init__(
+        self, hid_endpoint: str, max_pending: int = 8, reopen_delay: float = 1.0
+    ):
+        self.hid_endpoint = hid_endpoint
+        self.reopen_delay = reopen_delay
+        self.dropped = 0
+        self._fd: int | None = None
+        self._pending: deque[bytes] = deque(maxlen=max_pending)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._writer_registered = False
+        self._reopen_handle: asyncio.TimerHandle | None = None
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of reports waiting for the endpoint to become writable
+        """
+        return len(self._pending)
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        return self._loop
+
+    def open(self) -> bool:
+        """
+        Open the endpoint, returns False if it is not available yet
+        """
+        if self._fd is not None:
+            return True
+        try:
+            self._fd = os.open(self.hid_endpoint, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError:
+            log.warning(
+                "Unable to open gadget endpoint",
+                endpoint=self.hid_endpoint,
+                exc_info=True,
+            )
+            return False
+        log.info("Opened gadget endpoint", endpoint=self.hid_endpoint)
+        return True
+
+    def close(self):
+        """
+        Close the endpoint and stop any pending reopen
+        """
+        if self._reopen_handle is not None:
+            self._reopen_handle.cancel()
+            self._reopen_handle = None
+        self._release_fd()
+
+    def _release_fd(self):
+        if self._writer_registered and self._loop is not None:
+            self._loop.remove_writer(self._fd)
+        self._writer_registered = False
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
+
+    def send(self, report: bytes | bytearray):
+        """
+        Write a report without blocking
+
+        If earlier reports are still waiting the report is queued behind them
+        so the host always sees reports in order.
+        """
+        if self._pending or self._fd is None:
+            self._enqueue(report)
+            if self._fd is None:
+                self._schedule_reopen()
+            return
+
+        try:
+            os.write(self._fd, report)
+        except BlockingIOError:
+            self._enqueue(report)
+            self._wait_for_writable()
+        except OSError as error:
+            self._enqueue(report)
+            self._handle_error(error)
+
+    def _enqueue(self, report: bytes | bytearray):
+        if self._pending and self._pending[-1] == report:
+            return
+        # Copy so a report buffer that is updated in place can't change a queued report
+        report = bytes(report)
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped += 1
+            log.warning(
+                "Gadget queue full, dropping oldest report",
+                endpoint=self.hid_endpoint,
+                dropped=self.dropped,
+            )
+        self._pending.append(report)
+
+    def _wait_for_writable(self):
+        if not self._writer_registered and self._fd is not None:
+            self._get_loop().add_writer(self._fd, self._flush)
+            self._writer_registered = True
+
+    def _flush(self):
+        """
+        Write out as many queued reports as the endpoint accepts
+        """
+        while self._pending and self._fd is not None:
+            try:
+                os.write(self._fd, self._pending[0])
+            except BlockingIOError:
+                self._wait_for_writable()
+                return
+            except OSError as error:
+                self._handle_error(error)
+                return
+            self._pending.popleft()
+
+        if self._writer_registered and self._fd is not None:
+            self._get_loop().remove_writer(self._fd)
+            self._writer_registered = False
+
+    def _handle_error(self, error: OSError):
+        if error.errno not in REOPEN_ERRNOS:
+            log.error(
+                "Error while sending to gadget",
+                endpoint=self.hid_endpoint,
+                exc_info=True,
+            )
+            self._pending.clear()
+            return
+        log.warning(
+            "Gadget endpoint went away, reopening",
+            endpoint=self.hid_endpoint,
+            error=str(error),
+        )
+        self._release_fd()
+        self._schedule_reopen()
+
+    def _schedule_reopen(self):
+        if self._reopen_handle is None:
+            self._reopen_handle = self._get_loop().call_later(
+                self.reopen_delay, self._reopen
+            )
+
+    def _reopen(self):
+        self._reopen_handle = None
+        if self.open():
+            self._flush()
+        else:
+            self._schedule_reopen()
@@ -0,0 +1,202 @@
+"""
+Gamepad HID Report Encoding
+"""
+from typing import Iterable
+
+from structlog import get_logger
+
+from usb_device.descriptor import create_gamepad_descriptor
+from usb_device.models import HIDPageKeyboard
+from usb_device.report_layout import ReportPacker, parse_report_descriptor
+
+log = get_logger()
+
+REPORT_ID = 0x01
+NUM_BUTTONS = 24
+# X, Y, Z, Rx, Ry and Rz, in the order of their ABS_ codes
+MAX_AXES = 6
+# Generic Desktop usage of ABS_X, ABS_X to ABS_RZ follow it in order
+USAGE_X = 0x30
+
+
+class ReportEncoder:
+    """
+    Precomputed reports for the gamepad descriptor
+
+    The layout comes from parsing the descriptor the gadget is created with,
+    by default the one create_gamepad_descriptor builds: the Report ID,
+    one bit per button padded to a whole byte, then a signed byte per axis.
+    The all released report and a report for each single button
+    are built once at startup so the hot path only has to index a tuple.
+    """
+
+    def __init__(
+        self,
+        num_buttons: int = NUM_BUTTONS,
+        report_id: int = REPORT_ID,
+        num_axes: int = 0,
+        descriptor: bytes | None = None,
+    ):
+        if descriptor is None:
+            if num_buttons < 1:
+                raise ValueError("Number of buttons should be at least 1.")
+            if not 0 <= num_axes <= MAX_AXES:
+                raise ValueError(f"Number of axes should be between 0 and {MAX_AXES}.")
+            descriptor = create_gamepad_descriptor(num_buttons, num_axes, report_id)
+
+        self.layout = parse_report_descriptor(descriptor)
+        if report_id not in self.layout.inputs:
+            raise ValueError(f"Descriptor has no input report with ID {report_id}.")
+        self.packer = ReportPacker(self.layout.inputs[report_id])
+        self.num_buttons = self.packer.num_buttons
+        self.num_axes = self.packer.num_axes
+        self.report_id = report_id
+        self.report_length = self.packer.length
+
+        self.release_report = self.packer.pack()
+        self.press_reports = tuple(
+            self.packer.pack(1 << index) for index in range(self.num_buttons)
+        )
+        log.debug(
+            "Precomputed gadget reports",
+            buttons=self.num_buttons,
+            axes=self.num_axes,
+            report_length=self.report_length,
+        )
+
+    def press_report(self, index: int) -> bytes:
+        """
+        Report with only the button at index pressed
+        """
+        if not 0 <= index < self.num_buttons:
+            raise ValueError(
+                f"Position must be between 0 and {self.num_buttons - 1} inclusive."
+            )
+        return self.press_reports[index]
+
+    def packer_for(self, report_id: int) -> ReportPacker:
+        """
+        Packer of another input report of the same descriptor
+        """
+        if report_id not in self.layout.inputs:
+            raise ValueError(f"Descriptor has no input report with ID {report_id}.")
+        return ReportPacker(self.layout.inputs[report_id])
+
+    def axis_slot(self, code: int) -> int | None:
+        """
+        The report axis of an ABS_ code, None when the report doesn't have it
+        """
+        if not 0 <= code < MAX_AXES or USAGE_X + code not in self.packer.axis_usages:
+            return None
+        return self.packer.axis_usages.index(USAGE_X + code)
+
+
+class ReportBuffer:
+    """
+    Preallocated report for states with several buttons held
+
+    Buttons are set and cleared in place in the button bytes of the buffer,
+    axes are packed into it in place on every change. The buffer itself can be
+    handed straight to os.write without building a new report.
+    """
+
+    def __init__(self, encoder: ReportEncoder):
+        self.encoder = encoder
+        self.buffer = bytearray(encoder.release_report)
+        self.mask = 0
+        self.axes = [0] * encoder.num_axes
+        packer = encoder.packer
+        self._pack_into = packer.pack_into
+        self._button_offset = packer.button_offset
+        self._button_end = packer.button_offset + packer.button_bytes
+        self._button_bytes = packer.button_bytes
+        self._button_shift = packer.button_shift
+
+    def set(self, index: int):
+        """
+        Mark the button at index as pressed
+        """
+        bit = index + self._button_shift
+        self.buffer[self._button_offset + (bit >> 3)] |= 1 << (bit & 7)
+        self.mask |= 1 << index
+
+    def clear(self, index: int):
+        """
+        Mark the button at index as released
+        """
+        bit = index + self._button_shift
+        self.buffer[self._button_offset + (bit >> 3)] &= ~(1 << (bit & 7)) & 0xFF
+        self.mask &= ~(1 << index)
+
+    def is_set(self, index: int) -> bool:
+        """
+        Whether the button at index is pressed
+        """
+        return bool(self.mask >> index & 1)
+
+    def set_mask(self, mask: int):
+        """
+        Set every button from a bitmask where bit n is the button at index n
+        """
+        self.mask = mask
+        self.buffer[self._button_offset : self._button_end] = (
+            mask << self._button_shift
+        ).to_bytes(self._button_bytes, "little")
+
+    def set_axis(self, axis: int, value: int):
+        """
+        Set the axis at index to a value between -127 and 127
+        """
+        self.axes[axis] = value
+        self._pack_into(self.buffer, self.mask, self.axes)
+
+    def reset(self):
+        """
+        Release all buttons and centre the axes
+        """
+        self.mask = 0
+        self.axes = [0] * self.encoder.num_axes
+        self.buffer[:] = self.encoder.release_report
+
+
+class UsageReport:
+    """
+    Report listing the usages pressed, for the keyboard and consumer control
+
+    Modifier usages go in the report's bits when it has them, other usages
+    fill its array in the order given and presses past its size are left out.
+    sent is the last report written so an unchanged one can be skipped.
+    """
+
+    def __init__(self, packer: ReportPacker):
+        self.packer = packer
+        self.buffer = bytearray(packer.pack())
+        self.sent = bytes(self.buffer)
+        self.slots = packer.num_axes
+        self.has_modifiers = packer.num_buttons > 0
+
+    def update(self, usages: Iterable[int]):
+        """
+        Pack the pressed usages into the buffer
+        """
+        modifiers = 0
+        keys = []
+        for usage in usages:
+            if (
+                self.has_modifiers
+                and HIDPageKeyboard.KEYBOARD_LEFT_CONTROL
+                <= usage
+                <= HIDPageKeyboard.KEYBOARD_RIGHT_GUI
+            ):
+                modifiers |= 1 << (usage - HIDPageKeyboard.KEYBOARD_LEFT_CONTROL)
+            elif len(keys) < self.slots:
+                keys.append(usage)
+        keys += [0] * (self.slots - len(keys))
+        self.packer.pack_into(self.buffer, modifiers, keys)
+
+
+def bytes_to_binary_str(bytes_obj: bytes | bytearray) -> str:
+    """
+    Outputs the data to a binary strin
+    """
+    return "".join(f"{byte:08b}" for byte in bytes_obj)
@@ -0,0 +1,80 @@
+"""
+HID usages of evdev key codes, for the keyboard and consumer control reports
+
+Only the keys a remote mapping is likely to send are listed, the tables follow
+the Keyboard/Keypad (0x07) and Consumer (0x0C) pages of the HID Usage Tables.
+Usages the descriptor builder uses too come from the same usb_device enums.
+"""
+import string
+
+from evdev import ecodes
+
+from usb_device.models import HIDPageConsumer, HIDPageKeyboard
+
+
+def _keyboard_usages() -> dict[int, int]:
+    usages = {
+        getattr(ecodes, f"KEY_{letter}"): HIDPageKeyboard.KEYBOARD_A + index
+        for index, letter in enumerate(string.ascii_uppercase)
+    }
+    # 1 to 9 then 0
+    usages.update(
+        {
+            getattr(ecodes, f"KEY_{digit}"): 0x1E + index
+            for index, digit in enumerate("1234567890")
+        }
+    )
+    usages.update(
+        {
+            getattr(ecodes, f"KEY_F{number}"): HIDPageKeyboard.KEYBOARD_F1 + number - 1
+            for number in range(1, 13)
+        }
+    )
+    names = {
+        "KEY_ENTER": HIDPageKeyboard.KEYBOARD_ENTER,
+        "KEY_ESC": 0x29,
+        "KEY_BACKSPACE": 0x2A,
+        "KEY_TAB": 0x2B,
+        "KEY_SPACE": 0x2C,
+        "KEY_MINUS": 0x2D,
+        "KEY_EQUAL": 0x2E,
+        "KEY_INSERT": 0x49,
+        "KEY_HOME": 0x4A,
+        "KEY_PAGEUP": 0x4B,
+        "KEY_DELETE": 0x4C,
+        "KEY_END": 0x4D,
+        "KEY_PAGEDOWN": 0x4E,
+        "KEY_RIGHT": 0x4F,
+        "KEY_LEFT": 0x50,
+        "KEY_DOWN": 0x51,
+        "KEY_UP": 0x52,
+        "KEY_COMPOSE": HIDPageKeyboard.KEYBOARD_APPLICATION,
+        "KEY_LEFTCTRL": HIDPageKeyboard.KEYBOARD_LEFT_CONTROL,
+        "KEY_LEFTSHIFT": 0xE1,
+        "KEY_LEFTALT": 0xE2,
+        "KEY_LEFTMETA": 0xE3,
+        "KEY_RIGHTCTRL": 0xE4,
+        "KEY_RIGHTSHIFT": 0xE5,
+        "KEY_RIGHTALT": 0xE6,
+        "KEY_RIGHTMETA": HIDPageKeyboard.KEYBOARD_RIGHT_GUI,
+    }
+    usages.update({getattr(ecodes, name): usage for name, usage in names.items()})
+    return {code: int(usage) for code, usage in usages.items()}
+
+
+KEYBOARD_USAGES = _keyboard_usages()
+
+CONSUMER_USAGES = {
+    getattr(ecodes, name): int(usage)
+    for name, usage in {
+        "KEY_NEXTSONG": HIDPageConsumer.SCAN_NEXT_TRACK,
+        "KEY_PREVIOUSSONG": HIDPageConsumer.SCAN_PREVIOUS_TRACK,
+        "KEY_STOPCD": HIDPageConsumer.STOP,
+        "KEY_PLAYPAUSE": HIDPageConsumer.PLAY_PAUSE,
+        "KEY_MUTE": HIDPageConsumer.MUTE,
+        "KEY_VOLUMEUP": HIDPageConsumer.VOLUME_INCREMENT,
+        "KEY_VOLUMEDOWN": HIDPageConsumer.VOLUME_DECREMENT,
+        "KEY_HOMEPAGE": HIDPageConsumer.AC_HOME,
+        "KEY_BACK": HIDPageConsumer.AC_BACK,
+    }.items()
+}
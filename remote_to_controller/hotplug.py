@@ -0,0 +1,248 @@
+"""
+Waiting for the remote to come back after it disconnects
+
+The event node often changes after a BLE reconnect, so the remote is
+re-identified by what it is rather than the /dev/input/eventN path it had.
+New nodes are picked up with inotify on the input directory instead of polling.
+"""
+import os
+import ctypes
+import struct
+import asyncio
+from pathlib import Path
+from typing import Callable, Collection, NamedTuple
+
+from evdev import InputDevice
+from structlog import get_logger
+
+from remote_to_controller.device_index import (
+    DEVICE_INDEX,
+    INPUT_DIR,
+    CAPABILITY_FILES,
+    DeviceIndex,
+    DeviceInfo,
+)
+
+log = get_logger()
+
+# Linux: include/uapi/linux/inotify.h
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+# struct inotify_event { int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[]; }
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class DeviceIdentity(NamedTuple):
+    """
+    What identifies the remote regardless of its event node
+    """
+
+    name: str
+    uniq: str
+    phys: str
+    capabilities: frozenset[tuple[int, int]]
+
+    @classmethod
+    def from_device(cls, device: InputDevice) -> "DeviceIdentity":
+        """
+        Read the identity of an open device
+        """
+        capabilities = frozenset(
+            (event_type, code)
+            for event_type, codes in device.capabilities(absinfo=False).items()
+            if event_type in CAPABILITY_FILES
+            for code in codes
+        )
+        return cls(
+            name=device.name,
+            uniq=device.uniq or "",
+            phys=device.phys or "",
+            capabilities=capabilities,
+        )
+
+    @classmethod
+    def from_info(cls, info: DeviceInfo) -> "DeviceIdentity":
+        """
+        Identity from the device index without opening the node
+        """
+        return cls(
+            name=info.name,
+            uniq=info.uniq,
+            phys=info.phys,
+            capabilities=frozenset(
+                (event_type, code)
+                for event_type, codes in info.capabilities.items()
+                for code in codes
+            ),
+        )
+
+    def matches(self, other: "DeviceIdentity") -> bool:
+        """
+        Whether other is the same remote
+
+        The Samsung remote has two nodes with the same name so the capabilities
+        have to match too. phys is not compared since it can change on reconnect.
+        """
+        if self.name != other.name or self.capabilities != other.capabilities:
+            return False
+        return not self.uniq or self.uniq == other.uniq
+
+
+class DirectoryWatcher:
+    """
+    inotify watch on a directory reporting the names of entries that changed
+    """
+
+    def __init__(self, directory: Path, mask: int = IN_CREATE | IN_ATTRIB):
+        self.directory = directory
+        self.mask = mask
+        self._fd: int | None = None
+
+    def open(self):
+        """
+        Start watching the directory
+        """
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        if libc.inotify_add_watch(fd, os.fsencode(self.directory), self.mask) < 0:
+            error = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(error, os.strerror(error), str(self.directory))
+        self._fd = fd
+
+    def close(self):
+        """
+        Stop watching the directory
+        """
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "DirectoryWatcher":
+        self.open()
+        return self
+
+    def __exit__(self, *_exc_info):
+        self.close()
+
+    async def changes(self) -> list[str]:
+        """
+        Wait for entries in the directory to change and return their names
+        """
+        if self._fd is None:
+            raise RuntimeError("Directory watcher is not open")
+
+        loop = asyncio.get_running_loop()
+        while True:
+            readable = loop.create_future()
+            loop.add_reader(
+                self._fd,
+                lambda: readable.done() or readable.set_result(None),
+            )
+            try:
+                await readable
+            finally:
+                loop.remove_reader(self._fd)
+
+            try:
+                data = os.read(self._fd, 4096)
+            except BlockingIOError:
+                continue
+            return self._parse(data)
+
+    @staticmethod
+    def _parse(data: bytes) -> list[str]:
+        names = []
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            _, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if name:
+                names.append(os.fsdecode(name))
+        return names
+
+
+def find_device(
+    identity: DeviceIdentity,
+    paths: list[Path],
+    open_device: Callable[[str], InputDevice] = InputDevice,
+    index: DeviceIndex | None = DEVICE_INDEX,
+    in_use: Collection[str] = (),
+) -> InputDevice | None:
+    """
+    Open each path and return the first device matching identity
+
+    Nodes the index already knows don't match are skipped without being opened,
+    as are the nodes in_use by other players, which may be an identical remote.
+    """
+    for path in paths:
+        if str(path) in in_use:
+            continue
+        info = index.lookup(path) if index is not None else None
+        if info is not None and not identity.matches(DeviceIdentity.from_info(info)):
+            continue
+        try:
+            device = open_device(str(path))
+        except OSError:
+            # The node may exist before udev has set its permissions
+            continue
+        if identity.matches(DeviceIdentity.from_device(device)):
+            return device
+        device.close()
+    return None
+
+
+async def wait_for_device(
+    identity: DeviceIdentity,
+    directory: Path = INPUT_DIR,
+    open_device: Callable[[str], InputDevice] = InputDevice,
+    index: DeviceIndex | None = DEVICE_INDEX,
+    in_use: Callable[[], Collection[str]] = tuple,
+) -> InputDevice:
+    """
+    Wait until a device matching identity appears in directory and return it opened
+
+    in_use gives the nodes other players have open when each scan starts.
+    """
+    watcher = DirectoryWatcher(directory)
+    watcher.open()
+    try:
+        # Watch first so a node created while scanning isn't missed
+        device = find_device(
+            identity,
+            sorted(directory.glob("event*")),
+            open_device=open_device,
+            index=index,
+            in_use=in_use(),
+        )
+        while device is None:
+            names = await watcher.changes()
+            paths = [
+                directory / name
+                for name in dict.fromkeys(names)
+                if name.startswith("event")
+            ]
+            device = find_device(
+                identity,
+                paths,
+                open_device=open_device,
+                index=index,
+                in_use=in_use(),
+            )
+    finally:
+        # Closing an inotify descriptor waits for an RCU grace period, which
+        # takes milliseconds, so it is closed on a worker thread rather than
+        # holding up the loop and every other player with it
+        asyncio.get_running_loop().run_in_executor(None, watcher.close)
+
+    log.info("Found device", path=device.path, name=identity.name)
+    return device
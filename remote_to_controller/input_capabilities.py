@@ -21,6 +21,13 @@ def get_gadget_config(parsed_args: argparse.Namespace) -> GadgetConfig:
     Gadget config
     """
     gamepad_type = parsed_args.gamepad_type
-    hid_endpoint = parsed_args.hid_endpoint
-    config = GadgetConfig(gamepad_type=gamepad_type, hid_endpoint=hid_endpoint)
+    hid_endpoints = parsed_args.hid_endpoint or ["/dev/hidg0"]
+    config = GadgetConfig(
+        gamepad_type=gamepad_type,
+        hid_endpoints=hid_endpoints,
+        num_axes=parsed_args.gadget_axes,
+        report_interval=parsed_args.report_interval,
+        keyboard=parsed_args.gadget_keyboard,
+        consumer=parsed_args.gadget_consumer,
+    )
     return config
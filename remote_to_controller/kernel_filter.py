@@ -0,0 +1,100 @@
+"""
+Filtering events in the kernel before they reach Python
+
+EVIOCSMASK (Linux 4.4+) sets a per client mask of the events evdev forwards,
+so events the mapping doesn't use never wake the process.
+Linux: include/uapi/linux/input.h
+"""
+import fcntl
+import struct
+from array import array
+
+from evdev import InputDevice, ecodes
+from structlog import get_logger
+
+log = get_logger()
+
+EV_SYN = ecodes.ecodes["EV_SYN"]
+
+# struct input_mask { __u32 type; __u32 codes_size; __u64 codes_ptr; }
+INPUT_MASK = struct.Struct("IIQ")
+# _IOW('E', 0x93, struct input_mask)
+EVIOCSMASK = (1 << 30) | (INPUT_MASK.size << 16) | (ord("E") << 8) | 0x93
+
+# Number of codes per type the kernel expects a mask for, EV_SYN's mask is the type mask
+MASK_COUNTS = {
+    EV_SYN: ecodes.EV_CNT,
+    ecodes.EV_KEY: ecodes.KEY_CNT,
+    ecodes.EV_REL: ecodes.REL_CNT,
+    ecodes.EV_ABS: ecodes.ABS_CNT,
+    ecodes.EV_MSC: ecodes.MSC_CNT,
+    ecodes.EV_SW: ecodes.SW_CNT,
+    ecodes.EV_LED: ecodes.LED_CNT,
+    ecodes.EV_SND: ecodes.SND_CNT,
+    ecodes.EV_FF: ecodes.FF_CNT,
+}
+
+
+def _bitmap(bits: set[int], count: int) -> array:
+    """
+    Kernel style bitmap of unsigned longs with the given bits set
+    """
+    word_bits = array("L").itemsize * 8
+    words = array("L", [0] * ((count + word_bits - 1) // word_bits))
+    for bit in bits:
+        words[bit // word_bits] |= 1 << (bit % word_bits)
+    return words
+
+
+def _set_mask(device: InputDevice, event_type: int, codes: set[int]):
+    bitmap = _bitmap(codes, MASK_COUNTS[event_type])
+    address, length = bitmap.buffer_info()
+    request = INPUT_MASK.pack(event_type, length * bitmap.itemsize, address)
+    fcntl.ioctl(device.fd, EVIOCSMASK, request)
+
+
+def install_event_mask(device: InputDevice, events: dict[int, set[int]]) -> bool:
+    """
+    Only deliver the given event codes for each event type, plus SYN events
+
+    Returns False when the kernel doesn't support masks,
+    in which case every event is still delivered and filtered in Python.
+    """
+    try:
+        _set_mask(device, EV_SYN, set(events) | {EV_SYN})
+        for event_type, codes in events.items():
+            if event_type in MASK_COUNTS:
+                _set_mask(device, event_type, codes)
+    except OSError as error:
+        log.warning(
+            "Unable to install kernel event mask, filtering in Python",
+            device=device.path,
+            error=str(error),
+        )
+        return False
+
+    log.info("Installed kernel event mask", device=device.path, events=events)
+    return True
+
+
+def grab_device(device: InputDevice) -> bool:
+    """
+    Take exclusive access to the device so no other consumer also handles the remote
+    """
+    try:
+        device.grab()
+    except OSError as error:
+        log.warning("Unable to grab device", device=device.path, error=str(error))
+        return False
+    log.info("Grabbed device", device=device.path)
+    return True
+
+
+def ungrab_device(device: InputDevice):
+    """
+    Release exclusive access taken by grab_device
+    """
+    try:
+        device.ungrab()
+    except OSError:
+        log.debug("Device already released", device=device.path)
@@ -0,0 +1,125 @@
+"""
+Latency from the kernel's event timestamp to each stage of the pipeline
+"""
+import time
+import asyncio
+
+from structlog import get_logger
+
+log = get_logger()
+
+# Bucket n holds latencies below 2**n microseconds, the last one everything above ~1s
+NUM_BUCKETS = 21
+
+STAGES = ("read", "mapped", "written")
+
+
+class LatencyHistogram:
+    """
+    Fixed power of two buckets so recording is a couple of integer operations
+    """
+
+    def __init__(self):
+        self.buckets = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def record(self, seconds: float):
+        """
+        Add one latency measurement
+        """
+        microseconds = int(seconds * 1_000_000)
+        if microseconds < 0:
+            microseconds = 0
+        self.buckets[min(microseconds.bit_length(), NUM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Upper bound in seconds of the bucket the percentile falls in
+        """
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                return min((1 << bucket) / 1_000_000, self.maximum)
+        return self.maximum
+
+    def summary(self) -> dict[str, float]:
+        """
+        Count and the p50/p99/mean/max in milliseconds
+        """
+        return {
+            "count": self.count,
+            "p50_ms": round(self.percentile(0.5) * 1000, 3),
+            "p99_ms": round(self.percentile(0.99) * 1000, 3),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.maximum * 1000, 3),
+        }
+
+    def reset(self):
+        """
+        Clear all measurements
+        """
+        self.buckets = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+
+class LatencyTracker:
+    """
+    One histogram per stage, measured from the kernel timestamp of the event
+
+    read: the frame was read from the device
+    mapped: the mapping has run for the frame
+    written: the sink wrote the change to uinput or the hidg endpoint
+    """
+
+    def __init__(self):
+        self.stages = {stage: LatencyHistogram() for stage in STAGES}
+
+    def record(self, stage: str, kernel_time: float, now: float | None = None):
+        """
+        Record the time from kernel_time until now for the stage
+        """
+        if now is None:
+            now = time.time()
+        self.stages[stage].record(now - kernel_time)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        Summary of every stage
+        """
+        return {stage: histogram.summary() for stage, histogram in self.stages.items()}
+
+    def log_summary(self):
+        """
+        Write the summary as a structured log line
+        """
+        log.info("Input latency", **self.summary())
+
+    def summary_rows(self) -> list[dict[str, str]]:
+        """
+        Summary as table rows for the console
+        """
+        return [
+            {"Stage": stage, **{key: str(value) for key, value in summary.items()}}
+            for stage, summary in self.summary().items()
+        ]
+
+
+async def log_periodically(tracker: LatencyTracker, interval: float):
+    """
+    Log the latency summary every interval seconds
+    """
+    while True:
+        await asyncio.sleep(interval)
+        tracker.log_summary()
@@ -0,0 +1,180 @@
+"""
+Logging setup
+
+Log calls are filtered by level before they do any work, and the hot path checks
+is_enabled first so it doesn't even build the arguments of a line nobody will see.
+With background logging the calling thread only stamps the event and queues it,
+rendering and writing happen on a separate thread.
+"""
+import sys
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+from typing import TextIO
+
+import structlog
+
+LEVELS = ("debug", "info", "warning", "error", "critical")
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_LEVEL = logging.NOTSET
+
+
+def is_enabled(level: int) -> bool:
+    """
+    Whether lines at the level are logged, for guarding log calls with costly arguments
+    """
+    return level >= _LEVEL
+
+
+def _add_time(_logger, _method_name: str, event_dict: dict) -> dict:
+    event_dict["timestamp"] = time.time()
+    return event_dict
+
+
+def _format_time(_logger, _method_name: str, event_dict: dict) -> dict:
+    event_dict["timestamp"] = time.strftime(
+        TIMESTAMP_FORMAT, time.localtime(event_dict["timestamp"])
+    )
+    return event_dict
+
+
+# Run by the caller: everything that has to happen while the call is in progress
+CALLER_PROCESSORS = [
+    structlog.contextvars.merge_contextvars,
+    structlog.processors.add_log_level,
+    structlog.processors.StackInfoRenderer(),
+    structlog.dev.set_exc_info,
+    _add_time,
+]
+
+# With background logging the traceback is rendered by the caller, since
+# exc_info=True is resolved with sys.exc_info() which is empty on the writer thread
+BACKGROUND_CALLER_PROCESSORS = [
+    *CALLER_PROCESSORS,
+    structlog.processors.format_exc_info,
+]
+
+
+class BackgroundWriter(threading.Thread):
+    """
+    Renders queued log events and writes them to the stream
+
+    Queuing is a deque append, the writer wakes every interval and writes everything
+    queued in one go so the caller never waits on a lock or a thread switch.
+    The queue is bounded so a burst of logging can't use up memory,
+    events that don't fit are dropped and counted.
+    """
+
+    def __init__(self, stream: TextIO, max_queued: int = 1024, interval: float = 0.05):
+        super().__init__(name="log-writer", daemon=True)
+        self.stream = stream
+        self.max_queued = max_queued
+        self.interval = interval
+        self.queue: deque[dict] = deque()
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._stopping = threading.Event()
+        self._render = structlog.dev.ConsoleRenderer()
+
+    def put(self, event_dict: dict):
+        """
+        Queue an event, dropping it when the queue is full
+        """
+        if len(self.queue) < self.max_queued:
+            self.queue.append(event_dict)
+        else:
+            self.dropped += 1
+
+    def stop(self, timeout: float = 1.0):
+        """
+        Write what is still queued and stop the thread
+        """
+        self._stopping.set()
+        self.join(timeout)
+
+    def run(self):
+        while not self._stopping.wait(self.interval):
+            self._drain()
+        self._drain()
+
+    def _drain(self):
+        if not self.queue and self.dropped == self._reported_dropped:
+            return
+        popleft = self.queue.popleft
+        while self.queue:
+            self._write(popleft())
+        dropped = self.dropped - self._reported_dropped
+        if dropped:
+            self._reported_dropped += dropped
+            self._write(
+                {
+                    "event": "Log lines dropped",
+                    "count": dropped,
+                    "level": "warning",
+                    "timestamp": time.time(),
+                }
+            )
+        self.stream.flush()
+
+    def _write(self, event_dict: dict):
+        method_name = event_dict.get("level", "info")
+        event_dict = _format_time(None, method_name, event_dict)
+        self.stream.write(self._render(None, method_name, event_dict) + "\n")
+
+
+class QueueLogger:
+    """
+    structlog logger handing every event to the background writer
+    """
+
+    def __init__(self, writer: BackgroundWriter):
+        self._put = writer.put
+
+    def msg(self, **event_dict):
+        """
+        Queue the event
+        """
+        self._put(event_dict)
+
+    debug = info = warning = warn = error = critical = exception = fatal = msg
+
+
+def configure_logging(
+    level: str = "info",
+    background: bool = False,
+    stream: TextIO | None = None,
+    max_queued: int = 1024,
+) -> BackgroundWriter | None:
+    """
+    Configure structlog, returns the writer thread when logging in the background
+    """
+    global _LEVEL  # pylint: disable=global-statement
+    _LEVEL = logging.getLevelName(level.upper())
+    stream = stream if stream is not None else sys.stdout
+
+    if not background:
+        structlog.configure(
+            processors=[
+                *CALLER_PROCESSORS,
+                _format_time,
+                structlog.dev.ConsoleRenderer(),
+            ],
+            wrapper_class=structlog.make_filtering_bound_logger(_LEVEL),
+            logger_factory=structlog.PrintLoggerFactory(stream),
+            cache_logger_on_first_use=False,
+        )
+        return None
+
+    writer = BackgroundWriter(stream, max_queued)
+    writer.start()
+    atexit.register(writer.stop)
+    structlog.configure(
+        processors=BACKGROUND_CALLER_PROCESSORS,
+        wrapper_class=structlog.make_filtering_bound_logger(_LEVEL),
+        logger_factory=lambda *_args: QueueLogger(writer),
+        cache_logger_on_first_use=False,
+    )
+    return writer
@@ -1,41 +1,57 @@
 """
 Remote Button Press to Virtual Controller
 """
-import time
 import asyncio
-from typing import Tuple
-from evdev import UInput, ecodes, InputEvent, InputDevice
+from contextlib import nullcontext, suppress
+from evdev import AbsInfo, UInput, ecodes, InputDevice
 
 from structlog import get_logger
 
 from remote_to_controller.config import set_config, Config
 from remote_to_controller.models import MappingDefinition
+from remote_to_controller.gadget_writer import HIDGadgetWriter
+from remote_to_controller.hid_report import (
+    NUM_BUTTONS,
+    ReportEncoder,
+    ReportBuffer,
+    UsageReport,
+)
+from remote_to_controller.hid_usages import CONSUMER_USAGES, KEYBOARD_USAGES
+from remote_to_controller.debounce import ButtonDebouncer
+from remote_to_controller.device import warn_missing_events
+from remote_to_controller.sinks import VirtualSink, GadgetSink
+from remote_to_controller.frames import read_frames
+from remote_to_controller.hotplug import DeviceIdentity, wait_for_device
+from remote_to_controller.capture import (
+    CaptureWriter,
+    CapturingDevice,
+    ReplayDevice,
+)
+from remote_to_controller.latency import LatencyTracker, log_periodically
+from remote_to_controller.console import print_table
+from remote_to_controller.kernel_filter import (
+    install_event_mask,
+    grab_device,
+    ungrab_device,
+)
+from remote_to_controller.pipeline import Pipeline
+from remote_to_controller.translation import TranslationPlan, compile_mapping
+from remote_to_controller.reload import MappingReloader
+from remote_to_controller.players import Player, PlayerSlots
+from remote_to_controller.axes import AXIS_MIN, AXIS_MAX
+from usb_device.descriptor import (
+    CONSUMER_REPORT_ID,
+    KEYBOARD_REPORT_ID,
+    create_composite_descriptor,
+)
 
 log = get_logger()
 
 EV_KEY = ecodes.ecodes["EV_KEY"]
-LAST_PRESS_TIME = 0.0
+EV_ABS = ecodes.ecodes["EV_ABS"]
 
 
-def create_event_translation(
-    mapping: MappingDefinition,
-) -> Tuple[dict[int, int], dict[int, int]]:
-    """
-    Create a dictionary to translate remote values to gamepad event codes.
-    """
-    translations = {
-        map.remote_value: getattr(ecodes, map.event_code) for map in mapping.mappings
-    }
-
-    gadget_translations = {
-        map.remote_value: index for index, map in enumerate(mapping.mappings)
-    }
-
-    log.debug("Generated mappings", virtual=translations, gadget=gadget_translations)
-    return translations, gadget_translations
-
-
-def get_capabilities(mapping: MappingDefinition) -> dict[int, list[int]]:
+def get_capabilities(mapping: MappingDefinition) -> dict[int, list]:
     """
     Set the types of events (e.g., button presses, key presses) that the virtual gamepad
     """
@@ -44,217 +60,258 @@ def get_capabilities(mapping: MappingDefinition) -> dict[int, list[int]]:
         event_code_mapped = getattr(ecodes, map_data.event_code)
         if "BTN_" in map_data.event_code or "KEY_" in map_data.event_code:
             capabilities[EV_KEY].append(event_code_mapped)
-    return capabilities
-
-
-async def process_event(
-    event: InputEvent, event_translation: dict[int, int]
-) -> int | None:
-    """
-    Process button press events
-    """
-    global LAST_PRESS_TIME  # pylint: disable=global-statement
 
-    log.info(
-        "Received Event",
-        event_code=event.code,
-        event_type=event.type,
-        event_value=event.value,
+    axis_info = AbsInfo(
+        value=0, min=AXIS_MIN, max=AXIS_MAX, fuzz=0, flat=0, resolution=0
     )
-
-    # Fetch the translated event (gamepad's button code)
-    translated_event = event_translation.get(event.value)
-    if translated_event is None:
-        log.warning("Event value not mapped", event_value=event.value)
-        return None
-
-    current_time = time.time()
-    # Check if the button was pressed within the last 500ms
-    if current_time - LAST_PRESS_TIME < 0.2:
-        log.info("Button pressed within 200ms. Skipping processing.")
-        return None
-
-    # Update last press time
-    LAST_PRESS_TIME = current_time
-
-    return translated_event
+    for code in compile_mapping(mapping).axis_codes:
+        capabilities.setdefault(EV_ABS, []).append((code, axis_info))
+    return capabilities
 
 
-def create_virtual_gamepad(config: Config):
+def create_virtual_gamepad(config: Config, slot: int = 0):
     """
-    Create a virtual gamepad
+    Create a virtual gamepad, numbered after the first player
     """
     capabilities = get_capabilities(config.mapping)
-    virtual_gp = UInput(capabilities, name="VirtualGamepad")
-    log.info("Virtual Gamepad Initialized")
+    name = "VirtualGamepad" if slot == 0 else f"VirtualGamepad {slot + 1}"
+    virtual_gp = UInput(capabilities, name=name)
+    log.info("Virtual Gamepad Initialized", name=name)
     return virtual_gp
 
 
-async def send_to_virtual(virtual_gp: UInput, translated_event: int):
+def create_sink(
+    config: Config, plan: TranslationPlan, slot: int = 0
+) -> VirtualSink | GadgetSink:
     """
-    Send the processed event to the virtual gamepad
+    Create the output for the configured gamepad type for the player in slot
     """
-    log.debug(
-        "Attempting to write button press to virtual gamepad",
-        event_type=EV_KEY,
-        translated_event=translated_event,
-    )
-
-    # Register the button press
-    virtual_gp.write(EV_KEY, translated_event, 1)  # Button press
-    virtual_gp.syn()
-    log.info("Button Pressed", button=translated_event)
-
-    log.debug(
-        "Attempting to write button release to virtual gamepad",
-        event_type=EV_KEY,
-        translated_event=translated_event,
-    )
-
-    # Register the button release
-    virtual_gp.write(EV_KEY, translated_event, 0)  # Button release
-    virtual_gp.syn()
-    log.info("Button Released", button=translated_event)
+    match config.gamepad.gamepad_type:
+        case "virtual":
+            return VirtualSink(
+                create_virtual_gamepad(config, slot),
+                plan.virtual_codes,
+                plan.axis_codes,
+            )
+        case "gadget":
+            gamepad = config.gamepad
+            encoder = ReportEncoder(
+                descriptor=create_composite_descriptor(
+                    NUM_BUTTONS,
+                    gamepad.num_axes,
+                    keyboard=gamepad.keyboard,
+                    consumer=gamepad.consumer,
+                )
+            )
+            usage_reports = []
+            if gamepad.keyboard:
+                usage_reports.append(
+                    (
+                        UsageReport(encoder.packer_for(KEYBOARD_REPORT_ID)),
+                        KEYBOARD_USAGES,
+                    )
+                )
+            if gamepad.consumer:
+                usage_reports.append(
+                    (
+                        UsageReport(encoder.packer_for(CONSUMER_REPORT_ID)),
+                        CONSUMER_USAGES,
+                    )
+                )
+            if any(encoder.axis_slot(code) is None for code in plan.axis_codes):
+                log.warning(
+                    "Mapping drives axes the gadget report doesn't have, ignoring them",
+                    report_axes=encoder.num_axes,
+                    axes=plan.axis_codes,
+                )
+            writer = HIDGadgetWriter(gamepad.hid_endpoints[slot])
+            writer.open()
+            return GadgetSink(
+                writer,
+                ReportBuffer(encoder),
+                plan.axis_codes,
+                gamepad.report_interval / 1000,
+                plan.virtual_codes,
+                usage_reports,
+            )
+        case _:
+            raise ValueError("Unsupported gamepad type")
 
 
-def bytes_to_binary_str(bytes_obj: bytearray) -> str:
+def close_sink(sink: VirtualSink | GadgetSink):
     """
-    Outputs the data to a binary strin
+    Close the output created by create_sink
     """
-    return "".join(f"{byte:08b}" for byte in bytes_obj)
-
-
-async def write_hid_report_to_device(hid_endpoint, buttons_state):
+    match sink:
+        case VirtualSink():
+            sink.virtual_gp.close()
+            log.info("Virtual Gamepad Closed")
+        case GadgetSink():
+            sink.close()
+            log.info("Ending gadget")
+
+
+async def process_device(
+    device: InputDevice | CapturingDevice | ReplayDevice, pipeline: Pipeline
+):
     """
-    Send HID report to the device endpoint.
-
-    :param buttons_state: A list of 24 booleans, where each boolean represents
-                          the state of a button (True=pressed, False=not pressed).
+    Run every frame read from the device through the pipeline
     """
-    if len(buttons_state) != 24:
-        raise ValueError("Expected 24 button states")
-
-    # Report ID
-    report_bytes = bytearray([0x01])
-
-    # Convert the button states to a 3-byte report
-    current_byte = 0x00
-    for i, button in enumerate(buttons_state):
-        if button:
-            current_byte |= 1 << (i % 8)
-
-        # Every 8 buttons, append the current byte to report_bytes and reset current_byte
-        if (i + 1) % 8 == 0:
-            report_bytes.append(current_byte)
-            current_byte = 0x00
-
-    # Fill in the remaining bytes (if any)
-    while len(report_bytes) < 4:
-        report_bytes.append(0x00)
-    # Report for all buttons released
-    release_report_bytes = bytearray([0x01, 0x00, 0x00, 0x00])
-    try:
-        with open(hid_endpoint, "wb") as hid_device:
-            # Write the button press report
-            hid_device.write(report_bytes)
-            log.info(
-                "Sent button press to gadget with result",
-                endpoint=hid_endpoint,
-                data=bytes_to_binary_str(report_bytes),
-            )
-    except (FileNotFoundError, OSError, PermissionError, ValueError, IOError):
-        log.error("Error while sending to gadget", exc_info=True)
-        # Short delay before releasing the button
-        # To ensure the press is registered.
-    await asyncio.sleep(0.2)
-    try:
-        with open(hid_endpoint, "wb") as hid_device:
-            # Write the button release report
-            hid_device.write(release_report_bytes)
-            log.info(
-                "Sent button release to gadget with result",
-                endpoint=hid_endpoint,
-                data=bytes_to_binary_str(release_report_bytes),
-            )
+    async for frames in read_frames(device):
+        for frame in frames:
+            pipeline.handle_frame(frame)
 
-    except (FileNotFoundError, OSError, PermissionError, ValueError, IOError):
-        log.error("Error while sending to gadget", exc_info=True)
 
+def apply_mapping(
+    config: Config,
+    players: PlayerSlots,
+    mapping: MappingDefinition,
+    plan: TranslationPlan,
+) -> bool:
+    """
+    Switch the running pipelines to a reloaded mapping
 
-async def send_to_gadget(hid_endpoint, translated_event: int):
+    Either every connected player takes the mapping or none do,
+    so the players never end up on different mappings.
     """
-    Send the processed event to the external gadget.
+    connected = [player for player in players if player.pipeline is not None]
+    if not all(player.pipeline.accepts(plan) for player in connected):
+        return False
+    for player in connected:
+        previous = player.pipeline.plan
+        player.pipeline.swap_plan(plan)
+        if not isinstance(player.device, InputDevice):
+            continue
+        warn_missing_events(player.device, mapping)
+        if not config.capture and plan.event_mask() != previous.event_mask():
+            install_event_mask(player.device, plan.event_mask())
+    config.mapping = mapping
+    return True
+
+
+async def reload_mapping(config: Config, players: PlayerSlots):
     """
-    if not 0 <= translated_event < 24:
-        raise ValueError("Position must be between 0 and 23 inclusive.")
-
-    buttons_state = [False] * 24
-    buttons_state[translated_event] = True
-    await write_hid_report_to_device(hid_endpoint, buttons_state)
+    Reload the mapping into every player's pipeline when its file changes
+    """
+    reloader = MappingReloader(
+        config.mapping_file,
+        lambda mapping, plan: apply_mapping(config, players, mapping, plan),
+    )
+    await reloader.run()
 
 
-def device_available(config: Config) -> bool:
+async def watch_device(
+    config: Config,
+    player: Player,
+    players: PlayerSlots,
+    latency: LatencyTracker | None = None,
+):
+    """
+    Read events from the player's remote and process them
     """
-    Check to see if configured deevice is available
+    debouncer = ButtonDebouncer(config.debounce_time)
+    identity = DeviceIdentity.from_device(player.device)
+    capture = CaptureWriter(config.capture) if config.capture else nullcontext()
+
+    with capture:
+        while True:
+            try:
+                # A reload may have changed the mapping since the last connection
+                sink = create_sink(config, compile_mapping(config.mapping), player.slot)
+                pipeline = Pipeline(config.mapping, sink, debouncer, latency)
+                # A capture holds every event the remote sends so it can be replayed
+                # with another mapping, the pipeline ignores the unmapped ones
+                if not config.capture:
+                    install_event_mask(player.device, pipeline.plan.event_mask())
+                if config.grab:
+                    grab_device(player.device)
+                player.pipeline = pipeline
+                try:
+                    source = player.device
+                    if isinstance(capture, CaptureWriter):
+                        source = CapturingDevice(player.device, capture)
+                    await process_device(source, pipeline)
+                finally:
+                    player.pipeline = None
+                    if config.grab:
+                        ungrab_device(player.device)
+                    pipeline.close()
+                    close_sink(sink)
+
+            except OSError:
+                log.warning(
+                    "Device disconnected, waiting for it to become available...",
+                    player=player.slot,
+                )
+                try:
+                    player.device.close()
+                except OSError:
+                    pass
+                player.device = await wait_for_device(
+                    identity, in_use=lambda: players.paths_in_use(player)
+                )
+                log.info(
+                    "Device reconnected, resuming...",
+                    path=player.device.path,
+                    player=player.slot,
+                )
+
+
+async def replay_capture(
+    config: Config, player: Player, latency: LatencyTracker | None = None
+):
     """
+    Run a capture through the pipeline until it ends
+    """
+    sink = create_sink(config, compile_mapping(config.mapping), player.slot)
+    player.pipeline = Pipeline(
+        config.mapping,
+        sink,
+        ButtonDebouncer(config.debounce_time),
+        latency,
+        player.device.time_scale,
+    )
     try:
-        device = InputDevice(config.device.path)
-        device.close()
-        return True
-    except OSError:
-        return False
-
-
-RECHECK_DELAY = 10
+        with player.device:
+            await process_device(player.device, player.pipeline)
+    except EOFError:
+        log.info("Replay finished", path=player.device.path)
+    finally:
+        player.pipeline.close()
+        player.pipeline = None
+        close_sink(sink)
 
 
-async def watch_device(config: Config):
+async def run(config: Config, latency: LatencyTracker | None = None):
     """
-    Read events and process
+    Watch the remote of every player or replay the capture,
+    reloading the mapping when its file changes
+    and logging the latency summary periodically when tracking it
     """
-    virtual_translation, gadget_translation = create_event_translation(config.mapping)
-
-    while True:
-        try:
-            match config.gamepad.gamepad_type:
-                case "virtual":
-                    virtual_gp = create_virtual_gamepad(config)
-                    try:
-                        async for event in config.device.async_read_loop():
-                            if event.type == getattr(ecodes, config.mapping.event.type):
-                                processed_event = await process_event(
-                                    event, virtual_translation
-                                )
-                                if processed_event is not None:
-                                    await send_to_virtual(virtual_gp, processed_event)
-                                await asyncio.sleep(0.1)
-                    finally:
-                        virtual_gp.close()
-                        log.info("Virtual Gamepad Closed")
-
-                case "gadget":
-                    try:
-                        async for event in config.device.async_read_loop():
-                            if event.type == getattr(ecodes, config.mapping.event.type):
-                                processed_event = await process_event(
-                                    event, gadget_translation
-                                )
-                                if processed_event is not None:
-                                    await send_to_gadget(
-                                        config.gamepad.hid_endpoint, processed_event
-                                    )
-                                await asyncio.sleep(0.1)
-                    finally:
-                        log.info("Ending gadget")
-
-                case _:
-                    raise ValueError("Unsupported gamepad type")
-
-        except OSError:
-            log.warning("Device disconnected, waiting for it to become available...")
-            while not device_available(config.device.path):
-                await asyncio.sleep(RECHECK_DELAY)
-            log.info("Device reconnected, resuming...")
+    players = PlayerSlots(config.devices)
+    if isinstance(config.devices[0], ReplayDevice):
+        process = replay_capture(config, players.players[0], latency)
+    else:
+        # One task per player so a remote or endpoint only ever holds up its own player
+        process = asyncio.gather(
+            *(watch_device(config, player, players, latency) for player in players)
+        )
+
+    background = []
+    if config.reload_mapping:
+        background.append(asyncio.create_task(reload_mapping(config, players)))
+    if latency is not None:
+        background.append(
+            asyncio.create_task(log_periodically(latency, config.latency_interval))
+        )
+    try:
+        await process
+    finally:
+        for task in background:
+            task.cancel()
+        for task in background:
+            with suppress(asyncio.CancelledError):
+                await task
 
 
 def main():
@@ -264,14 +321,16 @@ def main():
 
     config = set_config()
     log.info("Samsung Report to Virtual Gamepad", config=config)
-    # virtual_gamepad(config)
+    latency = LatencyTracker() if config.latency_interval > 0 else None
     loop = asyncio.get_event_loop()
     try:
-        loop.run_until_complete(watch_device(config))
+        loop.run_until_complete(run(config, latency))
     except KeyboardInterrupt:
         pass
     finally:
         loop.close()
+        if latency is not None:
+            print_table(latency.summary_rows(), title="Input Latency")
 
 
 if __name__ == "__main__":
@@ -5,65 +5,52 @@ import sys
 import argparse
 from pathlib import Path
 
-import yaml
-from pydantic import ValidationError
 from structlog import get_logger
 
 from remote_to_controller.models import MappingDefinition
 from remote_to_controller.console import get_user_selection
+from remote_to_controller.mapping_cache import MAPPING_CACHE
 
 log = get_logger()
 
 
-def load_yaml_to_model(filename: Path) -> MappingDefinition:
-    """
-    Loads a YAML file and parses it into a pydantic model.
-    """
-    with open(filename, "r", encoding="utf-8") as file:
-        data = yaml.safe_load(file)
-
-    try:
-        return MappingDefinition.model_validate(data)
-    except ValidationError:
-        log.exception("Error Parsing Mapping File", filename=filename)
-        raise
+MAPPINGS_DIR = Path(__file__).parent / "mappings"
 
 
-def build_yaml_selection() -> tuple[list[dict[str, str]], dict[int, MappingDefinition]]:
+def build_yaml_selection() -> tuple[list[dict[str, str]], dict[int, Path]]:
     """
     Returns list of yaml mapping files with 'id', 'MappingDefinition.name', and 'Filename' columns
-    and a dictionary mapping ids to MappingDefinition instances.
-    """
-    current_file_dir = Path(__file__).parent
-    yaml_files = list(current_file_dir.joinpath("mappings").glob("*.yaml"))
+    and a dictionary mapping ids to the mapping files.
 
+    Only the mapping cache's index is read, files are validated only when they changed.
+    """
     selections = []
-    mapping_definitions = {}
-
-    for idx, file in enumerate(yaml_files):
-        try:
-            mapping_def = load_yaml_to_model(file)
-            selections.append(
-                {
-                    "id": str(idx),
-                    "Name": mapping_def.name,
-                    "Filename": file.name,
-                }
-            )
-            mapping_definitions[idx] = mapping_def
-        except ValidationError:
+    mapping_files = {}
+
+    for idx, entry in enumerate(MAPPING_CACHE.index(MAPPINGS_DIR)):
+        file = Path(entry.path)
+        if entry.name is None:
             log.error(f"Failed to load YAML: {file}")
+            continue
+        selections.append(
+            {
+                "id": str(idx),
+                "Name": entry.name,
+                "Filename": file.name,
+            }
+        )
+        mapping_files[idx] = file
 
-    return selections, mapping_definitions
+    return selections, mapping_files
 
 
-def select_mapping_yaml() -> MappingDefinition:
+def select_mapping_yaml() -> Path:
     """
     Select which file to use to map the remote to input events
     """
     (
         yaml_files,
-        mapping_definitions,
+        mapping_files,
     ) = build_yaml_selection()
 
     if not yaml_files:
@@ -72,14 +59,16 @@ def select_mapping_yaml() -> MappingDefinition:
 
     selected = get_user_selection(yaml_files)
 
-    return mapping_definitions[int(selected["id"])]
+    return mapping_files[int(selected["id"])]
 
 
-def get_mapping(parsed_args: argparse.Namespace):
+def get_mapping(parsed_args: argparse.Namespace) -> tuple[Path, MappingDefinition]:
     """
-    Get Mappings from arg or let user select
+    Get Mappings from arg or let user select, returns the file and its mapping
     """
     if parsed_args.mapping_file:
-        return load_yaml_to_model(parsed_args.mapping_file)
+        mapping_file = Path(parsed_args.mapping_file)
+    else:
+        mapping_file = select_mapping_yaml()
 
-    return select_mapping_yaml()
+    return mapping_file, MAPPING_CACHE.load(mapping_file)
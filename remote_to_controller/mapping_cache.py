@@ -0,0 +1,198 @@
+"""
+Cache of validated mappings
+
+Parsing and validating every mapping yaml on each start is slow on small boards,
+so validated mappings are pickled to the cache directory with an index of
+the files they came from. A file is only parsed again when its mtime or size changed
+and its content hash no longer matches, and selecting a mapping only reads the index.
+"""
+import os
+import pickle
+from pathlib import Path
+from typing import NamedTuple
+
+from pydantic import ValidationError
+from structlog import get_logger
+
+from remote_to_controller.models import MappingDefinition
+
+log = get_logger()
+
+# Bump when the cached form of MappingDefinition changes
+CACHE_VERSION = 3
+CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    / "remote_to_controller"
+)
+
+
+class IndexEntry(NamedTuple):
+    """
+    A mapping file as it was when last validated, name is None if it failed to validate
+    """
+
+    path: str
+    mtime_ns: int
+    size: int
+    digest: str
+    name: str | None
+
+
+def load_yaml_to_model(filename: Path) -> MappingDefinition:
+    """
+    Loads a YAML file and parses it into a pydantic model.
+    """
+    # Only needed when a mapping isn't cached
+    import yaml  # pylint: disable=import-outside-toplevel
+
+    with open(filename, "r", encoding="utf-8") as file:
+        data = yaml.safe_load(file)
+
+    try:
+        return MappingDefinition.model_validate(data)
+    except ValidationError:
+        log.exception("Error Parsing Mapping File", filename=filename)
+        raise
+
+
+def _write_atomic(path: Path, data: bytes):
+    temporary = path.with_name(f".{path.name}.{os.getpid()}")
+    temporary.write_bytes(data)
+    os.replace(temporary, path)
+
+
+class MappingCache:
+    """
+    Index of mapping files and their validated definitions in the cache directory
+    """
+
+    def __init__(self, cache_dir: Path = CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.index_path = self.cache_dir / "index.pickle"
+        self._index: dict[str, IndexEntry] | None = None
+
+    def _definition_path(self, digest: str) -> Path:
+        return self.cache_dir / f"{digest}.pickle"
+
+    def _read_index(self) -> dict[str, IndexEntry]:
+        if self._index is None:
+            self._index = {}
+            try:
+                version, index = pickle.loads(self.index_path.read_bytes())
+            except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+                return self._index
+            if version == CACHE_VERSION:
+                self._index = index
+        return self._index
+
+    def _write_index(self):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            _write_atomic(
+                self.index_path, pickle.dumps((CACHE_VERSION, self._read_index()))
+            )
+        except OSError:
+            log.debug("Unable to write mapping cache", path=str(self.index_path))
+
+    def _refresh(self, path: Path) -> IndexEntry:
+        """
+        The index entry for path, validating the file only when its content changed
+        """
+        index = self._read_index()
+        stat_result = path.stat()
+        cached = index.get(str(path))
+        if (
+            cached is not None
+            and cached.mtime_ns == stat_result.st_mtime_ns
+            and cached.size == stat_result.st_size
+        ):
+            return cached
+
+        import hashlib  # pylint: disable=import-outside-toplevel
+        import yaml  # pylint: disable=import-outside-toplevel
+
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        if cached is not None and cached.digest == digest:
+            # Touched but not changed
+            entry = cached._replace(
+                mtime_ns=stat_result.st_mtime_ns, size=stat_result.st_size
+            )
+        else:
+            try:
+                definition = load_yaml_to_model(path)
+            except (ValidationError, yaml.YAMLError):
+                definition = None
+            entry = IndexEntry(
+                path=str(path),
+                mtime_ns=stat_result.st_mtime_ns,
+                size=stat_result.st_size,
+                digest=digest,
+                name=definition.name if definition is not None else None,
+            )
+            if definition is not None:
+                self._store_definition(digest, definition)
+        index[str(path)] = entry
+        return entry
+
+    def _store_definition(self, digest: str, definition: MappingDefinition):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            _write_atomic(
+                self._definition_path(digest),
+                pickle.dumps(definition, protocol=pickle.HIGHEST_PROTOCOL),
+            )
+        except OSError:
+            log.debug("Unable to write mapping cache", path=str(self.cache_dir))
+
+    def index(self, directory: Path) -> list[IndexEntry]:
+        """
+        Entries for every mapping yaml in the directory, sorted by filename
+        """
+        index = self._read_index()
+        paths = sorted(directory.glob("*.yaml"))
+        before = dict(index)
+        entries = [self._refresh(path) for path in paths]
+
+        # Forget files removed from the directory
+        current = {str(path) for path in paths}
+        for key in list(index):
+            if Path(key).parent == directory and key not in current:
+                del index[key]
+
+        if index != before:
+            self._write_index()
+            self._remove_unused(before)
+        return entries
+
+    def _remove_unused(self, before: dict[str, IndexEntry]):
+        used = {entry.digest for entry in self._read_index().values()}
+        for entry in before.values():
+            if entry.digest not in used:
+                self._definition_path(entry.digest).unlink(missing_ok=True)
+
+    def load(self, path: Path) -> MappingDefinition:
+        """
+        The validated mapping of a file, from the cache when the file hasn't changed
+
+        Raises ValidationError like load_yaml_to_model if the file isn't a valid mapping.
+        """
+        path = Path(path)
+        index = self._read_index()
+        before = index.get(str(path))
+        entry = self._refresh(path)
+        if entry != before:
+            self._write_index()
+
+        if entry.name is None:
+            # Validate again so the caller gets the error
+            return load_yaml_to_model(path)
+        try:
+            definition = pickle.loads(self._definition_path(entry.digest).read_bytes())
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            definition = load_yaml_to_model(path)
+            self._store_definition(entry.digest, definition)
+        return definition
+
+
+MAPPING_CACHE = MappingCache()
@@ -21,7 +21,28 @@ class Mapping(BaseModel):
 
     event_code: str
     remote_value: int = Field(description="The Event Value")
+    event: Event | None = Field(
+        default=None,
+        description="Event type and code to match, defaults to the definition's",
+    )
     description: str
+    press_duration: float | None = Field(
+        default=None,
+        description="Seconds the button is held for, defaults to the definition's",
+    )
+
+
+class AxisMapping(BaseModel):
+    """
+    Relative motion from the remote driving a gamepad axis
+    """
+
+    event: Event = Field(description="Relative event to read, e.g. EV_REL REL_X")
+    axis: str = Field(description="Gamepad axis to drive, e.g. ABS_X")
+    scale: float = Field(
+        default=1.0, description="Axis deflection per unit of motion in an interval"
+    )
+    description: str = ""
 
 
 class GadgetConfig(BaseModel):
@@ -30,8 +51,28 @@ class GadgetConfig(BaseModel):
     """
 
     gamepad_type: str
-    hid_endpoint: str = Field(
-        default="/dev/hidg0", description="Device to send HID events to"
+    hid_endpoints: list[str] = Field(
+        default_factory=lambda: ["/dev/hidg0"],
+        min_length=1,
+        description="Device to send HID events to for each player, in slot order",
+    )
+    report_interval: float = Field(
+        default=0,
+        ge=0,
+        description="Milliseconds between reports, 0 sends each change straight away",
+    )
+    num_axes: int = Field(
+        default=0,
+        ge=0,
+        le=6,
+        description="Axes in the gadget's report after the buttons",
+    )
+    keyboard: bool = Field(
+        default=False, description="Gadget descriptor has a keyboard, Report ID 2"
+    )
+    consumer: bool = Field(
+        default=False,
+        description="Gadget descriptor has a consumer control, Report ID 3",
     )
 
 
@@ -42,5 +83,12 @@ class MappingDefinition(BaseModel):
 
     name: str
     description: str
-    event: Event
+    event: Event = Field(description="Event type and code mappings match by default")
+    press_duration: float = Field(
+        default=0.2, description="Seconds a button is held for after a press"
+    )
     mappings: list[Mapping]
+    axes: list[AxisMapping] = Field(default_factory=list)
+    axis_rate: float = Field(
+        default=100, gt=0, description="Most times a second the axes are written"
+    )
@@ -0,0 +1,248 @@
+"""
+Mapping remote events to gamepad button changes
+"""
+from typing import Callable, Protocol, Sequence
+from logging import INFO, WARNING
+
+from evdev import InputEvent
+from structlog import get_logger
+
+from remote_to_controller.models import MappingDefinition
+from remote_to_controller.frames import Frame
+from remote_to_controller.scheduler import ReleaseScheduler
+from remote_to_controller.debounce import ButtonDebouncer
+from remote_to_controller.button_state import ButtonState
+from remote_to_controller.latency import LatencyTracker
+from remote_to_controller.axes import AxisAccumulator
+from remote_to_controller.log_config import is_enabled
+from remote_to_controller.translation import (
+    ButtonAction,
+    TranslationPlan,
+    ValueTable,
+    compile_mapping,
+)
+
+log = get_logger()
+
+
+class Sink(Protocol):
+    """
+    An output the button state is written to
+    """
+
+    num_buttons: int
+    # Set by the pipeline, called with whether anything was written once the
+    # changes of a flush are written, which may be later than the flush
+    on_sent: Callable[[bool], None] | None
+
+    def apply(self, previous: int, current: int):
+        """
+        Record a change of the button mask
+        """
+
+    def flush(self) -> bool:
+        """
+        Write the changes recorded since the last flush,
+        returns whether anything was written
+        """
+
+    def supports(self, codes: Sequence[int]) -> bool:
+        """
+        Whether the sink can switch to the buttons of another mapping
+        """
+
+    def remap(self, codes: Sequence[int]):
+        """
+        Switch to the buttons of another mapping
+        """
+
+    def set_axes(self, values: Sequence[int]):
+        """
+        Write the deflection of every axis the sink was created with
+        """
+
+
+def process_event(
+    event: InputEvent, values: ValueTable, debouncer: ButtonDebouncer
+) -> ButtonAction | None:
+    """
+    Process button press events
+    """
+    if is_enabled(INFO):
+        log.info(
+            "Received Event",
+            event_code=event.code,
+            event_type=event.type,
+            event_value=event.value,
+        )
+
+    # Fetch the translated event (gamepad's button)
+    action = values.lookup(event.value)
+    if action is None:
+        if is_enabled(WARNING):
+            log.warning("Event value not mapped", event_value=event.value)
+        return None
+
+    # Skip repeats of the same button within the debounce interval
+    if not debouncer.accept(action.button, event.timestamp()):
+        if is_enabled(INFO):
+            log.info(
+                "Button pressed within debounce interval. Skipping processing.",
+                button=action.button,
+            )
+        return None
+
+    return action
+
+
+def press_button(
+    state: ButtonState,
+    scheduler: ReleaseScheduler,
+    button: int,
+    duration: float,
+):
+    """
+    Hold the button in the shared state and schedule its release
+
+    Pressing a button that is already held only extends its release.
+    """
+    state.press(button)
+    scheduler.schedule(button, duration)
+
+
+class Pipeline:
+    """
+    Runs the mapping once per input frame and writes the result to the sink
+
+    Press durations are multiplied by time_scale, so an accelerated replay
+    holds buttons for as long relative to the gaps between its events.
+    """
+
+    def __init__(
+        self,
+        mapping: MappingDefinition,
+        sink: Sink,
+        debouncer: ButtonDebouncer,
+        latency: LatencyTracker | None = None,
+        time_scale: float = 1.0,
+    ):
+        self.sink = sink
+        self.debouncer = debouncer
+        self.latency = latency
+        self.time_scale = time_scale
+        self.plan = compile_mapping(mapping)
+        self.state = ButtonState(sink.num_buttons, sink.apply)
+        self.scheduler = ReleaseScheduler(self.state.release, sink.flush)
+        self.axes = AxisAccumulator(
+            len(self.plan.axis_codes), self.plan.axis_rate, sink.set_axes
+        )
+        # Kernel time of the oldest mapped event the sink hasn't written yet
+        self._unsent: float | None = None
+        if latency is not None:
+            sink.on_sent = self._record_written
+
+    def handle_frame(self, frame: Frame):
+        """
+        Apply every event of the frame then write the changes at once
+        """
+        if frame.dropped:
+            self.resync()
+            return
+
+        dispatch = self.plan.dispatch
+        axes = self.plan.axes
+        mapped = None
+        moved = False
+        for event in frame.events:
+            codes = dispatch.get(event.type)
+            values = codes.get(event.code) if codes is not None else None
+            if values is None:
+                if axes:
+                    motion = axes.get(event.type, {}).get(event.code)
+                    if motion is not None:
+                        self.axes.add(motion.axis, event.value * motion.scale)
+                        moved = True
+                continue
+            action = process_event(event, values, self.debouncer)
+            if action is not None:
+                mapped = event
+                press_button(
+                    self.state,
+                    self.scheduler,
+                    action.button,
+                    action.press_duration * self.time_scale,
+                )
+        if moved:
+            self.axes.frame_done()
+
+        if self.latency is None or mapped is None:
+            self.sink.flush()
+            return
+
+        if frame.replayed:
+            # The captured timestamps are from when the capture was recorded
+            kernel_time = frame.received
+        else:
+            kernel_time = mapped.timestamp()
+            if frame.received:
+                self.latency.record("read", kernel_time, frame.received)
+        self.latency.record("mapped", kernel_time)
+        if self._unsent is None:
+            self._unsent = kernel_time
+        self.sink.flush()
+
+    def _record_written(self, sent: bool):
+        """
+        The sink wrote the changes flushed since the last call, such as on
+        a report pump tick, which counts as written for the oldest event they include
+        """
+        if self._unsent is not None and sent:
+            self.latency.record("written", self._unsent)
+        self._unsent = None
+
+    def accepts(self, plan: TranslationPlan) -> bool:
+        """
+        Whether the sink can output the plan without being recreated,
+        the axes themselves can't change without recreating it
+        """
+        return plan.axis_codes == self.plan.axis_codes and self.sink.supports(
+            plan.virtual_codes
+        )
+
+    def swap_plan(self, plan: TranslationPlan) -> bool:
+        """
+        Switch to another compiled mapping between frames,
+        returns False and keeps the current one if the sink can't output it
+
+        Held buttons are released first since the new mapping may give their
+        index to another button, and the axes are centred.
+        """
+        if not self.accepts(plan):
+            return False
+        self.scheduler.release_all()
+        self.sink.flush()
+        self.axes.reset()
+        self.axes.interval = 1 / plan.axis_rate
+        self.sink.remap(plan.virtual_codes)
+        self.debouncer.reset()
+        self.plan = plan
+        return True
+
+    def resync(self):
+        """
+        Events were lost, the remote only reports presses so
+        release everything rather than leave buttons stuck down
+        """
+        log.warning("Input events dropped by the kernel, releasing all buttons")
+        self.scheduler.release_all()
+        self.debouncer.reset()
+        self.sink.flush()
+        self.axes.reset()
+
+    def close(self):
+        """
+        Release any held buttons and centre the axes
+        """
+        self.scheduler.release_all()
+        self.sink.flush()
+        self.axes.reset()
@@ -0,0 +1,49 @@
+"""
+Player slots for running several remotes at once
+
+Each remote is a player with its own pipeline and output, which for the gadget is
+its own hidg endpoint with its own non-blocking writer, so an endpoint the host
+is slow to poll only holds up that player's reports.
+A remote keeps its slot across reconnects since it is found again by its identity.
+"""
+from evdev import InputDevice
+
+from remote_to_controller.capture import ReplayDevice
+from remote_to_controller.pipeline import Pipeline
+
+
+class Player:
+    """
+    A remote, its player slot and the pipeline its frames currently go through
+    """
+
+    def __init__(self, slot: int, device: InputDevice | ReplayDevice):
+        self.slot = slot
+        self.device = device
+        # None while the remote is disconnected
+        self.pipeline: Pipeline | None = None
+
+
+class PlayerSlots:
+    """
+    The players in slot order
+    """
+
+    def __init__(self, devices: list[InputDevice | ReplayDevice]):
+        self.players = [Player(slot, device) for slot, device in enumerate(devices)]
+
+    def __iter__(self):
+        return iter(self.players)
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def paths_in_use(self, player: Player) -> set[str]:
+        """
+        The device nodes the other players have open
+        """
+        return {
+            other.device.path
+            for other in self.players
+            if other is not player and other.pipeline is not None
+        }
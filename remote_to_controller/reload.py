@@ -0,0 +1,115 @@
+"""
+Reloading the mapping file while running
+
+The file's directory is watched with inotify since editors usually replace the file
+rather than write to it, and SIGHUP reloads too for when inotify isn't available.
+Parsing, validating and compiling happen on a worker thread,
+only the swap of the compiled plan runs on the event loop between frames.
+"""
+import signal
+import asyncio
+from contextlib import suppress
+from pathlib import Path
+from typing import Callable
+
+from structlog import get_logger
+
+from remote_to_controller.hotplug import DirectoryWatcher, IN_CLOSE_WRITE, IN_MOVED_TO
+from remote_to_controller.mapping_cache import MAPPING_CACHE, MappingCache
+from remote_to_controller.models import MappingDefinition
+from remote_to_controller.translation import TranslationPlan, compile_mapping
+
+log = get_logger()
+
+# Editors often write a file more than once when saving, wait for them to finish
+SETTLE_TIME = 0.1
+
+
+class MappingReloader:
+    """
+    Loads the mapping file again when it changes and hands it to apply
+
+    apply runs on the event loop and returns whether the mapping was taken into use.
+    A file that doesn't load, or one apply refuses, leaves the current mapping active.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        apply: Callable[[MappingDefinition, TranslationPlan], bool],
+        cache: MappingCache = MAPPING_CACHE,
+    ):
+        self.path = Path(path)
+        self.apply = apply
+        self.cache = cache
+        self._changed = asyncio.Event()
+
+    def _load(self) -> tuple[MappingDefinition, TranslationPlan]:
+        import yaml  # pylint: disable=import-outside-toplevel
+
+        try:
+            mapping = self.cache.load(self.path)
+        except yaml.YAMLError as error:
+            raise ValueError(str(error)) from error
+        return mapping, compile_mapping(mapping)
+
+    async def reload(self) -> bool:
+        """
+        Load the file on a worker thread and apply it
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            mapping, plan = await loop.run_in_executor(None, self._load)
+        except (ValueError, AttributeError, OSError) as error:
+            log.error(
+                "Mapping reload failed, keeping the current mapping",
+                path=str(self.path),
+                error=str(error),
+            )
+            return False
+
+        if not self.apply(mapping, plan):
+            log.error(
+                "Mapping needs buttons or axes the gamepad wasn't created with,"
+                " restart to use it. Keeping the current mapping",
+                path=str(self.path),
+            )
+            return False
+        log.info("Mapping reloaded", path=str(self.path), name=mapping.name)
+        return True
+
+    async def _watch(self, watcher: DirectoryWatcher):
+        while True:
+            if self.path.name in await watcher.changes():
+                self._changed.set()
+
+    async def run(self):
+        """
+        Reload on every change until cancelled
+        """
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGHUP, self._changed.set)
+        watcher = DirectoryWatcher(self.path.parent, IN_CLOSE_WRITE | IN_MOVED_TO)
+        try:
+            watcher.open()
+            watching = asyncio.create_task(self._watch(watcher))
+        except OSError:
+            log.warning(
+                "Unable to watch the mapping file, send SIGHUP to reload it",
+                path=str(self.path),
+            )
+            watching = None
+
+        try:
+            while True:
+                await self._changed.wait()
+                await asyncio.sleep(SETTLE_TIME)
+                self._changed.clear()
+                await self.reload()
+        finally:
+            loop.remove_signal_handler(signal.SIGHUP)
+            if watching is not None:
+                watching.cancel()
+                with suppress(asyncio.CancelledError):
+                    await watching
+            watcher.close()
@@ -0,0 +1,102 @@
+"""
+Sending gadget reports on a fixed interval
+
+The host polls the gadget's endpoint every bInterval, so reports written faster
+than that only queue up. The pump sends the current state on a fixed grid of
+that interval instead, so every change within one interval becomes one report.
+It is only armed while a change is waiting, an idle gamepad costs no timers.
+"""
+import math
+import asyncio
+from typing import Callable
+
+from structlog import get_logger
+
+from remote_to_controller.latency import LatencyHistogram
+
+log = get_logger()
+
+
+class ReportPump:
+    """
+    Calls send at the next tick of the grid after a change is requested
+
+    send returns whether a report was written, it is False when the state
+    ended up the same as the last report. How late each tick fired after its
+    slot on the grid is recorded in lateness.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        send: Callable[[], bool],
+        loop: asyncio.AbstractEventLoop | None = None,
+    ):
+        if interval <= 0:
+            raise ValueError("Report interval should be above 0.")
+        self.interval = interval
+        self.send = send
+        self._loop = loop
+        self._origin: float | None = None
+        self._due: float | None = None
+        self._last_due = float("-inf")
+        self._timer: asyncio.TimerHandle | None = None
+        self.lateness = LatencyHistogram()
+        self.sent = 0
+        self.suppressed = 0
+        self.coalesced = 0
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        return self._loop
+
+    def request(self):
+        """
+        Send the state at the next tick, changes before then share the report
+        """
+        if self._timer is not None:
+            self.coalesced += 1
+            return
+        loop = self._get_loop()
+        now = loop.time()
+        if self._origin is None:
+            self._origin = now
+        due = self._origin + math.ceil((now - self._origin) / self.interval) * (
+            self.interval
+        )
+        if due <= self._last_due:
+            due = self._last_due + self.interval
+        self._due = due
+        self._timer = loop.call_at(due, self._tick)
+
+    def _tick(self):
+        self._timer = None
+        self._last_due = self._due
+        self.lateness.record(self._get_loop().time() - self._due)
+        if self.send():
+            self.sent += 1
+        else:
+            self.suppressed += 1
+
+    def close(self):
+        """
+        Send a waiting change now and stop the timer
+        """
+        # send may ask for another report, such as the state after a latched press
+        while self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+            self.send()
+        log.info("Report pump", interval_ms=self.interval * 1000, **self.summary())
+
+    def summary(self) -> dict:
+        """
+        Counts and the lateness of the ticks in milliseconds
+        """
+        return {
+            "sent": self.sent,
+            "suppressed": self.suppressed,
+            "coalesced": self.coalesced,
+            "lateness": self.lateness.summary(),
+        }
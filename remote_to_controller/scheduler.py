@@ -0,0 +1,102 @@
+"""
+Scheduling button releases on the event loop
+"""
+import heapq
+import asyncio
+from typing import Callable
+
+from structlog import get_logger
+
+log = get_logger()
+
+
+class ReleaseScheduler:
+    """
+    Heap of release deadlines, one per held button
+
+    Pressing returns straight away and the release is fired from a single loop timer
+    armed for the earliest deadline, so the press duration never blocks reading events.
+    Pressing a button that is already held extends its deadline instead of
+    scheduling a second release.
+    Releases due at the same time are fired together and followed by one
+    call to on_batch so the sink can write them as a single frame.
+    """
+
+    def __init__(
+        self,
+        on_release: Callable[[int], None],
+        on_batch: Callable[[], None] | None = None,
+        loop: asyncio.AbstractEventLoop | None = None,
+    ):
+        self.on_release = on_release
+        self.on_batch = on_batch
+        self._loop = loop
+        self._heap: list[tuple[float, int]] = []
+        self._deadlines: dict[int, float] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._timer_deadline: float | None = None
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        return self._loop
+
+    def schedule(self, button: int, duration: float) -> bool:
+        """
+        Release the button after duration seconds
+
+        Returns True when the button was not already held.
+        """
+        newly_pressed = button not in self._deadlines
+        deadline = self._get_loop().time() + duration
+        self._deadlines[button] = deadline
+        heapq.heappush(self._heap, (deadline, button))
+        self._arm()
+        return newly_pressed
+
+    def release_all(self):
+        """
+        Fire every pending release now, used when a sink is shutting down
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+            self._timer_deadline = None
+        buttons = list(self._deadlines)
+        self._deadlines.clear()
+        self._heap.clear()
+        for button in buttons:
+            self.on_release(button)
+        if buttons and self.on_batch is not None:
+            self.on_batch()
+
+    def _arm(self):
+        if not self._heap:
+            return
+        deadline = self._heap[0][0]
+        if self._timer is not None:
+            if self._timer_deadline is not None and self._timer_deadline <= deadline:
+                return
+            self._timer.cancel()
+        self._timer_deadline = deadline
+        self._timer = self._get_loop().call_at(deadline, self._fire)
+
+    def _fire(self):
+        self._timer = None
+        self._timer_deadline = None
+        now = self._get_loop().time()
+        released = False
+        while self._heap and self._heap[0][0] <= now:
+            deadline, button = heapq.heappop(self._heap)
+            # Skip entries superseded by a later press of the same button
+            if self._deadlines.get(button) != deadline:
+                continue
+            del self._deadlines[button]
+            released = True
+            try:
+                self.on_release(button)
+            except Exception:  # pylint: disable=broad-exception-caught
+                log.error("Error while releasing button", button=button, exc_info=True)
+        if released and self.on_batch is not None:
+            self.on_batch()
+        self._arm()
@@ -0,0 +1,329 @@
+"""
+Gamepad outputs driven by changes to the button state
+
+Changes are collected with apply and written out together by flush,
+which is called once per input frame so a frame becomes a single update.
+"""
+from typing import Callable, NamedTuple, Sequence
+from logging import INFO
+
+from evdev import UInput, ecodes
+from structlog import get_logger
+
+from remote_to_controller.gadget_writer import HIDGadgetWriter
+from remote_to_controller.hid_report import (
+    ReportBuffer,
+    UsageReport,
+    bytes_to_binary_str,
+)
+from remote_to_controller.log_config import is_enabled
+from remote_to_controller.report_pump import ReportPump
+
+log = get_logger()
+
+EV_KEY = ecodes.ecodes["EV_KEY"]
+EV_ABS = ecodes.ecodes["EV_ABS"]
+
+
+class VirtualSink:
+    """
+    Writes button changes to a uinput virtual gamepad
+    """
+
+    def __init__(
+        self,
+        virtual_gp: UInput,
+        codes: Sequence[int],
+        axis_codes: Sequence[int] = (),
+    ):
+        self.virtual_gp = virtual_gp
+        self.codes = codes
+        self.axis_codes = axis_codes
+        self.num_buttons = len(codes)
+        # The codes the uinput device was created with
+        self.supported = frozenset(codes)
+        # Called after every flush with whether it wrote anything
+        self.on_sent: Callable[[bool], None] | None = None
+        self._written = 0
+        self._current = 0
+
+    def supports(self, codes: Sequence[int]) -> bool:
+        """
+        Whether the buttons can be switched to codes without recreating the device
+        """
+        return len(codes) <= self.num_buttons and self.supported.issuperset(codes)
+
+    def remap(self, codes: Sequence[int]):
+        """
+        Switch the code of each button
+
+        Buttons the device has down are released on their old codes first so none
+        stay stuck, the next flush presses the ones still held on their new codes.
+        """
+        if self._written:
+            self._write_keys(self._written, 0)
+            self.virtual_gp.syn()
+            self._written = 0
+        self.codes = codes
+
+    def apply(self, _previous: int, current: int):
+        """
+        Record the new button mask until the next flush
+        """
+        self._current = current
+
+    def flush(self) -> bool:
+        """
+        Write a key event for every button that changed since the last flush
+        followed by a single SYN_REPORT, returns whether anything was written
+        """
+        written = self._write_changes()
+        if self.on_sent is not None:
+            self.on_sent(written)
+        return written
+
+    def _write_changes(self) -> bool:
+        changed = self._written ^ self._current
+        if not changed:
+            return False
+
+        current = self._current
+        self._write_keys(changed, current)
+        self.virtual_gp.syn()
+
+        if is_enabled(INFO):
+            changed = self._written ^ current
+            log.info(
+                "Buttons Changed",
+                pressed=self._codes(changed & current),
+                released=self._codes(changed & ~current),
+            )
+        self._written = current
+        return True
+
+    def _write_keys(self, changed: int, current: int):
+        """
+        Write a key event for each button of changed, down when it is in current
+        """
+        write = self.virtual_gp.write
+        codes = self.codes
+        while changed:
+            lowest = changed & -changed
+            changed ^= lowest
+            write(EV_KEY, codes[lowest.bit_length() - 1], 1 if current & lowest else 0)
+
+    def _codes(self, mask: int) -> list[int]:
+        return [code for index, code in enumerate(self.codes) if mask >> index & 1]
+
+    def set_axes(self, values: Sequence[int]):
+        """
+        Write an absolute event per axis followed by a single SYN_REPORT
+        """
+        write = self.virtual_gp.write
+        for code, value in zip(self.axis_codes, values):
+            write(EV_ABS, code, value)
+        self.virtual_gp.syn()
+
+
+class UsageRoute(NamedTuple):
+    """
+    Buttons sent as the usages of a keyboard or consumer control report
+
+    usages pairs each button index with its usage, mask has a bit per button.
+    """
+
+    mask: int
+    usages: tuple[tuple[int, int], ...]
+    report: UsageReport
+
+
+class GadgetSink:
+    """
+    Writes the state of all buttons to the HID gadget when it changes
+
+    With a report interval the state is sent by a ReportPump on that interval
+    rather than on every flush, a report the same as the last one is never sent.
+    Buttons pressed at any point in an interval are latched, so a press released
+    within the same interval is still sent once before the state after it.
+    When the gadget's descriptor is a composite with a keyboard or consumer control,
+    buttons mapped to their keys are sent in those reports on the same endpoint
+    and the rest in the gamepad report.
+    """
+
+    def __init__(
+        self,
+        writer: HIDGadgetWriter,
+        report: ReportBuffer,
+        axis_codes: Sequence[int] = (),
+        report_interval: float = 0,
+        codes: Sequence[int] = (),
+        usage_reports: Sequence[tuple[UsageReport, dict[int, int]]] = (),
+    ):
+        self.writer = writer
+        self.report = report
+        self.num_buttons = report.encoder.num_buttons
+        self.axis_codes = axis_codes
+        # The report axis of each mapped axis, None for those the report lacks
+        self._axis_slots = [report.encoder.axis_slot(code) for code in axis_codes]
+        self.pump = (
+            ReportPump(report_interval, self._send_state) if report_interval else None
+        )
+        # Each usage report with the usages of the evdev codes it takes
+        self.usage_reports = usage_reports
+        self._routes: tuple[UsageRoute, ...] = ()
+        self._gamepad_mask = -1
+        self.remap(codes)
+        self._sent = bytes(report.buffer)
+        self._written = 0
+        self._current = 0
+        # Every button pressed since the last report pump tick
+        self._latched = 0
+        # Called with whether a report was sent after every flush,
+        # or every report pump tick when the pump sends them
+        self.on_sent: Callable[[bool], None] | None = None
+
+    def supports(self, codes: Sequence[int]) -> bool:
+        """
+        Whether the report has a bit for each button
+        """
+        return len(codes) <= self.num_buttons
+
+    def remap(self, codes: Sequence[int]):
+        """
+        Route the buttons whose codes are keys of a usage report to it,
+        the others stay report bits
+        """
+        routes = []
+        routed = 0
+        for usage_report, table in self.usage_reports:
+            usages = tuple(
+                (button, table[code])
+                for button, code in enumerate(codes)
+                if code in table and not routed >> button & 1
+            )
+            if usages:
+                mask = sum(1 << button for button, _usage in usages)
+                routed |= mask
+                routes.append(UsageRoute(mask, usages, usage_report))
+        self._routes = tuple(routes)
+        self._gamepad_mask = ~routed
+
+    def apply(self, _previous: int, current: int):
+        """
+        Record the new button mask until the next flush
+        """
+        self._current = current
+        self._latched |= current
+
+    def flush(self) -> bool:
+        """
+        Send a report holding the current mask if it changed since the last flush,
+        returns whether a report was sent
+        """
+        if self.pump is not None:
+            self.pump.request()
+            return False
+        sent = self._send_changes()
+        if self.on_sent is not None:
+            self.on_sent(sent)
+        return sent
+
+    def _send_changes(self) -> bool:
+        if self._current == self._written:
+            return False
+
+        current = self._current
+        changed = current ^ self._written
+        self._written = current
+        if changed & self._gamepad_mask:
+            self.report.set_mask(current & self._gamepad_mask)
+            self.writer.send(self.report.buffer)
+            if is_enabled(INFO):
+                log.info(
+                    "Sent button state to gadget",
+                    endpoint=self.writer.hid_endpoint,
+                    data=bytes_to_binary_str(self.report.buffer),
+                )
+        for route in self._routes:
+            if changed & route.mask:
+                self._send_usages(route, current)
+        return True
+
+    def set_axes(self, values: Sequence[int]):
+        """
+        Send a report holding the new deflections and the current buttons
+        """
+        for slot, value in zip(self._axis_slots, values):
+            if slot is not None:
+                self.report.set_axis(slot, value)
+        if self.pump is not None:
+            self.pump.request()
+            return
+        self.writer.send(self.report.buffer)
+
+    def _send_state(self) -> bool:
+        """
+        Send the current buttons and axes unless the last report already had them
+
+        When a button was pressed and released since the last tick the latched
+        buttons are sent instead, and the current state on the next tick.
+        """
+        current = self._current
+        latched = self._latched
+        self._latched = current
+        if latched != current and self._send_mask(latched):
+            self.pump.request()
+            sent = True
+        else:
+            self._written = current
+            sent = self._send_mask(current)
+        if self.on_sent is not None:
+            self.on_sent(sent)
+        return sent
+
+    def _send_mask(self, mask: int) -> bool:
+        """
+        Send the buttons of mask and the current axes in the reports that changed
+        """
+        sent = False
+        for route in self._routes:
+            sent |= self._send_usages(route, mask)
+
+        self.report.set_mask(mask & self._gamepad_mask)
+        if self.report.buffer == self._sent:
+            return sent
+        self.writer.send(self.report.buffer)
+        self._sent = bytes(self.report.buffer)
+        if is_enabled(INFO):
+            log.info(
+                "Sent button state to gadget",
+                endpoint=self.writer.hid_endpoint,
+                data=bytes_to_binary_str(self.report.buffer),
+            )
+        return True
+
+    def _send_usages(self, route: UsageRoute, current: int) -> bool:
+        """
+        Send the usage report of the route if its pressed usages changed
+        """
+        report = route.report
+        report.update(usage for button, usage in route.usages if current >> button & 1)
+        if report.buffer == report.sent:
+            return False
+        self.writer.send(report.buffer)
+        report.sent = bytes(report.buffer)
+        if is_enabled(INFO):
+            log.info(
+                "Sent usages to gadget",
+                endpoint=self.writer.hid_endpoint,
+                data=bytes_to_binary_str(report.buffer),
+            )
+        return True
+
+    def close(self):
+        """
+        Send any state the pump is holding then close the endpoint
+        """
+        if self.pump is not None:
+            self.pump.close()
+        self.writer.close()
@@ -0,0 +1,151 @@
+"""
+Compiling a mapping into a translation plan for the hot path
+
+Names such as EV_REL or BTN_C are resolved once when the mapping is compiled,
+so translating an event is a dispatch on its type and code then an index into a table
+rather than attribute lookups or a scan of the mapping entries.
+"""
+from typing import NamedTuple
+
+from evdev import ecodes
+from structlog import get_logger
+
+from remote_to_controller.models import MappingDefinition
+
+log = get_logger()
+
+# Remote values below this are looked up in the flat table, anything else in overflow
+TABLE_SIZE = 256
+
+
+class ButtonAction(NamedTuple):
+    """
+    What a remote value does
+
+    button is the index in the button state, which is also the gadget report bit,
+    and virtual_code the uinput code of the button.
+    """
+
+    button: int
+    virtual_code: int
+    press_duration: float
+
+
+class AxisAction(NamedTuple):
+    """
+    What relative motion does
+
+    axis is the index in the plan's axis codes and scale multiplies the motion.
+    """
+
+    axis: int
+    scale: float
+
+
+class ValueTable(NamedTuple):
+    """
+    The actions of the values of one event type and code
+    """
+
+    table: tuple[ButtonAction | None, ...]
+    overflow: dict[int, ButtonAction]
+
+    def lookup(self, value: int) -> ButtonAction | None:
+        """
+        The action of a remote value, None when it isn't mapped
+        """
+        if 0 <= value < TABLE_SIZE:
+            return self.table[value]
+        return self.overflow.get(value)
+
+
+class TranslationPlan(NamedTuple):
+    """
+    A mapping compiled for translating events
+
+    dispatch is keyed by event type then event code,
+    so finding the action of an event is two dict lookups and an index.
+    axes is keyed the same way for the motion driving axis_codes,
+    which are written at most axis_rate times a second.
+    """
+
+    dispatch: dict[int, dict[int, ValueTable]]
+    virtual_codes: tuple[int, ...]
+    axes: dict[int, dict[int, AxisAction]]
+    axis_codes: tuple[int, ...]
+    axis_rate: float
+
+    def event_mask(self) -> dict[int, set[int]]:
+        """
+        The codes of each event type the mapping uses
+        """
+        mask = {event_type: set(codes) for event_type, codes in self.dispatch.items()}
+        for event_type, codes in self.axes.items():
+            mask.setdefault(event_type, set()).update(codes)
+        return mask
+
+
+def compile_mapping(mapping: MappingDefinition) -> TranslationPlan:
+    """
+    Resolve every name in the mapping and build the lookup tables
+    """
+    tables: dict[tuple[int, int], list[ButtonAction | None]] = {}
+    overflows: dict[tuple[int, int], dict[int, ButtonAction]] = {}
+    virtual_codes = []
+    for button, map_data in enumerate(mapping.mappings):
+        action = ButtonAction(
+            button=button,
+            virtual_code=getattr(ecodes, map_data.event_code),
+            press_duration=map_data.press_duration
+            if map_data.press_duration is not None
+            else mapping.press_duration,
+        )
+        virtual_codes.append(action.virtual_code)
+
+        event = map_data.event or mapping.event
+        key = (getattr(ecodes, event.type), getattr(ecodes, event.code))
+        if key not in tables:
+            tables[key] = [None] * TABLE_SIZE
+            overflows[key] = {}
+        if 0 <= map_data.remote_value < TABLE_SIZE:
+            tables[key][map_data.remote_value] = action
+        else:
+            overflows[key][map_data.remote_value] = action
+
+    dispatch: dict[int, dict[int, ValueTable]] = {}
+    for (event_type, event_code), table in tables.items():
+        dispatch.setdefault(event_type, {})[event_code] = ValueTable(
+            table=tuple(table), overflow=overflows[(event_type, event_code)]
+        )
+
+    axes: dict[int, dict[int, AxisAction]] = {}
+    axis_codes: list[int] = []
+    for axis_mapping in mapping.axes:
+        code = getattr(ecodes, axis_mapping.axis)
+        if code not in axis_codes:
+            axis_codes.append(code)
+        axes.setdefault(getattr(ecodes, axis_mapping.event.type), {})[
+            getattr(ecodes, axis_mapping.event.code)
+        ] = AxisAction(axis=axis_codes.index(code), scale=axis_mapping.scale)
+
+    plan = TranslationPlan(
+        dispatch=dispatch,
+        virtual_codes=tuple(virtual_codes),
+        axes=axes,
+        axis_codes=tuple(axis_codes),
+        axis_rate=mapping.axis_rate,
+    )
+    log.debug(
+        "Compiled mapping",
+        buttons={
+            (
+                (map_data.event or mapping.event).type,
+                (map_data.event or mapping.event).code,
+                map_data.remote_value,
+            ): button
+            for button, map_data in enumerate(mapping.mappings)
+        },
+        virtual=virtual_codes,
+        axes=axis_codes,
+    )
+    return plan
@@ -1,8 +1,13 @@
 import time
 import random
 
+from remote_to_controller.hid_report import ReportEncoder, ReportBuffer
+
 HID_DEVICE_PATH = "/dev/hidg0"
 
+ENCODER = ReportEncoder()
+REPORT = ReportBuffer(ENCODER)
+
 
 def send_hid_report(buttons_state):
     """
@@ -14,34 +19,20 @@ def send_hid_report(buttons_state):
     if len(buttons_state) != 24:
         raise ValueError("Expected 24 button states")
 
-    # Report ID
-    report_bytes = bytearray([0x01])
-
-    # Convert the button states to a 3-byte report
-    current_byte = 0x00
     for i, button in enumerate(buttons_state):
         if button:
-            current_byte |= 1 << (i % 8)
-
-        # Every 8 buttons, append the current byte to report_bytes and reset current_byte
-        if (i + 1) % 8 == 0:
-            report_bytes.append(current_byte)
-            current_byte = 0x00
-
-    # Fill in the remaining bytes (if any)
-    while len(report_bytes) < 4:
-        report_bytes.append(0x00)
+            REPORT.set(i)
+        else:
+            REPORT.clear(i)
 
     with open(HID_DEVICE_PATH, "wb") as hid_device:
-        hid_device.write(report_bytes)
+        hid_device.write(REPORT.buffer)
 
 
 def send_static_report():
     # A report with report ID and where no button is pressed
-    report_bytes = bytearray([0x01, 0x00, 0x00, 0x00])
-
     with open(HID_DEVICE_PATH, "wb") as hid_device:
-        hid_device.write(report_bytes)
+        hid_device.write(ENCODER.release_report)
 
 
 def main():
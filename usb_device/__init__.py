@@ -2,6 +2,7 @@
 Module Exports
 """
 from .usb_gadget import USBGadget
-from .descriptor import create_gamepad_descriptor
+from .descriptor import create_gamepad_descriptor, create_composite_descriptor
+from .report_layout import ReportLayout, ReportPacker, parse_report_descriptor
 
 from . import models
@@ -6,14 +6,34 @@ from enum import IntEnum
 from structlog import get_logger
 
 from .models import USAGE_PAGE_TO_USAGES, HIDUsagePage, HIDPageGenericDesktop
+from .models import HIDPageKeyboard, HIDPageConsumer
 from .models import (
     HIDFieldType,
     HIDCollectionType,
     HIDInputType,
 )
 
+from .report_layout import parse_report_descriptor
+
 log = get_logger()
 
+# Report IDs of the collections of a composite descriptor
+GAMEPAD_REPORT_ID = 1
+KEYBOARD_REPORT_ID = 2
+CONSUMER_REPORT_ID = 3
+# Keys a keyboard report holds at once besides the modifiers
+KEYBOARD_KEYS = 6
+
+# Axes in the order of the ABS_X to ABS_RZ event codes
+AXIS_USAGES = (
+    HIDPageGenericDesktop.X,
+    HIDPageGenericDesktop.Y,
+    HIDPageGenericDesktop.Z,
+    HIDPageGenericDesktop.RX,
+    HIDPageGenericDesktop.RY,
+    HIDPageGenericDesktop.RZ,
+)
+
 
 def enum_to_values(items: list) -> list[int]:
     """
@@ -164,6 +184,16 @@ def unit_and_exponent(unit: int, exponent: int):
     ]
 
 
+def two_byte_item(field_type: HIDFieldType, value: int) -> list[int]:
+    """
+    An item with two data bytes
+
+    HIDFieldType values are prefixes for one data byte, the size bits of
+    the prefix are raised to two for values that don't fit in one.
+    """
+    return [field_type.value + 1, value & 0xFF, value >> 8 & 0xFF]
+
+
 def define_digital_buttons(num_buttons: int) -> list[int]:
     """
     Generates a HID descriptor list for button controls.
@@ -188,24 +218,157 @@ def define_digital_buttons(num_buttons: int) -> list[int]:
     )
 
 
-def create_gamepad_descriptor(num_buttons: int) -> bytes:
+def define_padding(num_bits: int) -> list[int]:
+    """
+    Constant bits that align the next field to a byte
     """
-    Generates a HID gamepad descriptor for a specified number of buttons.
+    return report_size_count(1, num_bits) + define_input_type(HIDInputType.CONSTANT)
+
+
+def define_axes(num_axes: int) -> list[int]:
+    """
+    Generates a HID descriptor list for analog axes.
+
+    The axes are X, Y, Z, Rx, Ry then Rz, each a signed byte
+    from -127 to 127 with 0 as the centre.
+    """
+    usages = []
+    for usage in AXIS_USAGES[:num_axes]:
+        usages += [HIDFieldType.USAGE, usage]
+    return (
+        [HIDFieldType.USAGE_PAGE, HIDUsagePage.GENERIC_DESKTOP]
+        + usages
+        # Item data is two's complement, -127 is 0x81
+        + logical_minimum_maximum(-127 & 0xFF, 127)
+        + physical_minimum_maximum(-127 & 0xFF, 127)
+        + report_size_count(8, num_axes)
+        + define_input_type(HIDInputType.DATA_VARIABLE_ABSOLUTE)
+    )
+
+
+def create_gamepad_descriptor(
+    num_buttons: int, num_axes: int = 0, report_id: int = 1
+) -> bytes:
+    """
+    Generates a HID gamepad descriptor for a specified number of buttons and axes.
     """
     if num_buttons < 1 or num_buttons > 255:
         raise ValueError("Number of buttons should be between 1 and 255.")
+    if num_axes < 0 or num_axes > len(AXIS_USAGES):
+        raise ValueError(f"Number of axes should be between 0 and {len(AXIS_USAGES)}.")
+
+    axes = []
+    if num_axes:
+        if num_buttons % 8:
+            axes += define_padding(8 - num_buttons % 8)
+        axes += define_axes(num_axes)
 
     descriptor = (
         # Define the gamepad collection
         set_usage(HIDUsagePage.GENERIC_DESKTOP, HIDPageGenericDesktop.GAMEPAD)
         + start_collection(HIDCollectionType.APPLICATION)
-        + set_report_id(1)
+        + set_report_id(report_id)
         + start_collection(HIDCollectionType.PHYSICAL)
         # Define buttons
         + define_digital_buttons(num_buttons)
+        # Define axes
+        + axes
         + end_collection()
         + end_collection()
     )
     values = bytes(enum_to_values(descriptor))
     log.info("Generated Descriptor", descriptor=descriptor, values=values.hex())
     return values
+
+
+def create_keyboard_descriptor(report_id: int = KEYBOARD_REPORT_ID) -> bytes:
+    """
+    Generates a HID keyboard descriptor in the layout of the boot keyboard.
+
+    The report is a byte of modifier bits, a reserved byte, then the usages
+    of up to six pressed keys.
+    """
+    descriptor = (
+        set_usage(HIDUsagePage.GENERIC_DESKTOP, HIDPageGenericDesktop.KEYBOARD)
+        + start_collection(HIDCollectionType.APPLICATION)
+        + set_report_id(report_id)
+        # Modifiers, left control to right GUI
+        + [HIDFieldType.USAGE_PAGE, HIDUsagePage.KEYBOARD_KEYPAD]
+        + usage_minimum_maximum(
+            HIDPageKeyboard.KEYBOARD_LEFT_CONTROL, HIDPageKeyboard.KEYBOARD_RIGHT_GUI
+        )
+        + logical_minimum_maximum(0, 1)
+        + report_size_count(1, 8)
+        + define_input_type(HIDInputType.DATA_VARIABLE_ABSOLUTE)
+        # Reserved
+        + report_size_count(8, 1)
+        + define_input_type(HIDInputType.CONSTANT)
+        # Pressed keys
+        + usage_minimum_maximum(0, HIDPageKeyboard.KEYBOARD_APPLICATION)
+        + logical_minimum_maximum(0, HIDPageKeyboard.KEYBOARD_APPLICATION)
+        + report_size_count(8, KEYBOARD_KEYS)
+        + define_input_type(HIDInputType.DATA_ARRAY_ABSOLUTE)
+        + end_collection()
+    )
+    values = bytes(enum_to_values(descriptor))
+    log.info("Generated Descriptor", descriptor=descriptor, values=values.hex())
+    return values
+
+
+def create_consumer_descriptor(report_id: int = CONSUMER_REPORT_ID) -> bytes:
+    """
+    Generates a HID consumer control descriptor for media and navigation keys.
+
+    The report holds the usage of one pressed key, or 0 when none is.
+    """
+    descriptor = (
+        set_usage(HIDUsagePage.CONSUMER, HIDPageConsumer.CONSUMER_CONTROL)
+        + start_collection(HIDCollectionType.APPLICATION)
+        + set_report_id(report_id)
+        + [HIDFieldType.LOGICAL_MINIMUM, 0]
+        + two_byte_item(HIDFieldType.LOGICAL_MAXIMUM, HIDPageConsumer.MAXIMUM)
+        + [HIDFieldType.USAGE_MINIMUM, 0]
+        + two_byte_item(HIDFieldType.USAGE_MAXIMUM, HIDPageConsumer.MAXIMUM)
+        + report_size_count(16, 1)
+        + define_input_type(HIDInputType.DATA_ARRAY_ABSOLUTE)
+        + end_collection()
+    )
+    values = bytes(enum_to_values(descriptor))
+    log.info("Generated Descriptor", descriptor=descriptor, values=values.hex())
+    return values
+
+
+def compose_descriptors(descriptors: list[bytes]) -> bytes:
+    """
+    Joins top level collections into one descriptor served by one endpoint.
+
+    Every collection needs its own Report ID so the host can tell
+    the reports apart.
+    """
+    seen: set[int] = set()
+    for descriptor in descriptors:
+        report_ids = set(parse_report_descriptor(descriptor).inputs)
+        if 0 in report_ids:
+            raise ValueError("Every collection of a composite needs a Report ID.")
+        if seen & report_ids:
+            raise ValueError(f"Report IDs {sorted(seen & report_ids)} used twice.")
+        seen |= report_ids
+    return b"".join(descriptors)
+
+
+def create_composite_descriptor(
+    num_buttons: int,
+    num_axes: int = 0,
+    keyboard: bool = False,
+    consumer: bool = False,
+) -> bytes:
+    """
+    Generates the gamepad descriptor, followed by a keyboard and
+    a consumer control when asked for, each with its own Report ID.
+    """
+    descriptors = [create_gamepad_descriptor(num_buttons, num_axes, GAMEPAD_REPORT_ID)]
+    if keyboard:
+        descriptors.append(create_keyboard_descriptor(KEYBOARD_REPORT_ID))
+    if consumer:
+        descriptors.append(create_consumer_descriptor(CONSUMER_REPORT_ID))
+    return compose_descriptors(descriptors)
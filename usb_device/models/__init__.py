@@ -24,6 +24,7 @@ from .descriptor_usage_page import (
     HIDPageSimulation,
     HIDPageVR,
     HIDPageSport,
+    HIDPageConsumer,
 )
 
 from .descriptor_enums import (
@@ -42,4 +43,5 @@ USAGE_PAGE_TO_USAGES = {
     HIDUsagePage.KEYBOARD_KEYPAD: HIDPageKeyboard,
     HIDUsagePage.LED: HIDPageLED,
     HIDUsagePage.BUTTON: HIDPageButton,
+    HIDUsagePage.CONSUMER: HIDPageConsumer,
 }
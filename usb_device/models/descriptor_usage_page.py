@@ -20,6 +20,7 @@ class HIDUsagePage(IntEnum):
     KEYBOARD_KEYPAD = 0x07
     LED = 0x08
     BUTTON = 0x09
+    CONSUMER = 0x0C
 
 
 class HIDPageGenericDesktop(IntEnum):
@@ -49,6 +50,12 @@ class HIDPageGenericDesktop(IntEnum):
     DEVICE_DOCK = 0x11
     DOCKABLE_DEVICE = 0x12
     CALL_STATE_MGMT_CONTROL = 0x13
+    X = 0x30
+    Y = 0x31
+    Z = 0x32
+    RX = 0x33
+    RY = 0x34
+    RZ = 0x35
     COUNTED_BUFFER = 0x3A
     SYSTEM_CONTROL = 0x80
     THUMBSTICK = 0x96
@@ -148,6 +155,9 @@ class HIDPageKeyboard(IntEnum):
     KEYBOARD_F1 = 0x3A
     KEYBOARD_ENTER = 0x28
     KEYPAD_ENTER = 0x58
+    KEYBOARD_APPLICATION = 0x65
+    KEYBOARD_LEFT_CONTROL = 0xE0
+    KEYBOARD_RIGHT_GUI = 0xE7
 
 
 class HIDPageLED(IntEnum):
@@ -172,3 +182,23 @@ class HIDPageButton(IntEnum):
     BUTTON_1 = 0x01
     BUTTON_2 = 0x02
     BUTTON_3 = 0x03
+
+
+class HIDPageConsumer(IntEnum):
+    """
+    INCOMPLETE
+    Section 15: Consumer Page (0x0C)
+    """
+
+    CONSUMER_CONTROL = 0x01
+    SCAN_NEXT_TRACK = 0xB5
+    SCAN_PREVIOUS_TRACK = 0xB6
+    STOP = 0xB7
+    PLAY_PAUSE = 0xCD
+    MUTE = 0xE2
+    VOLUME_INCREMENT = 0xE9
+    VOLUME_DECREMENT = 0xEA
+    AC_HOME = 0x223
+    AC_BACK = 0x224
+    # Largest usage the consumer control report carries
+    MAXIMUM = 0x3FF
@@ -0,0 +1,419 @@
+"""
+HID Report Descriptor Parsing
+
+Walks the items of a report descriptor the way a host does, following the item
+size bits, long items, PUSH and POP, and works out where every field sits in
+each report. The layout is then compiled into a struct based packer so building
+a report is a single pack_into rather than bit twiddling per field.
+
+Docs: https://usb.org/sites/default/files/hid1_11.pdf Section 6.2.2
+"""
+import struct
+from typing import Callable, Iterator, NamedTuple, Sequence
+
+from .models import HIDInputType
+
+# Item types, bits 2 and 3 of the prefix
+MAIN = 0
+GLOBAL = 1
+LOCAL = 2
+
+# Tags, the prefix without the size bits
+INPUT = 0x80
+OUTPUT = 0x90
+FEATURE = 0xB0
+COLLECTION = 0xA0
+END_COLLECTION = 0xC0
+USAGE_PAGE = 0x04
+LOGICAL_MINIMUM = 0x14
+LOGICAL_MAXIMUM = 0x24
+REPORT_SIZE = 0x74
+REPORT_ID = 0x84
+REPORT_COUNT = 0x94
+PUSH = 0xA4
+POP = 0xB4
+USAGE = 0x08
+USAGE_MINIMUM = 0x18
+USAGE_MAXIMUM = 0x28
+
+LONG_ITEM = 0xFE
+# Data bytes of the size bits 0 to 3
+DATA_SIZES = (0, 1, 2, 4)
+
+
+class HIDItem(NamedTuple):
+    """
+    One item of a descriptor, tag is the prefix with the size bits cleared
+    """
+
+    tag: int
+    item_type: int
+    data: bytes
+
+    @property
+    def unsigned(self) -> int:
+        """
+        The data as an unsigned little endian number
+        """
+        return int.from_bytes(self.data, "little")
+
+    @property
+    def signed(self) -> int:
+        """
+        The data as a two's complement little endian number
+        """
+        return int.from_bytes(self.data, "little", signed=True)
+
+
+class ReportField(NamedTuple):
+    """
+    A Main item's run of count values of bit_size bits starting at bit_offset
+
+    bit_offset counts from the first bit after the Report ID.
+    usages holds one usage per value for variable fields.
+    """
+
+    usage_page: int
+    usages: tuple[int, ...]
+    bit_offset: int
+    bit_size: int
+    count: int
+    logical_minimum: int
+    logical_maximum: int
+    flags: int
+
+    @property
+    def constant(self) -> bool:
+        """
+        Whether the field is padding
+        """
+        return bool(self.flags & HIDInputType.CONSTANT)
+
+    @property
+    def variable(self) -> bool:
+        """
+        Whether each value is its own control rather than an array index
+        """
+        return bool(self.flags & HIDInputType.VARIABLE)
+
+    @property
+    def signed(self) -> bool:
+        """
+        Whether the values go below 0
+        """
+        return self.logical_minimum < 0
+
+
+class Report(NamedTuple):
+    """
+    The fields of one report ID, report_id is 0 when the descriptor doesn't use IDs
+    """
+
+    report_id: int
+    fields: tuple[ReportField, ...]
+    bit_length: int
+
+    @property
+    def length(self) -> int:
+        """
+        Bytes written to the endpoint, including the Report ID
+        """
+        return (1 if self.report_id else 0) + (self.bit_length + 7) // 8
+
+
+class ReportLayout(NamedTuple):
+    """
+    The reports of each kind keyed by report ID
+    """
+
+    inputs: dict[int, Report]
+    outputs: dict[int, Report]
+    features: dict[int, Report]
+
+    @property
+    def input_length(self) -> int:
+        """
+        The longest input report, what the gadget's report_length has to be
+        """
+        return max((report.length for report in self.inputs.values()), default=0)
+
+
+class _GlobalState(NamedTuple):
+    usage_page: int = 0
+    logical_minimum: int = 0
+    logical_maximum: int = 0
+    report_size: int = 0
+    report_count: int = 0
+    report_id: int = 0
+
+
+def iter_items(descriptor: bytes) -> Iterator[HIDItem]:
+    """
+    The items of the descriptor, long items included as is
+    """
+    position = 0
+    while position < len(descriptor):
+        prefix = descriptor[position]
+        if prefix == LONG_ITEM:
+            if position + 2 >= len(descriptor):
+                raise ValueError(f"Truncated long item at byte {position}")
+            size = descriptor[position + 1]
+            tag = descriptor[position + 2]
+            data = descriptor[position + 3 : position + 3 + size]
+            position += 3 + size
+        else:
+            size = DATA_SIZES[prefix & 0x03]
+            tag = prefix & 0xFC
+            data = descriptor[position + 1 : position + 1 + size]
+            position += 1 + size
+        if len(data) != size:
+            raise ValueError(f"Truncated item 0x{prefix:02x} at end of descriptor")
+        # Long items have the reserved type 3 so nothing below acts on them
+        yield HIDItem(tag=tag, item_type=(prefix >> 2) & 0x03, data=bytes(data))
+
+
+def _logical_maximum(state: _GlobalState, item: HIDItem) -> int:
+    # A maximum that only looks negative because its top bit is set is unsigned
+    value = item.signed
+    if state.logical_minimum >= 0 > value:
+        value = item.unsigned
+    return value
+
+
+def _field_usages(
+    usages: list[int], usage_range: list[int | None], count: int
+) -> tuple[int, ...]:
+    if usage_range[0] is not None and usage_range[1] is not None:
+        usages = usages + list(range(usage_range[0], usage_range[1] + 1))
+    if not usages:
+        return ()
+    # Values past the last usage share it
+    return tuple(usages[min(index, len(usages) - 1)] for index in range(count))
+
+
+def _apply_global(
+    state: _GlobalState, stack: list[_GlobalState], item: HIDItem
+) -> _GlobalState:
+    if item.tag == USAGE_PAGE:
+        state = state._replace(usage_page=item.unsigned)
+    elif item.tag == LOGICAL_MINIMUM:
+        state = state._replace(logical_minimum=item.signed)
+    elif item.tag == LOGICAL_MAXIMUM:
+        state = state._replace(logical_maximum=_logical_maximum(state, item))
+    elif item.tag == REPORT_SIZE:
+        state = state._replace(report_size=item.unsigned)
+    elif item.tag == REPORT_ID:
+        if not 0 < item.unsigned < 256:
+            raise ValueError(f"Report ID {item.unsigned} out of range")
+        state = state._replace(report_id=item.unsigned)
+    elif item.tag == REPORT_COUNT:
+        state = state._replace(report_count=item.unsigned)
+    elif item.tag == PUSH:
+        stack.append(state)
+    elif item.tag == POP:
+        if not stack:
+            raise ValueError("POP without a matching PUSH")
+        state = stack.pop()
+    return state
+
+
+def parse_report_descriptor(descriptor: bytes) -> ReportLayout:
+    """
+    Work out the layout of every report the descriptor defines
+    """
+    state = _GlobalState()
+    stack: list[_GlobalState] = []
+    usages: list[int] = []
+    usage_range: list[int | None] = [None, None]
+    reports: dict[int, dict[int, list]] = {INPUT: {}, OUTPUT: {}, FEATURE: {}}
+    offsets: dict[int, dict[int, int]] = {INPUT: {}, OUTPUT: {}, FEATURE: {}}
+    depth = 0
+
+    for item in iter_items(descriptor):
+        if item.item_type == GLOBAL:
+            state = _apply_global(state, stack, item)
+        elif item.item_type == LOCAL:
+            # Usages with 4 data bytes carry their own usage page in the high half
+            if item.tag == USAGE:
+                usages.append(item.unsigned & 0xFFFF)
+            elif item.tag == USAGE_MINIMUM:
+                usage_range[0] = item.unsigned & 0xFFFF
+            elif item.tag == USAGE_MAXIMUM:
+                usage_range[1] = item.unsigned & 0xFFFF
+        elif item.item_type == MAIN:
+            if item.tag in reports:
+                offset = offsets[item.tag].get(state.report_id, 0)
+                reports[item.tag].setdefault(state.report_id, []).append(
+                    ReportField(
+                        usage_page=state.usage_page,
+                        usages=_field_usages(usages, usage_range, state.report_count),
+                        bit_offset=offset,
+                        bit_size=state.report_size,
+                        count=state.report_count,
+                        logical_minimum=state.logical_minimum,
+                        logical_maximum=state.logical_maximum,
+                        flags=item.unsigned,
+                    )
+                )
+                offsets[item.tag][state.report_id] = (
+                    offset + state.report_size * state.report_count
+                )
+            elif item.tag == COLLECTION:
+                depth += 1
+            elif item.tag == END_COLLECTION:
+                depth -= 1
+                if depth < 0:
+                    raise ValueError("END_COLLECTION without a matching COLLECTION")
+            # Local items only apply to the next Main item
+            usages = []
+            usage_range = [None, None]
+
+    if depth:
+        raise ValueError("COLLECTION without a matching END_COLLECTION")
+
+    def build(kind: int) -> dict[int, Report]:
+        return {
+            report_id: Report(
+                report_id=report_id,
+                fields=tuple(fields),
+                bit_length=offsets[kind][report_id],
+            )
+            for report_id, fields in reports[kind].items()
+        }
+
+    return ReportLayout(
+        inputs=build(INPUT), outputs=build(OUTPUT), features=build(FEATURE)
+    )
+
+
+# struct codes of whole byte fields by size in bits, unsigned then signed
+_STRUCT_CODES = {8: ("B", "b"), 16: ("H", "h"), 32: ("I", "i")}
+
+
+class ReportPacker:
+    """
+    Packs gamepad state into a report with one precompiled struct
+
+    The report's bit fields, buttons and the padding after them, become one
+    bytes member filled from the button mask. Every other field of whole
+    8, 16 or 32 bit values is an axis, in report order, with a member per value.
+    Other reports pack the same way, a keyboard's modifier bits are its buttons
+    and its key array its axes.
+    """
+
+    def __init__(self, report: Report):
+        self.report = report
+        self.length = report.length
+        fmt = "<B" if report.report_id else "<"
+        self._prefix = (report.report_id,) if report.report_id else ()
+        # Where the bytes holding the buttons start in the report, their length,
+        # and the bit of the first button within them
+        self.button_offset = 0
+        self.button_bytes = 0
+        self.button_shift = 0
+        self.num_buttons = 0
+        # The usage of each axis, such as X or Y on the Generic Desktop page
+        self.axis_usages: list[int] = []
+
+        fields = list(report.fields)
+        position = 0
+        while position < len(fields):
+            field = fields[position]
+            aligned = field.bit_offset % 8 == 0 and field.bit_size in _STRUCT_CODES
+            if aligned and not field.constant:
+                fmt += _STRUCT_CODES[field.bit_size][field.signed] * field.count
+                self.axis_usages += list(field.usages or (0,) * field.count)
+                position += 1
+                continue
+            if aligned:
+                fmt += f"{field.bit_size // 8 * field.count}x"
+                position += 1
+                continue
+
+            # A run of bit fields up to the next byte boundary
+            start = field.bit_offset
+            end = start
+            while position < len(fields) and (
+                end % 8 or fields[position].bit_offset == start
+            ):
+                field = fields[position]
+                if field.bit_size == 1 and not field.constant:
+                    if self.num_buttons:
+                        raise ValueError("Buttons split across report fields")
+                    self.num_buttons = field.count
+                    self.button_shift = field.bit_offset - start
+                elif not field.constant:
+                    raise ValueError(
+                        f"Unsupported bit field on usage page {field.usage_page}"
+                    )
+                end = field.bit_offset + field.bit_size * field.count
+                position += 1
+            # The host pads the last byte of the report
+            end += -end % 8
+            if self.button_bytes:
+                raise ValueError("More than one run of button bits")
+            self.button_bytes = (end - start) // 8
+            self.button_offset = len(self._prefix) + start // 8
+            fmt += f"{self.button_bytes}s"
+
+        self.num_axes = len(self.axis_usages)
+        self.struct = struct.Struct(fmt)
+        if self.struct.size != self.length:
+            raise ValueError(
+                f"Packed size {self.struct.size} doesn't match report length {self.length}"
+            )
+        self.pack_into = self._compile_pack_into()
+
+    def _compile_pack_into(self) -> Callable[[bytearray, int, Sequence[int]], None]:
+        """
+        pack_into(buffer, mask, axes) writes the report into a preallocated buffer,
+        axes has to hold num_axes values
+
+        Built for the report's shape so packing on the hot path is a single call
+        without assembling the arguments generically.
+        """
+        struct_pack_into = self.struct.pack_into
+        report_id = self.report.report_id
+        shift = self.button_shift
+        length = self.button_bytes
+
+        if report_id and length:
+
+            def pack_into(buffer: bytearray, mask: int, axes: Sequence[int]):
+                struct_pack_into(
+                    buffer,
+                    0,
+                    report_id,
+                    (mask << shift).to_bytes(length, "little"),
+                    *axes,
+                )
+
+        elif length:
+
+            def pack_into(buffer: bytearray, mask: int, axes: Sequence[int]):
+                struct_pack_into(
+                    buffer, 0, (mask << shift).to_bytes(length, "little"), *axes
+                )
+
+        else:
+
+            def pack_into(buffer: bytearray, _mask: int, axes: Sequence[int]):
+                struct_pack_into(buffer, 0, *self._prefix, *axes)
+
+        return pack_into
+
+    def _bits(self, mask: int) -> tuple[bytes, ...]:
+        if not self.button_bytes:
+            return ()
+        return ((mask << self.button_shift).to_bytes(self.button_bytes, "little"),)
+
+    def pack(self, mask: int = 0, axes: Sequence[int] = ()) -> bytes:
+        """
+        The report with the buttons of mask pressed and the axes at their values
+        """
+        return self.struct.pack(*self._prefix, *self._bits(mask), *self._axes(axes))
+
+    def _axes(self, axes: Sequence[int]) -> Sequence[int]:
+        if len(axes) == self.num_axes:
+            return axes
+        return tuple(axes[: self.num_axes]) + (0,) * (self.num_axes - len(axes))
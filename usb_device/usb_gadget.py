@@ -1,18 +1,77 @@
 """
 Configure a USB Port to be a USB device when connected to another computer
+
+The gadget is applied declaratively: the configfs tree the model describes is
+compared with what is already there and only the differences are written,
+so applying the same model again does nothing and the UDC is only unbound
+when something it depends on has to change.
 """
 import os
 from pathlib import Path
+from typing import NamedTuple
 
 from structlog import get_logger
-from .models import (
-    USBGadgetModel,
-    GadgetLocale,
-    HIDFunction,
-)
+from .models import USBGadgetModel
 
 log = get_logger()
 
+CONFIG_NAME = "c.1"
+MAX_POWER = 100
+
+
+class GadgetTree(NamedTuple):
+    """
+    A gadget's configfs tree relative to the gadget directory
+
+    directories are in the order they have to be created,
+    links map a link in a configuration to the function it enables.
+    """
+
+    directories: tuple[Path, ...]
+    attributes: dict[Path, str | bytes]
+    links: dict[Path, Path]
+
+
+class GadgetChanges(NamedTuple):
+    """
+    What applying a tree has to do to the gadget as it is
+    """
+
+    directories: tuple[Path, ...]
+    attributes: dict[Path, str | bytes]
+    links: dict[Path, Path]
+    stale_links: tuple[Path, ...]
+    stale_functions: tuple[Path, ...]
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.directories
+            or self.attributes
+            or self.links
+            or self.stale_links
+            or self.stale_functions
+        )
+
+
+def _same_value(current: bytes | None, value: str | bytes) -> bool:
+    """
+    Whether an attribute already holds the value
+
+    configfs reads numbers back in its own format, 0x1d6b for 0x1D6B or
+    100 for 0x64, so values that are both numbers are compared as numbers.
+    """
+    if current is None:
+        return False
+    if isinstance(value, bytes):
+        return current == value
+    text = current.decode(errors="replace").strip()
+    if text == value.strip():
+        return True
+    try:
+        return int(text, 0) == int(value, 0)
+    except ValueError:
+        return False
+
 
 class USBGadget:
     """
@@ -20,36 +79,153 @@ class USBGadget:
     """
 
     BASE_PATH = Path("/sys/kernel/config/usb_gadget/")
+    UDC_CLASS_PATH = Path("/sys/class/udc")
 
-    def __init__(self, gadget_name: str, model: USBGadgetModel):
+    def __init__(
+        self,
+        gadget_name: str,
+        model: USBGadgetModel,
+        base_path: Path | None = None,
+    ):
         self.gadget_name = gadget_name
-        self.path = self.BASE_PATH / gadget_name
+        self.path = Path(base_path or self.BASE_PATH) / gadget_name
         self.model = model
 
-        self.create()
-        self.setup_from_model()
+    def desired_tree(self) -> GadgetTree:
+        """
+        The configfs tree the model describes, without the UDC
+        """
+        directories = [Path(".")]
+        attributes: dict[Path, str | bytes] = {}
+        for field, value in self.model.spec.model_dump(exclude={"UDC"}).items():
+            if value:
+                attributes[Path(field)] = value
 
-    def _get_attr_path(self, attribute: str, path: Path | None = None) -> Path:
+        for locale in self.model.strings:
+            strings_path = Path("strings") / locale.language
+            directories.append(strings_path)
+            for field, value in locale.strings.model_dump().items():
+                if value:
+                    attributes[strings_path / field] = value
+
+        for hid_function in self.model.functions:
+            function_path = Path("functions") / f"hid.{hid_function.name}"
+            directories.append(function_path)
+            attributes[function_path / "protocol"] = str(hid_function.protocol.value)
+            attributes[function_path / "subclass"] = str(hid_function.subclass.value)
+            attributes[function_path / "report_length"] = str(
+                hid_function.report_length
+            )
+            attributes[function_path / "report_desc"] = hid_function.report_desc
+
+        config_path = Path("configs") / CONFIG_NAME
+        directories.append(config_path)
+        attributes[config_path / "bmAttributes"] = "0x80"
+        attributes[config_path / "MaxPower"] = str(MAX_POWER)
+
+        # Every function is enabled in the configuration, each HID function
+        # becomes its own /dev/hidgN in the order they were created
+        function_names = [f"hid.{function.name}" for function in self.model.functions]
+        links = {
+            config_path / name: Path("functions") / name for name in function_names
+        }
+        return GadgetTree(tuple(directories), attributes, links)
+
+    def _read_value(self, relative: Path) -> bytes | None:
+        try:
+            descriptor = os.open(self.path / relative, os.O_RDONLY)
+        except OSError:
+            return None
+        try:
+            return os.read(descriptor, 4096)
+        except OSError:
+            return None
+        finally:
+            os.close(descriptor)
+
+    def diff(self, tree: GadgetTree) -> GadgetChanges:
         """
-        Determines the attribute path.
+        The parts of the tree the gadget doesn't have yet
         """
-        return self.path / attribute if path is None else path / attribute
+        directories = tuple(
+            directory
+            for directory in tree.directories
+            if not (self.path / directory).is_dir()
+        )
+        attributes = {
+            relative: value
+            for relative, value in tree.attributes.items()
+            if not _same_value(self._read_value(relative), value)
+        }
+        links = {
+            link: target
+            for link, target in tree.links.items()
+            if not self._links_to(self.path / link, target)
+        }
+        stale_links = tuple(
+            link.relative_to(self.path)
+            for config_path in self._config_paths()
+            for link in config_path.iterdir()
+            if link.is_symlink() and link.relative_to(self.path) not in tree.links
+        )
+        stale_functions = tuple(
+            function.relative_to(self.path)
+            for function in self._children(self.path / "functions")
+            if function.relative_to(self.path) not in tree.directories
+        )
+        return GadgetChanges(
+            directories, attributes, links, stale_links, stale_functions
+        )
 
-    def _write_value(
-        self,
-        attribute: str,
-        value: str | bytes,
-        path=None,
-    ):
+    def _links_to(self, link_path: Path, target: Path) -> bool:
+        """
+        Whether link_path is a link to the target, configfs reads links back
+        relative to the link so they are compared once resolved
+        """
+        return (
+            link_path.is_symlink()
+            and link_path.resolve() == (self.path / target).resolve()
+        )
+
+    def _unlink_changed_functions(
+        self, tree: GadgetTree, changes: GadgetChanges
+    ) -> dict[Path, Path]:
+        """
+        Unlink the functions with changed attributes from every configuration,
+        returns the links the tree wants back once they are written
+
+        A configuration holds a reference on the function it links and f_hid
+        refuses attribute writes with EBUSY while it is referenced.
+        """
+        changed = {
+            Path(*relative.parts[:2])
+            for relative in changes.attributes
+            if relative.parts[0] == "functions"
+        }
+        relink = {}
+        for link, target in tree.links.items():
+            if target in changed and self._links_to(self.path / link, target):
+                (self.path / link).unlink()
+                relink[link] = target
+        return relink
+
+    def _config_paths(self) -> list[Path]:
+        configs = self.path / "configs"
+        return sorted(configs.iterdir()) if configs.is_dir() else []
+
+    def _write_value(self, relative: Path, value: str | bytes):
         """
         Writes a value to a specific attribute.
         """
-        attr_path = self._get_attr_path(attribute, path)
+        attr_path = self.path / relative
+        data = value if isinstance(value, bytes) else value.encode()
         try:
-            mode = "wb" if isinstance(value, bytes) else "w"
-            with attr_path.open(mode) as f:
-                f.write(value)
-                log.info("Wrote value to attribute", attribute=attribute, value=value)
+            descriptor = os.open(attr_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+            try:
+                os.write(descriptor, data)
+            finally:
+                os.close(descriptor)
+            log.debug("Wrote value to attribute", attribute=str(relative), value=value)
         except (FileNotFoundError, PermissionError, OSError) as e:
             error_msg = None
             match e:
@@ -66,176 +242,125 @@ class USBGadget:
                 log.error(error_msg, attribute_path=attr_path, exc_info=True)
             raise
 
-    def _setup_specification(self, spec):
-        for field, value in spec.model_dump().items():
-            if value:
-                self._write_value(field, value)
-
-    def _setup_localisation(self, strings):
-        for locale in strings:
-            strings_path = self.path / f"strings/{locale.language}"
-            strings_path.mkdir(parents=True, exist_ok=True)
-            for field, value in locale.strings.model_dump().items():
-                if value:
-                    self._write_value(field, value, strings_path)
-
-    def _setup_hid_functions(self, hid_functions: list[HIDFunction]):
-        """
-        Sets up the HID function for the gadget.
-        """
-        for hid_function in hid_functions:
-            hid_function_path = self.path / f"functions/hid.{hid_function.name}"
-            if not hid_function_path.exists():
-                hid_function_path.mkdir()
-                log.info(
-                    "Created HID function directory in sysfs",
-                    path=str(hid_function_path),
-                )
-            else:
-                log.warning(
-                    "HID function directory already exists", path=str(hid_function_path)
-                )
-
-            self._write_value(
-                "protocol", str(hid_function.protocol.value), hid_function_path
-            )
-            self._write_value(
-                "subclass", str(hid_function.subclass.value), hid_function_path
-            )
-            self._write_value(
-                "report_length", str(hid_function.report_length), hid_function_path
-            )
-            self._write_value(
-                "report_desc", hid_function.report_desc, hid_function_path
-            )
-
-    def _setup_config_strings(self, config_path: Path, locale: GadgetLocale):
+    def bound_udc(self) -> str:
         """
-        Sets up the localized strings for the configuration.
+        The UDC the gadget is bound to, empty when it isn't bound
         """
-        strings_path = config_path / f"strings/{locale.language}"
-        strings_path.mkdir(parents=True, exist_ok=True)
-        for field, value in locale.strings.model_dump().items():
-            if value:
-                self._write_value(field, value, strings_path)
+        value = self._read_value(Path("UDC"))
+        return value.decode().strip() if value else ""
 
-    def _link_function_to_config(self, function_name: str, config_name: str):
+    def available_udc(self) -> str:
         """
-        Links a function to a configuration.
+        The UDC from the model, or the first one the kernel has
         """
-        function_path = self.path / f"functions/{function_name}"
-        config_path = self.path / f"configs/{config_name}"
-
-        link_path = config_path / function_name
-        if not link_path.exists():
-            link_path.symlink_to(function_path)
-            log.info(f"Linked {function_name} to {config_name}")
-        else:
-            log.warning(f"{function_name} already linked to {config_name}")
+        if self.model.spec.UDC:
+            return self.model.spec.UDC
+        try:
+            return sorted(os.listdir(self.UDC_CLASS_PATH))[0]
+        except (OSError, IndexError) as error:
+            raise OSError(f"No UDC found in {self.UDC_CLASS_PATH}") from error
 
-    def _setup_configuration(
-        self, config_name: str, max_power: int, locale: GadgetLocale
-    ):
-        """
-        Sets up the configuration for the gadget.
+    def apply(self, bind: bool = True) -> GadgetChanges:
         """
-        config_path = self.path / f"configs/{config_name}"
-        if not config_path.exists():
-            config_path.mkdir()
-            log.info("Created configuration directory in sysfs", path=str(config_path))
-        else:
-            log.warning("Configuration directory already exists", path=str(config_path))
-
-        self._write_value("bmAttributes", "0x80", config_path)
-        self._write_value("MaxPower", str(max_power), config_path)
-
-        # Set up localized strings for the configuration
-        # self._setup_config_strings(config_path, locale)
+        Bring the gadget in configfs in line with the model
 
-    def setup_from_model(self):
-        """
-        Set up the gadget using values from the model.
+        Only attributes that differ are written. The UDC is unbound first when
+        something has to change, since configfs refuses changes to a bound gadget,
+        and bound again afterwards. Functions whose attributes change are unlinked
+        from the configurations while they are written, and functions the model
+        no longer has are removed once nothing links them.
         """
+        tree = self.desired_tree()
+        changes = self.diff(tree)
+        udc = self.available_udc() if bind else ""
+        bound = self.bound_udc()
+        if not changes and bound == udc:
+            log.info("USB gadget already up to date", gadget_name=self.gadget_name)
+            return changes
+
+        if bound and (changes or bound != udc):
+            self.deactivate()
+        for directory in changes.directories:
+            (self.path / directory).mkdir(parents=True, exist_ok=True)
+        for link in changes.stale_links:
+            (self.path / link).unlink()
+        for function in changes.stale_functions:
+            self._rmdir(self.path / function)
+        relink = self._unlink_changed_functions(tree, changes)
+        for relative, value in changes.attributes.items():
+            self._write_value(relative, value)
+        for link, target in {**relink, **changes.links}.items():
+            link_path = self.path / link
+            if link_path.is_symlink():
+                link_path.unlink()
+            link_path.symlink_to(self.path / target)
+        if udc:
+            self.activate(udc)
+
         log.info(
-            "Setting up USB Gadget Device Specification", gadget_name=self.gadget_name
+            "Applied USB gadget",
+            gadget_name=self.gadget_name,
+            directories=len(changes.directories),
+            attributes=len(changes.attributes),
+            links=len(changes.links),
+            stale_links=len(changes.stale_links),
+            stale_functions=len(changes.stale_functions),
+            relinked=len(relink),
+            rebound=bool(bound),
         )
-        self._setup_specification(self.model.spec)
-
-        log.info("Setting up Localisation Strings", gadget_name=self.gadget_name)
-        self._setup_localisation(self.model.strings)
-
-        log.info("Configuring HID Function")
-        self._setup_hid_functions(self.model.functions)
-
-        log.info("Configuring Gadget Configuration")
-        config_name = "c.1"
-        max_power = 100
-        self._setup_configuration(config_name, max_power, self.model.strings[0])
+        return changes
 
-        function_name = f"hid.{self.model.functions[0].name}"
-        self._link_function_to_config(function_name, config_name)
-
-    def create(self):
+    def activate(self, udc: str | None = None):
         """
-        Creates the gadget directory in sysfs.
+        Activates the USB gadget by writing the name of a UDC
+        from /sys/class/udc to the UDC file within the gadget directory.
         """
-
+        udc = udc or self.available_udc()
         try:
-            if not self.path.exists():
-                self.path.mkdir()
-                log.info("Created gadget directory in sysfs", path=str(self.path))
-            else:
-                log.warning("Gadget directory already exists", path=str(self.path))
-        except (PermissionError, IsADirectoryError, OSError) as e:
-            error_msg = None
-            match e:
-                case PermissionError():
-                    error_msg = "Permission denied for creating gadget directory"
-                case IsADirectoryError():
-                    error_msg = "A directory already exists with the given gadget name"
-                case OSError() as os_error:
-                    error_msg = (
-                        f"Error creating gadget directory, error={str(os_error)}"
-                    )
-                case _:
-                    error_msg = "Unknown error"
-
-            if error_msg:
-                log.error(error_msg, path=str(self.path), exc_info=True)
+            self._write_value(Path("UDC"), udc)
+            log.info("Bound gadget to UDC", udc=udc, gadget_name=self.gadget_name)
+        except (FileNotFoundError, PermissionError, OSError) as e:
+            log.error(f"Error during gadget activation: {e}", exc_info=True)
             raise
 
-    def activate(self):
+    def deactivate(self):
         """
-        Activates the USB gadget by writing the contents of /sys/class/udc
-        to a file named UDC within the gadget directory.
+        Unbinds the gadget from its UDC
         """
-        try:
-            # Use os.listdir() to get the contents of the directory
-            udc_list = os.listdir("/sys/class/udc")
-
-            # Convert the list to a string, separated by newlines
-            udc_str = "\n".join(udc_list)
+        if self.bound_udc():
+            self._write_value(Path("UDC"), "\n")
+            log.info("Unbound gadget from UDC", gadget_name=self.gadget_name)
 
-            # Write the string to UDC file in the gadget directory
-            udc_path = self.path / "UDC"
-            with udc_path.open("w") as f:
-                f.write(udc_str)
-                log.info(f"Wrote '{udc_str}' to {udc_path}")
-
-        except (FileNotFoundError, PermissionError, OSError) as e:
-            log.error(f"Error during gadget activation: {e}", exc_info=True)
-            raise
+    def _rmdir(self, path: Path):
+        """
+        configfs removes a directory's attributes along with it
+        """
+        path.rmdir()
 
     def remove(self):
         """
-        Removes the gadget directory from sysfs.
+        Removes the gadget from configfs, undoing what apply created in reverse order:
+        unbind, unlink the functions from the configurations, then remove the
+        configurations, functions and strings before the gadget directory.
         """
+        if not self.path.exists():
+            log.warning("Gadget directory does not exist", path=str(self.path))
+            return
         try:
-            if self.path.exists():
-                self.path.rmdir()
-                log.info("Removed gadget directory from sysfs", path=str(self.path))
-            else:
-                log.warning("Gadget directory does not exist", path=str(self.path))
+            self.deactivate()
+            for config_path in self._config_paths():
+                for entry in sorted(config_path.iterdir()):
+                    if entry.is_symlink():
+                        entry.unlink()
+                for strings_path in self._children(config_path / "strings"):
+                    self._rmdir(strings_path)
+                self._rmdir(config_path)
+            for function_path in self._children(self.path / "functions"):
+                self._rmdir(function_path)
+            for strings_path in self._children(self.path / "strings"):
+                self._rmdir(strings_path)
+            self._rmdir(self.path)
+            log.info("Removed gadget directory from sysfs", path=str(self.path))
         except PermissionError:
             log.error(
                 "Permission denied for removing gadget directory",
@@ -251,3 +376,9 @@ class USBGadget:
                 exc_info=True,
             )
             raise
+
+    @staticmethod
+    def _children(path: Path) -> list[Path]:
+        if not path.is_dir():
+            return []
+        return sorted(entry for entry in path.iterdir() if entry.is_dir())